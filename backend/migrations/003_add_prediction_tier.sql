@@ -0,0 +1,6 @@
+-- Migration: Add prediction_tier column
+-- Description: Record which ML ensemble tier produced each prediction (full, or subset/fallback when the ML service degraded under load)
+-- Date: 2026-10-17
+
+ALTER TABLE health_features
+ADD COLUMN prediction_tier VARCHAR(16) NOT NULL DEFAULT 'full' COMMENT 'ML ensemble tier: full/subset/fallback' AFTER risk_label;
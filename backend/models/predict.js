@@ -3,6 +3,40 @@
  * Integrates with Python microservice running your stacking ML models
  */
 
+// Compact wire format (ml_service/wire.py): 17 little-endian float64 per
+// request row, 8 per response row. Enabled with ML_WIRE_FORMAT=compact.
+const FEATURES_MEDIA_TYPE = 'application/x-heartwise-features';
+const SCORES_MEDIA_TYPE = 'application/x-heartwise-scores';
+const FEATURE_ORDER = [
+  'age_years', 'gender', 'height', 'weight', 'ap_hi', 'ap_lo', 'cholesterol', 'gluc',
+  'smoke', 'alco', 'ACTIVE', 'bmi', 'pulse_pressure', 'age_group', 'bmi_group',
+  'smoke_age', 'chol_bmi'
+];
+const BASE_MODELS = ['model1', 'model2', 'model3', 'model4', 'model5'];
+// Tiers by wire index (ml_service/degradation.py); cascade marks early exits
+const TIERS = ['full', 'subset', 'fallback', 'cascade'];
+
+function encodeFeatures(payload) {
+  const view = new DataView(new ArrayBuffer(FEATURE_ORDER.length * 8));
+  FEATURE_ORDER.forEach((name, i) => view.setFloat64(i * 8, Number(payload[name]), true));
+  return Buffer.from(view.buffer);
+}
+
+function decodeScores(buffer) {
+  const view = new DataView(buffer);
+  const base_predictions = {};
+  BASE_MODELS.forEach((name, i) => {
+    const value = view.getFloat64(i * 8, true);
+    base_predictions[name] = Number.isNaN(value) ? null : value;
+  });
+  const probability = view.getFloat64(40, true);
+  return {
+    base_predictions,
+    stacked: { probability, label: probability >= 0.5 ? 'High' : 'Low' },
+    tier: TIERS[view.getFloat64(56, true)] || 'full'
+  };
+}
+
 /**
  * Predict cardiovascular risk using stacking models via Python microservice
  * @param {Object} features - Complete feature object (raw + engineered)
@@ -34,11 +68,15 @@ async function predictRisk(features) {
     chol_bmi: features.chol_bmi
   };
 
+  const compact = process.env.ML_WIRE_FORMAT === 'compact';
+
   try {
     const response = await fetch(`${mlServiceUrl}/predict`, {
       method: 'POST',
-      headers: { 'Content-Type': 'application/json' },
-      body: JSON.stringify(payload)
+      headers: compact
+        ? { 'Content-Type': FEATURES_MEDIA_TYPE, 'Accept': SCORES_MEDIA_TYPE }
+        : { 'Content-Type': 'application/json' },
+      body: compact ? encodeFeatures(payload) : JSON.stringify(payload)
     });
 
     if (!response.ok) {
@@ -46,7 +84,7 @@ async function predictRisk(features) {
       throw new Error(`ML service error: ${response.status} - ${errorText}`);
     }
 
-    const prediction = await response.json();
+    const prediction = compact ? decodeScores(await response.arrayBuffer()) : await response.json();
     console.log('[INFO] Prediction received:', prediction.stacked);
     
     return prediction;
@@ -88,7 +126,8 @@ function getFallbackPrediction(features) {
     stacked: {
       probability: parseFloat(probability.toFixed(3)),
       label
-    }
+    },
+    tier: 'fallback'
   };
 }
 
@@ -466,8 +466,8 @@ app.post("/api/predictAndSave", async (req, res) => {
       (user_cd, age_years, gender, height, weight, ap_hi, ap_lo, cholesterol, gluc,
         smoke, alco, ACTIVE, bmi, pulse_pressure, age_group, bmi_group, smoke_age, chol_bmi,
         base_model1_score, base_model2_score, base_model3_score, base_model4_score, base_model5_score,
-        stacked_probability, risk_label, advice_text)
-      VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        stacked_probability, risk_label, prediction_tier, advice_text)
+      VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
     `;
 
     const values = [
@@ -496,6 +496,7 @@ app.post("/api/predictAndSave", async (req, res) => {
       prediction.base_predictions.model5,  // XGBoost
       prediction.stacked.probability,
       prediction.stacked.label,
+      prediction.tier || 'full',  // full / cascade (early exit) / subset / fallback (degraded under load)
       adviceText
     ];
 
@@ -3,32 +3,146 @@ ML Prediction Microservice for CardioPredict
 Loads and runs 5 base models + stacking model for cardiovascular risk prediction
 """
 
-from fastapi import FastAPI, HTTPException
+from __future__ import annotations
+from startup import STARTUP_MODE, WARMUP_BATCH_SIZES, WARMUP_ROUNDS, StartupState
+from fastapi import FastAPI, HTTPException, Header, Request
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
+from pydantic import BaseModel, Field, ValidationError
 from contextlib import asynccontextmanager
-import pandas as pd
+from typing import List, TYPE_CHECKING
+from collections import namedtuple
 import numpy as np
 import os
+import time
+import hmac
+import signal
+import asyncio
+import logging
 from dotenv import load_dotenv
-from model_loader import model_manager
+from model_loader import model_manager, ReloadInProgress, MODEL_LOAD_MODE
+from ensemble import BASE_MODELS
+from cascade import CASCADE_ENABLED
+from features import RAW_FEATURE_COLUMNS, engineer_features
+from synthetic import make_feature_frame
+from fallback import FALLBACK_COLUMNS, fallback_risk, fallback_base_predictions
+from wire import (
+    CompactRoute, WireFormatError, FEATURES_MEDIA_TYPE, SCORES_MEDIA_TYPE,
+    accepts, decode_features, encode_scores
+)
+from executor import (
+    inference_executor, run_model_ensemble,
+    ExecutorSaturated, InferenceTimeout, INFERENCE_RETRY_AFTER
+)
+from batching import MicroBatcher, MICROBATCH_ENABLED
+from cache import PredictionCache, PREDICTION_CACHE_ENABLED
+from degradation import CASCADE_TIER, DegradationController, SLO_ENABLED, most_degraded, tier_code
+from shadow import ShadowScorer, SHADOW_MODELS
+from metrics import (
+    registry, CallbackMetric, MetricsMiddleware, TimedJSONResponse, FALLBACK_PREDICTIONS, MODEL_RELOADS,
+    PREDICTION_TIERS, observe_stage, observe_parse, observe_ensemble, observe_cache_hits
+)
+from logs import get_logger, sampled, dropped_count
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+log = get_logger('app')
 
 load_dotenv()
 
+# Upper bound on records accepted by /predict/batch in one call
+MAX_BATCH_SIZE = int(os.getenv('MAX_BATCH_SIZE', 1000))
+# Token required in the X-Admin-Token header of /admin/* calls (unset disables them)
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN', '')
+
+# Loading and warm-up progress; /health reports ready once both are done
+startup_state = StartupState()
+
+def load_models() -> bool:
+    """Load the models (blocking); True if at least one loaded"""
+    if model_manager.load_attempted:
+        # Models were preloaded by serve.py before this worker was forked;
+        # the prediction-based setup steps run here, after the fork
+        model_manager.finish_loading()
+        return model_manager.get_loaded_count() > 0
+    return model_manager.load_all_models()
+
+async def start_service():
+    """Load and warm up the models, then report ready"""
+    done = startup_state.step('loading')
+    success = await asyncio.to_thread(load_models)
+    done()
+    if not success:
+        log.warning("⚠️ Running in fallback mode - using mock predictions")
+    else:
+        log.info("✅ ML Service ready with trained models!")
+    inference_executor.start()
+    if shadow_scorer is not None:
+        shadow_scorer.start()
+    
+    if success and WARMUP_BATCH_SIZES and MODEL_LOAD_MODE != 'lazy':
+        done = startup_state.step('warming_up')
+        try:
+            await warm_up()
+        except Exception as e:
+            log.warning("Warm-up failed: %s", e)
+        done()
+    startup_state.mark_ready()
+    log.info("Ready after %.2fs (%s)", startup_state.ready_after,
+             ', '.join(f"{phase} {seconds:.2f}s" for phase, seconds in startup_state.seconds.items()))
+
+async def warm_up():
+    """
+    Score synthetic batches through every loaded model on every inference
+    worker, so the first real requests do not pay for lazy allocations and
+    thread pool start-up in the estimator libraries
+    """
+    for batch_size in WARMUP_BATCH_SIZES:
+        X = make_feature_frame(batch_size, seed=batch_size)
+        records = [
+            HealthFeatures.model_construct(**{FEATURE_FIELDS[column]: value for column, value in row.items()})
+            for row in X.to_dict('records')
+        ]
+        for _ in range(WARMUP_ROUNDS):
+            outputs = await asyncio.gather(*(
+                inference_executor.run(run_model_ensemble, prepare_features_batch(records))
+                for _ in range(inference_executor.workers)
+            ))
+        for row in range(batch_size):
+            build_prediction(outputs[0], row)
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
-    print("🚀 Starting ML Service...")
-    success = model_manager.load_all_models()
-    if not success:
-        print("⚠️ Running in fallback mode - using mock predictions")
+    log.info("🚀 Starting ML Service (%s startup)...", STARTUP_MODE)
+    startup_task = None
+    if STARTUP_MODE == 'background':
+        # Accept connections now; /health answers 503 until the models are ready
+        startup_task = asyncio.create_task(start_service())
     else:
-        print("✅ ML Service ready with trained models!")
+        await start_service()
+    # SIGHUP reloads the models in the background (serve.py forwards it to every worker)
+    try:
+        asyncio.get_running_loop().add_signal_handler(
+            signal.SIGHUP, lambda: asyncio.ensure_future(reload_models())
+        )
+    except (AttributeError, NotImplementedError, RuntimeError):
+        pass
     yield
-    # Shutdown (if needed)
-    pass
+    # Shutdown
+    if startup_task is not None and not startup_task.done():
+        startup_task.cancel()
+    if micro_batcher is not None:
+        await micro_batcher.close()
+    if shadow_scorer is not None:
+        shadow_scorer.stop()
+    inference_executor.shutdown()
 
 app = FastAPI(title="CardioPredict ML Service", version="2.0.0", lifespan=lifespan)
+# Routes also accept the compact binary format where an endpoint provides it (wire.py)
+app.router.route_class = CompactRoute
 
 # CORS middleware - production-ready configuration
 allowed_origins_env = os.getenv('ALLOWED_ORIGINS', '')
@@ -36,11 +150,11 @@ allowed_origins_env = os.getenv('ALLOWED_ORIGINS', '')
 if allowed_origins_env:
     # If ALLOWED_ORIGINS is set, use those specific origins
     allowed_origins = [origin.strip() for origin in allowed_origins_env.split(',')]
-    print(f"[CORS] Allowed origins: {allowed_origins}")
+    log.info("CORS allowed origins: %s", allowed_origins)
 else:
     # Default to allow all for backend-to-backend communication
     allowed_origins = ["*"]
-    print("[CORS] Allowing all origins (default)")
+    log.info("CORS allowing all origins (default)")
 
 app.add_middleware(
     CORSMiddleware,
@@ -50,6 +164,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Outermost, so request latency includes CORS handling and body parsing
+app.add_middleware(
+    MetricsMiddleware,
+    endpoints=["/", "/health", "/metrics", "/predict", "/predict/batch",
+               "/predict/raw", "/predict/raw/batch", "/admin/reload"]
+)
+
 class HealthFeatures(BaseModel):
     """Input features for prediction - matches Streamlit model expectations"""
     # Base features
@@ -76,6 +197,40 @@ class PredictionResponse(BaseModel):
     """Prediction output format"""
     base_predictions: dict
     stacked: dict
+    # Models that actually ran for this row ("stacking" included); null
+    # base_predictions entries are models skipped by a cascade early exit
+    models_run: List[str] = []
+    # Base models whose own output went into the prediction (0: rule-based fallback)
+    models_used: int = 0
+    # full, cascade (early exit), subset (cheaper models, degraded under load)
+    # or fallback (rule-based)
+    tier: str = "full"
+
+class BatchPredictionRequest(BaseModel):
+    """Batch input format - one HealthFeatures record per row"""
+    records: List[HealthFeatures] = Field(..., min_length=1)
+
+class BatchPredictionResponse(BaseModel):
+    """Batch output format - predictions in the same order as the records"""
+    predictions: List[PredictionResponse]
+
+class RawHealthFeatures(BaseModel):
+    """The 11 raw inputs; engineered features are derived by the service"""
+    age_years: float
+    gender: int
+    height: float = Field(..., gt=0)
+    weight: float
+    ap_hi: float
+    ap_lo: float
+    cholesterol: int
+    gluc: int
+    smoke: int
+    alco: int
+    ACTIVE: int
+
+class RawBatchPredictionRequest(BaseModel):
+    """Batch of raw records for /predict/raw/batch"""
+    records: List[RawHealthFeatures] = Field(..., min_length=1)
 
 # Add this BEFORE the app initialization (near the top, after imports):
 
@@ -118,30 +273,232 @@ class StackingModel:
         proba = self.predict_proba(X)
         return (proba[:, 1] >= 0.5).astype(int)
 
-# ...existing code...
+# DataFrame column name -> HealthFeatures field, in model training order
+FEATURE_FIELDS = {
+    'age_years': 'age_years',
+    'gender': 'gender',
+    'height': 'height',
+    'weight': 'weight',
+    'ap_hi': 'ap_hi',
+    'ap_lo': 'ap_lo',
+    'cholesterol': 'cholesterol',
+    'gluc': 'gluc',
+    'smoke': 'smoke',
+    'alco': 'alco',
+    'active': 'ACTIVE',  # lowercase column name
+    'bmi': 'bmi',
+    'pulse_pressure': 'pulse_pressure',
+    'age_group': 'age_group',
+    'bmi_group': 'bmi_group',
+    'smoke_age': 'smoke_age',
+    'chol_bmi': 'chol_bmi'
+}
+
+# Read-only HealthFeatures stand-in for rows decoded from the compact format
+FeatureRow = namedtuple('FeatureRow', FEATURE_FIELDS.values())
+
+# Cache of full-ensemble results, cleared whenever the models are reloaded
+prediction_cache = PredictionCache(FEATURE_FIELDS.values()) if PREDICTION_CACHE_ENABLED else None
+if prediction_cache is not None:
+    model_manager.add_reload_listener(prediction_cache.clear)
+# Steps predictions down to cheaper tiers while the latency SLO is missed
+slo_controller = DegradationController() if SLO_ENABLED else None
+# Scores a sample of /predict requests with the SHADOW_MODELS candidates, off the response path
+shadow_scorer = ShadowScorer(model_manager) if SHADOW_MODELS else None
+if shadow_scorer is not None:
+    model_manager.add_reload_listener(shadow_scorer.reset)
+# Process-pool workers hold their own model copies; new workers pick up a reload
+model_manager.add_reload_listener(inference_executor.recycle)
+
 def prepare_features(features: HealthFeatures) -> pd.DataFrame:
     """Convert features dict to pandas DataFrame with correct column names"""
-    # Create DataFrame with all 17 features matching model training
+    return prepare_features_batch([features])
+
+def prepare_features_batch(records: List[HealthFeatures]) -> pd.DataFrame:
+    """Build one N-row DataFrame with all 17 features matching model training"""
+    import pandas as pd
+    start = time.perf_counter()
     feature_dict = {
-        'age_years': [features.age_years],
-        'gender': [features.gender],
-        'height': [features.height],
-        'weight': [features.weight],
-        'ap_hi': [features.ap_hi],
-        'ap_lo': [features.ap_lo],
-        'cholesterol': [features.cholesterol],
-        'gluc': [features.gluc],
-        'smoke': [features.smoke],
-        'alco': [features.alco],
-        'active': [features.ACTIVE],  # lowercase column name
-        'bmi': [features.bmi],
-        'pulse_pressure': [features.pulse_pressure],
-        'age_group': [features.age_group],
-        'bmi_group': [features.bmi_group],
-        'smoke_age': [features.smoke_age],
-        'chol_bmi': [features.chol_bmi]
+        column: [getattr(features, field) for features in records]
+        for column, field in FEATURE_FIELDS.items()
+    }
+    X = pd.DataFrame(feature_dict)
+    observe_stage('prepare_features', time.perf_counter() - start)
+    return X
+
+def engineer_records(records: List[RawHealthFeatures]) -> List[HealthFeatures]:
+    """Full HealthFeatures for raw records, derived in one vectorized pass"""
+    import pandas as pd
+    start = time.perf_counter()
+    raw = pd.DataFrame({
+        column: [getattr(record, FEATURE_FIELDS[column]) for record in records]
+        for column in RAW_FEATURE_COLUMNS
+    })
+    rows = engineer_features(raw).to_dict('records')
+    features = [
+        HealthFeatures.model_construct(**{FEATURE_FIELDS[column]: value for column, value in row.items()})
+        for row in rows
+    ]
+    observe_stage('engineer_features', time.perf_counter() - start)
+    return features
+
+def records_from_rows(rows: list) -> List[FeatureRow]:
+    """FeatureRows for the rows returned by decode_features"""
+    return list(map(FeatureRow._make, rows))
+
+def build_prediction(output, row) -> dict:
+    """Format one row of ensemble output as a PredictionResponse dict"""
+    predictions = {
+        name: None if np.isnan(prob) else float(prob)
+        for name, prob in zip(BASE_MODELS, output.base[row])
+    }
+    stacked_prob = float(output.stacked[row])
+    return {
+        "base_predictions": predictions,
+        "stacked": {
+            "probability": stacked_prob,
+            "label": "High" if stacked_prob >= 0.5 else "Low"
+        },
+        "models_run": models_run(output, row),
+        "models_used": int(output.valid_count[row]),
+        "tier": CASCADE_TIER if exited_early(output, row) else output.tier
     }
-    return pd.DataFrame(feature_dict)
+
+def exited_early(output, row) -> bool:
+    """Whether a cascade stage answered the row without the full ensemble"""
+    return output.exit_stage is not None and output.exit_stage[row] >= 0
+
+def models_run(output, row) -> List[str]:
+    """Models that ran for one row: the cascade stage's models on an early exit"""
+    if exited_early(output, row):
+        return [name for name, prob in zip(BASE_MODELS, output.base[row]) if not np.isnan(prob)]
+    return [name for name in model_manager.models if name in output.timings]
+
+def production_models(output, result) -> set:
+    """
+    Models whose own output is in a result: those that ran, minus any that
+    failed (failures are counted per batch, so a failure anywhere in a
+    micro-batch excludes the model for every row of it)
+    """
+    return {name for name in result['models_run'] if name not in output.failures}
+
+def format_timings(timings: dict) -> dict:
+    """Per-model inference times in ms for logging, e.g. {'CatBoost': 3.1, ...}"""
+    return {
+        model_manager.display_names[name]: round(seconds * 1000, 1)
+        for name, seconds in timings.items()
+    }
+
+def build_fallback_prediction(features: HealthFeatures) -> dict:
+    """Rule-based prediction used when no model produced a result"""
+    return build_fallback_predictions([features])[0]
+
+def build_fallback_predictions(records: list) -> List[dict]:
+    """Rule-based predictions for many rows in one vectorized pass (see fallback.py)"""
+    risk = fallback_risk(*(
+        np.array([getattr(features, FEATURE_FIELDS[column]) for features in records])
+        for column in FALLBACK_COLUMNS
+    ))
+    base = fallback_base_predictions(risk).tolist()
+    return [
+        {
+            "base_predictions": dict(zip(BASE_MODELS, base_row)),
+            "stacked": {
+                "probability": risk_score,
+                "label": "High" if risk_score >= 0.5 else "Low"
+            },
+            "models_run": [],
+            "models_used": 0,
+            "tier": "fallback"
+        }
+        for base_row, risk_score in zip(base, risk.tolist())
+    ]
+
+def select_tier() -> str:
+    """Ensemble tier for a new request, from recent latency and queue depth"""
+    if slo_controller is None:
+        return 'full'
+    depth = inference_executor.pending
+    if micro_batcher is not None:
+        depth += micro_batcher.queue_depth()
+    return slo_controller.update(depth)
+
+async def run_inference(X: pd.DataFrame, tier: str = 'full'):
+    """Score X on the inference executor, mapping overload to HTTP errors"""
+    start = time.perf_counter()
+    try:
+        output = await inference_executor.run(run_model_ensemble, X, tier)
+        if slo_controller is not None:
+            slo_controller.record(time.perf_counter() - start, tier)
+        observe_ensemble(output)
+        return output
+    except ExecutorSaturated:
+        if slo_controller is not None:
+            slo_controller.record_overload(tier)
+        log.warning("Inference queue full, rejecting request")
+        raise HTTPException(
+            status_code=503,
+            detail="ML service is busy, please retry",
+            headers={"Retry-After": str(INFERENCE_RETRY_AFTER)}
+        )
+    except InferenceTimeout:
+        if slo_controller is not None:
+            slo_controller.record_overload(tier)
+        log.error("Inference timed out after %ss", inference_executor.timeout)
+        raise HTTPException(status_code=504, detail="Prediction timed out")
+
+async def score_records(items: list):
+    """Score a micro-batch of (features, tier) /predict calls with one ensemble pass"""
+    tier = most_degraded(tier for _, tier in items)
+    return await run_inference(prepare_features_batch([features for features, _ in items]), tier)
+
+# Collects concurrent /predict calls into batches when MICROBATCH_ENABLED is set
+micro_batcher = MicroBatcher(score_records) if MICROBATCH_ENABLED else None
+
+# Gauges read from live service state on each /metrics scrape
+registry.register(CallbackMetric(
+    'ml_queue_depth', 'Requests waiting or running per queue', ('queue',),
+    lambda: [(('inference',), inference_executor.pending)]
+    + ([(('microbatch',), micro_batcher.queue_depth())] if micro_batcher is not None else [])
+    + ([(('shadow',), shadow_scorer.pending())] if shadow_scorer is not None else [])
+))
+if shadow_scorer is not None:
+    registry.register(CallbackMetric(
+        'ml_shadow_dropped_total', 'Sampled requests dropped because the shadow queue was full', (),
+        lambda: [((), shadow_scorer.dropped)], kind='counter'
+    ))
+if slo_controller is not None:
+    registry.register(CallbackMetric(
+        'ml_degradation_tier', 'Ensemble tier for new requests (0 full, 1 subset, 2 fallback)', (),
+        lambda: [((), tier_code(slo_controller.tier))]
+    ))
+registry.register(CallbackMetric(
+    'ml_log_records_dropped_total', 'Log records dropped because the log queue was full', (),
+    lambda: [((), dropped_count())], kind='counter'
+))
+registry.register(CallbackMetric(
+    'ml_models_loaded', 'Models currently loaded (out of 6)', (),
+    lambda: [((), model_manager.get_loaded_count())]
+))
+registry.register(CallbackMetric(
+    'ml_model_load_seconds', 'Time taken to load each model', ('model',),
+    lambda: [((name,), seconds) for name, seconds in model_manager.load_times.items()]
+))
+registry.register(CallbackMetric(
+    'ml_memory_after_load_bytes', 'Process RSS measured right after model loading', (),
+    lambda: [((), model_manager.rss_after_load_mb * 1024 * 1024
+              if model_manager.rss_after_load_mb is not None else None)]
+))
+if prediction_cache is not None:
+    registry.register(CallbackMetric(
+        'ml_cache_events_total', 'Prediction cache lookups and evictions', ('event',),
+        lambda: [((event,), prediction_cache.stats()[event]) for event in ('hits', 'misses', 'evictions')],
+        kind='counter'
+    ))
+    registry.register(CallbackMetric(
+        'ml_cache_entries', 'Entries in the prediction cache', (),
+        lambda: [((), prediction_cache.stats()['entries'])]
+    ))
 
 @app.get("/")
 async def root():
@@ -158,16 +515,28 @@ async def root():
         },
         "endpoints": {
             "health": "/health",
-            "predict": "/predict"
+            "predict": "/predict",
+            "predict_batch": "/predict/batch",
+            "predict_raw": "/predict/raw",
+            "predict_raw_batch": "/predict/raw/batch",
+            "metrics": "/metrics"
         }
     }
 
 @app.get("/health")
 async def health():
-    """Health check with model status"""
+    """Health check with model status; 503 until the models are loaded and warmed up"""
+    if not startup_state.ready:
+        return JSONResponse(status_code=503, content={
+            "status": "starting",
+            "message": "ML service is loading and warming up the models",
+            "ready": False,
+            "startup": startup_state.stats()
+        })
     models_loaded = model_manager.models_loaded()
     return {
         "status": "healthy" if models_loaded else "degraded",
+        "ready": True,
         "message": "ML service is running",
         "models_loaded": models_loaded,
         "models": {
@@ -179,159 +548,310 @@ async def health():
             "Stacking": model_manager.models['stacking'] is not None
         },
         "python_version": "3.11",
-        "mode": "trained_models" if models_loaded else "fallback_mock"
+        "mode": "trained_models" if models_loaded else "fallback_mock",
+        "inference": {
+            "executor": inference_executor.kind,
+            "workers": inference_executor.workers,
+            "pending": inference_executor.pending
+        },
+        "microbatch": micro_batcher.stats() if micro_batcher is not None else {"enabled": False},
+        "cache": prediction_cache.stats() if prediction_cache is not None else {"enabled": False},
+        "cascade": {
+            "enabled": CASCADE_ENABLED,
+            "active": model_manager.cascade_plan is not None
+        },
+        "degradation": slo_controller.stats() if slo_controller is not None else {"enabled": False},
+        "shadow": shadow_scorer.stats() if shadow_scorer is not None else {"enabled": False},
+        "startup": startup_state.stats()
     }
 
-@app.post("/predict", response_model=PredictionResponse)
+async def reload_models():
+    """Reload the models off the event loop; requests keep being served meanwhile"""
+    try:
+        result = await asyncio.to_thread(model_manager.reload)
+    except ReloadInProgress:
+        log.warning("Model reload already in progress")
+        return None
+    except Exception as e:
+        log.exception("Model reload failed: %s", e)
+        MODEL_RELOADS.labels('failed').inc()
+        return {"status": "failed", "reason": str(e)}
+    MODEL_RELOADS.labels(result["status"]).inc()
+    return result
+
+@app.post("/admin/reload")
+async def admin_reload(x_admin_token: str = Header(default="")):
+    """Load the model files again and swap them in without dropping requests"""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled (ADMIN_TOKEN not set)")
+    if not hmac.compare_digest(x_admin_token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+    
+    result = await reload_models()
+    if result is None:
+        raise HTTPException(status_code=409, detail="A model reload is already in progress")
+    if result["status"] != "reloaded":
+        raise HTTPException(status_code=422, detail=f"Model reload {result['status']}: {result['reason']}")
+    return result
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus metrics in text exposition format"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.post("/predict", response_model=PredictionResponse, response_class=TimedJSONResponse)
 async def predict(features: HealthFeatures):
     """
     Run prediction using 5 base models + stacking ensemble
     Handles missing/corrupted models gracefully
     """
+    observe_parse()
+    return await predict_features(features)
+
+@app.post("/predict/raw", response_model=PredictionResponse, response_class=TimedJSONResponse)
+async def predict_raw(raw: RawHealthFeatures):
+    """Same as /predict, with the engineered features derived server-side"""
+    observe_parse()
+    check_ready()
+    return await predict_features(engineer_records([raw])[0])
+
+async def predict_features(features: HealthFeatures) -> dict:
+    """Score one record (cache, micro-batching, fallback) as a PredictionResponse dict"""
+    check_ready()
     try:
-        # Prepare feature DataFrame
-        X = prepare_features(features)
-        print(f"[INFO] Input features: {X.to_dict()}")
+        # Repeat inputs are answered from the cache without touching a model
+        cache_key = None
+        if prediction_cache is not None:
+            cache_key = prediction_cache.make_key(features)
+            cache_generation = prediction_cache.generation
+            cached = prediction_cache.get(cache_key)
+            if cached is not None:
+                observe_cache_hits([cached])
+                return cached
+        
+        # Under load, new requests may skip the models entirely
+        tier = select_tier()
+        if tier == 'fallback' and model_manager.get_loaded_count() > 0:
+            FALLBACK_PREDICTIONS.labels('degraded').inc()
+            PREDICTION_TIERS.labels('fallback').inc()
+            return build_fallback_prediction(features)
+        
+        if log.isEnabledFor(logging.DEBUG):
+            # Raw health data - only written when debug logging is on
+            log.debug("Input features", extra={'fields': {
+                'features': {field: getattr(features, field) for field in FEATURE_FIELDS.values()}
+            }})
         
         # Check if any models are loaded
         if model_manager.get_loaded_count() > 0:
-            # Get models (some may be None)
-            model1, model2, model3, model4, model5, stacking_model = model_manager.get_models()
-            
-            # Initialize predictions dictionary
-            predictions = {}
-            
-            # Try each model individually with error handling
-            try:
-                if model1 is not None:
-                    predictions['model1'] = float(model1.predict_proba(X)[0][1])
-                else:
-                    predictions['model1'] = None
-            except Exception as e:
-                print(f"[ERROR] CatBoost prediction failed: {e}")
-                predictions['model1'] = None
-            
-            try:
-                if model2 is not None:
-                    predictions['model2'] = float(model2.predict_proba(X)[0][1])
-                else:
-                    predictions['model2'] = None
-            except Exception as e:
-                print(f"[ERROR] LightGBM prediction failed: {e}")
-                predictions['model2'] = None
-            
-            try:
-                if model3 is not None:
-                    predictions['model3'] = float(model3.predict_proba(X)[0][1])
-                else:
-                    predictions['model3'] = None
-            except Exception as e:
-                print(f"[ERROR] LogisticRegression prediction failed: {e}")
-                predictions['model3'] = None
-            
-            try:
-                if model4 is not None:
-                    predictions['model4'] = float(model4.predict_proba(X)[0][1])
-                else:
-                    predictions['model4'] = None
-            except Exception as e:
-                print(f"[ERROR] RandomForest prediction failed: {e}")
-                predictions['model4'] = None
-            
-            try:
-                if model5 is not None:
-                    predictions['model5'] = float(model5.predict_proba(X)[0][1])
-                else:
-                    predictions['model5'] = None
-            except Exception as e:
-                print(f"[ERROR] XGBoost prediction failed: {e}")
-                predictions['model5'] = None
-            
-            # Calculate average from available predictions
-            valid_predictions = [p for p in predictions.values() if p is not None]
+            if micro_batcher is not None:
+                # score_records builds one frame for the whole batch
+                X = None
+                output, row = await micro_batcher.submit((features, tier))
+            else:
+                X = prepare_features(features)
+                output, row = await run_inference(X, tier), 0
+            valid_count = int(output.valid_count[row])
             
-            if len(valid_predictions) > 0:
-                avg_prob = sum(valid_predictions) / len(valid_predictions)
-                
-                # Try stacking model, fallback to average if fails
-                try:
-                    if stacking_model is not None:
-                        stacked_prob = float(stacking_model.predict_proba(X)[0][1])
-                    else:
-                        stacked_prob = avg_prob
-                except Exception as e:
-                    print(f"[ERROR] Stacking model prediction failed: {e}")
-                    stacked_prob = avg_prob
-                
-                stacked_label = "High" if stacked_prob >= 0.5 else "Low"
-                
-                # Fill missing predictions with average
-                for key in predictions:
-                    if predictions[key] is None:
-                        predictions[key] = avg_prob
+            if valid_count > 0:
+                result = build_prediction(output, row)
                 
-                print(f"[INFO] Predictions:")
-                print(f"   CatBoost: {predictions['model1']:.3f}, LightGBM: {predictions['model2']:.3f}, LogReg: {predictions['model3']:.3f}")
-                print(f"   RandomForest: {predictions['model4']:.3f}, XGBoost: {predictions['model5']:.3f}")
-                print(f"   Stacking: {stacked_label} ({stacked_prob:.3f})")
-                print(f"[INFO] Used {len(valid_predictions)} working model(s)")
+                if sampled(log):
+                    log.info("Prediction", extra={'fields': {
+                        'base_predictions': {
+                            model_manager.display_names[name]: round(prob, 3)
+                            for name, prob in result["base_predictions"].items()
+                            if prob is not None
+                        },
+                        'stacked': round(result['stacked']['probability'], 3),
+                        'label': result['stacked']['label'],
+                        'models_used': valid_count,
+                        'models_run': result['models_run'],
+                        'tier': result['tier'],
+                        'timings_ms': format_timings(output.timings)
+                    }})
                 
-                return {
-                    "base_predictions": predictions,
-                    "stacked": {
-                        "probability": stacked_prob,
-                        "label": stacked_label
-                    }
-                }
+                # Only full-ensemble results are cached, never degraded ones
+                if cache_key is not None and valid_count == len(BASE_MODELS):
+                    prediction_cache.put(cache_key, result, cache_generation)
+                # Candidates are compared with the full ensemble only, never with a
+                # cascade early exit; the queue is bounded and never blocks, so
+                # this adds no response latency
+                if shadow_scorer is not None and result['tier'] == 'full':
+                    shadow_scorer.submit(
+                        (lambda: X) if X is not None else (lambda: prepare_features(features)),
+                        result, production_models(output, result),
+                        output.timings if len(output.valid_count) == 1 else None
+                    )
+                PREDICTION_TIERS.labels(result['tier']).inc()
+                return result
             else:
                 # All models failed, use fallback
-                print("[WARNING] All models failed, using fallback prediction")
-                risk_score = calculate_fallback_risk(features)
-                label = "High" if risk_score >= 0.5 else "Low"
-                
-                return {
-                    "base_predictions": {
-                        "model1": float(risk_score * 0.95),
-                        "model2": float(risk_score * 1.05),
-                        "model3": float(risk_score * 0.98),
-                        "model4": float(risk_score * 1.02),
-                        "model5": float(risk_score)
-                    },
-                    "stacked": {
-                        "probability": float(risk_score),
-                        "label": label
-                    }
-                }
+                log.warning("All models failed, using fallback prediction")
+                FALLBACK_PREDICTIONS.labels('all_models_failed').inc()
+                PREDICTION_TIERS.labels('fallback').inc()
+                return build_fallback_prediction(features)
         else:
             # No models loaded, use fallback
-            print("[WARNING] No models loaded, using fallback prediction")
-            risk_score = calculate_fallback_risk(features)
-            label = "High" if risk_score >= 0.5 else "Low"
-            
-            return {
-                "base_predictions": {
-                    "model1": float(risk_score * 0.95),
-                    "model2": float(risk_score * 1.05),
-                    "model3": float(risk_score * 0.98),
-                    "model4": float(risk_score * 1.02),
-                    "model5": float(risk_score)
-                },
-                "stacked": {
-                    "probability": float(risk_score),
-                    "label": label
-                }
-            }
+            log.warning("No models loaded, using fallback prediction")
+            FALLBACK_PREDICTIONS.labels('no_models_loaded').inc()
+            PREDICTION_TIERS.labels('fallback').inc()
+            return build_fallback_prediction(features)
         
     except HTTPException:
         raise
     except Exception as e:
-        print(f"[ERROR] Prediction error: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        log.exception("Prediction error: %s", e)
         raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
 
+@app.post("/predict/batch", response_model=BatchPredictionResponse, response_class=TimedJSONResponse)
+async def predict_batch(request: BatchPredictionRequest):
+    """
+    Run prediction for N records with one pass of each model over an N-row DataFrame
+    Rows where every model fails get the same rule-based fallback as /predict
+    """
+    observe_parse()
+    return await predict_records(request.records)
+
+@app.post("/predict/raw/batch", response_model=BatchPredictionResponse, response_class=TimedJSONResponse)
+async def predict_raw_batch(request: RawBatchPredictionRequest):
+    """Same as /predict/batch, with the engineered features derived server-side"""
+    observe_parse()
+    check_ready()
+    check_batch_size(request.records)
+    return await predict_records(engineer_records(request.records))
+
+async def predict_compact(request: Request, batch: bool) -> Response:
+    """
+    /predict and /predict/batch for callers using the compact format on the
+    request side, the response side, or both (see wire.py)
+    """
+    body = await request.body()
+    if accepts(request.headers.get('content-type'), FEATURES_MEDIA_TYPE):
+        try:
+            records = records_from_rows(decode_features(body))
+        except WireFormatError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        if not batch and len(records) != 1:
+            raise HTTPException(status_code=422, detail=f"/predict takes one row, got {len(records)}")
+    else:
+        try:
+            if batch:
+                records = BatchPredictionRequest.model_validate_json(body).records
+            else:
+                records = [HealthFeatures.model_validate_json(body)]
+        except ValidationError as e:
+            # Same error locations as the JSON routes, where the model is the body
+            raise RequestValidationError([
+                {**error, 'loc': ('body', *error['loc'])} for error in e.errors(include_url=False)
+            ])
+    observe_parse()
+    
+    if batch:
+        results = (await predict_records(records))["predictions"]
+    else:
+        results = [await predict_features(records[0])]
+    
+    if not accepts(request.headers.get('accept'), SCORES_MEDIA_TYPE):
+        return TimedJSONResponse({"predictions": results} if batch else results[0])
+    start = time.perf_counter()
+    content = encode_scores(results)
+    observe_stage('serialize', time.perf_counter() - start)
+    return Response(content, media_type=SCORES_MEDIA_TYPE)
+
+CompactRoute.compact_endpoints.update({
+    "/predict": lambda request: predict_compact(request, batch=False),
+    "/predict/batch": lambda request: predict_compact(request, batch=True)
+})
+
+def check_ready():
+    """Predict endpoints answer 503 until startup (loading and warm-up) has finished"""
+    if not startup_state.ready:
+        raise HTTPException(
+            status_code=503,
+            detail="ML service is starting, please retry",
+            headers={"Retry-After": str(INFERENCE_RETRY_AFTER)}
+        )
+
+def check_batch_size(records: list):
+    if len(records) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large: {len(records)} records (max {MAX_BATCH_SIZE})"
+        )
+
+async def predict_records(records: List[HealthFeatures]) -> dict:
+    """Score N records as a BatchPredictionResponse dict"""
+    check_ready()
+    check_batch_size(records)
+    
+    try:
+        # Answer repeated records from the cache and score only the misses
+        if prediction_cache is not None:
+            cache_keys = [prediction_cache.make_key(features) for features in records]
+            cache_generation = prediction_cache.generation
+            results = [prediction_cache.get(key) for key in cache_keys]
+        else:
+            cache_keys = [None] * len(records)
+            results = [None] * len(records)
+        misses = [i for i, result in enumerate(results) if result is None]
+        if len(misses) < len(records):
+            observe_cache_hits(result for result in results if result is not None)
+        
+        output = None
+        tier = select_tier() if misses else 'full'
+        if misses and model_manager.get_loaded_count() > 0 and tier != 'fallback':
+            X = prepare_features_batch([records[i] for i in misses])
+            output = await run_inference(X, tier)
+        elif misses and tier != 'fallback':
+            log.warning("No models loaded, using fallback prediction")
+        
+        fallback = []
+        scored_tiers = {}
+        for row, i in enumerate(misses):
+            if output is not None and output.valid_count[row] > 0:
+                results[i] = build_prediction(output, row)
+                scored_tiers[results[i]['tier']] = scored_tiers.get(results[i]['tier'], 0) + 1
+                if cache_keys[i] is not None and output.valid_count[row] == len(BASE_MODELS):
+                    prediction_cache.put(cache_keys[i], results[i], cache_generation)
+            else:
+                fallback.append(i)
+        # Rule-based scores for every row no model could score, in one pass
+        if fallback:
+            for i, result in zip(fallback, build_fallback_predictions([records[i] for i in fallback])):
+                results[i] = result
+        fallback_rows = len(fallback)
+        
+        if fallback_rows:
+            if tier == 'fallback':
+                reason = 'degraded'
+            else:
+                reason = 'no_models_loaded' if output is None else 'all_models_failed'
+            FALLBACK_PREDICTIONS.labels(reason).inc(fallback_rows)
+            PREDICTION_TIERS.labels('fallback').inc(fallback_rows)
+        for scored_tier, rows in scored_tiers.items():
+            PREDICTION_TIERS.labels(scored_tier).inc(rows)
+        if sampled(log):
+            log.info("Batch prediction", extra={'fields': {
+                'rows': len(records),
+                'cached': len(records) - len(misses),
+                'fallback': fallback_rows,
+                'tier': tier,
+                'timings_ms': format_timings(output.timings) if output is not None else {}
+            }})
+        return {"predictions": results}
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        log.exception("Batch prediction error: %s", e)
+        raise HTTPException(status_code=500, detail=f"Batch prediction failed: {str(e)}")
+
 def calculate_fallback_risk(features: HealthFeatures) -> float:
-    """Calculate risk score using rule-based approach when models aren't available"""
+    """
+    Scalar rule-based risk score; scoring uses fallback.fallback_risk, this is
+    the reference it is checked against (tests/test_fallback.py)
+    """
     risk_score = 0.0
     
     # Age risk (0-0.25)
@@ -395,6 +915,9 @@ if __name__ == "__main__":
     print(f"📊 Models loaded: {len([m for m in model_manager.models.values() if m is not None])}/6")
     print(f"🌐 Health: http://0.0.0.0:{port}/health")
     print(f"🔮 Predict: http://0.0.0.0:{port}/predict")
+    print(f"📦 Batch: http://0.0.0.0:{port}/predict/batch")
+    print(f"🧮 Raw input: http://0.0.0.0:{port}/predict/raw")
+    print(f"📈 Metrics: http://0.0.0.0:{port}/metrics")
     print(f"{'='*60}\n")
     
     import uvicorn
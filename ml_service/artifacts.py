@@ -0,0 +1,434 @@
+"""
+Checksum-verified model artifact store.
+
+A manifest (manifest.json in MODEL_DIR) lists every model file with its
+sha256 and size. When it exists, ModelManager loads the files it names and
+refuses any file whose size or hash does not match. With ARTIFACT_SOURCE
+set, missing or changed files are fetched from a local directory or an HTTP
+server before loading; files that already match the manifest are not
+downloaded again.
+
+The convert step stores each fitted CatBoost, XGBoost and LightGBM estimator
+in the library's native format (.cbm, .ubj, LightGBM model text), with the
+sklearn parts of the pipeline (preprocessing, stacker) in a separate joblib
+file that references them:
+
+    python artifacts.py convert --models ./models --output ./models_native
+    python artifacts.py manifest --models ./models   # hashes only, no conversion
+    python artifacts.py verify --models ./models_native
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import sys
+import time
+import urllib.parse
+import urllib.request
+from datetime import datetime, timezone
+from joblib.numpy_pickle import NumpyPickler, NumpyUnpickler
+from logs import get_logger
+
+# Where to fetch artifacts from: a directory, file:// or http(s):// URL (unset: local files only)
+ARTIFACT_SOURCE = os.getenv('ARTIFACT_SOURCE', '')
+# Manifest file name, in MODEL_DIR and at ARTIFACT_SOURCE
+ARTIFACT_MANIFEST = os.getenv('ARTIFACT_MANIFEST', 'manifest.json')
+# Check of each file against the manifest on load: sha256, size or off
+ARTIFACT_VERIFY = os.getenv('ARTIFACT_VERIFY', 'sha256').lower()
+# Seconds before an HTTP fetch gives up
+ARTIFACT_FETCH_TIMEOUT = float(os.getenv('ARTIFACT_FETCH_TIMEOUT', 60))
+
+MANIFEST_VERSION = 1
+# Native file extension per estimator library
+NATIVE_FORMATS = {'catboost': 'cbm', 'xgboost': 'ubj', 'lightgbm': 'txt'}
+
+log = get_logger('artifacts')
+
+
+class ArtifactError(Exception):
+    """Raised for a missing, corrupt or unfetchable artifact"""
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def file_record(path):
+    return {'sha256': file_sha256(path), 'size': os.path.getsize(path)}
+
+
+def read_manifest(models_dir):
+    """The manifest in models_dir, or None if there is none"""
+    path = os.path.join(models_dir, ARTIFACT_MANIFEST)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        manifest = json.load(f)
+    if manifest.get('version') != MANIFEST_VERSION:
+        raise ArtifactError(f"{path}: unsupported manifest version {manifest.get('version')!r}")
+    return manifest
+
+
+def write_manifest(models_dir, manifest):
+    path = os.path.join(models_dir, ARTIFACT_MANIFEST)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+def artifact_path(models_dir, name):
+    """Path of a manifest file name in models_dir; names must be plain file names"""
+    separators = {'/', os.sep, os.altsep} - {None}
+    if (not isinstance(name, str) or name in ('', '.', '..') or os.path.isabs(name)
+            or any(separator in name for separator in separators)):
+        raise ArtifactError(f"invalid artifact name {name!r} in manifest")
+    return os.path.join(models_dir, name)
+
+
+def verify_file(models_dir, name, record, mode=ARTIFACT_VERIFY):
+    """Raise ArtifactError unless the local file matches its manifest record"""
+    path = artifact_path(models_dir, name)
+    if not os.path.exists(path):
+        raise ArtifactError(f"{name} is missing")
+    if mode == 'off':
+        return
+    size = os.path.getsize(path)
+    if size != record['size']:
+        raise ArtifactError(f"{name} is {size} bytes, manifest says {record['size']}")
+    if mode == 'sha256' and file_sha256(path) != record['sha256']:
+        raise ArtifactError(f"{name} does not match its manifest sha256")
+
+
+def verify_model(models_dir, manifest, model_name, mode=ARTIFACT_VERIFY):
+    for name in manifest['models'][model_name]['files']:
+        verify_file(models_dir, name, manifest['files'][name], mode)
+
+
+# ---------------------------------------------------------------------------
+# Fetch backends
+# ---------------------------------------------------------------------------
+
+class LocalDirectoryBackend:
+    """Artifacts in a local (or mounted) directory"""
+
+    def __init__(self, root):
+        self.root = root
+
+    def open(self, name):
+        try:
+            return open(os.path.join(self.root, name), 'rb')
+        except OSError as e:
+            raise ArtifactError(f"cannot read {name} from {self.root}: {e}") from e
+
+
+class HTTPBackend:
+    """Artifacts served under a base URL (GET <base>/<name>)"""
+
+    def __init__(self, base_url, timeout=ARTIFACT_FETCH_TIMEOUT):
+        self.base_url = base_url.rstrip('/') + '/'
+        self.timeout = timeout
+
+    def open(self, name):
+        url = urllib.parse.urljoin(self.base_url, urllib.parse.quote(name))
+        try:
+            return urllib.request.urlopen(url, timeout=self.timeout)
+        except OSError as e:
+            raise ArtifactError(f"cannot fetch {url}: {e}") from e
+
+
+# URL scheme -> backend class taking the source string; register others here
+FETCH_BACKENDS = {
+    'file': lambda source: LocalDirectoryBackend(urllib.parse.urlparse(source).path),
+    'http': HTTPBackend,
+    'https': HTTPBackend
+}
+
+
+def fetch_backend(source):
+    scheme = urllib.parse.urlparse(source).scheme
+    if not scheme or len(scheme) == 1:  # plain path (or a Windows drive letter)
+        return LocalDirectoryBackend(source)
+    if scheme not in FETCH_BACKENDS:
+        raise ArtifactError(f"no fetch backend for {scheme}:// sources")
+    return FETCH_BACKENDS[scheme](source)
+
+
+def fetch_file(backend, name, record, models_dir):
+    """Download one file to models_dir, checking size and sha256 before it replaces the old one"""
+    path = artifact_path(models_dir, name)
+    partial = path + '.part'
+    digest = hashlib.sha256()
+    size = 0
+    with backend.open(name) as source, open(partial, 'wb') as f:
+        for block in iter(lambda: source.read(1024 * 1024), b''):
+            digest.update(block)
+            size += len(block)
+            f.write(block)
+    if size != record['size'] or digest.hexdigest() != record['sha256']:
+        os.remove(partial)
+        raise ArtifactError(f"fetched {name} does not match the manifest ({size} bytes)")
+    os.replace(partial, path)
+    return size
+
+
+def sync_artifacts(source, models_dir):
+    """
+    Bring models_dir up to date with the manifest at source. Files whose
+    local copy already matches are kept; the manifest is written last, so an
+    interrupted sync leaves the previous manifest in place.
+    """
+    backend = fetch_backend(source)
+    with backend.open(ARTIFACT_MANIFEST) as f:
+        manifest = json.loads(f.read())
+    if manifest.get('version') != MANIFEST_VERSION:
+        raise ArtifactError(f"unsupported manifest version {manifest.get('version')!r} at {source}")
+    # Check every name before anything is written
+    for name in manifest['files']:
+        artifact_path(models_dir, name)
+
+    summary = {'fetched': 0, 'unchanged': 0, 'bytes': 0}
+    for name, record in manifest['files'].items():
+        try:
+            verify_file(models_dir, name, record, mode='sha256')
+            summary['unchanged'] += 1
+            continue
+        except ArtifactError:
+            pass
+        log.info("⬇ Fetching %s (%.2f MB)...", name, record['size'] / (1024 * 1024))
+        summary['bytes'] += fetch_file(backend, name, record, models_dir)
+        summary['fetched'] += 1
+    write_manifest(models_dir, manifest)
+    return summary
+
+
+# ---------------------------------------------------------------------------
+# Native-format persistence
+# ---------------------------------------------------------------------------
+
+def native_library(obj):
+    """Library name if obj is a fitted estimator with a native format, else None"""
+    library = type(obj).__module__.split('.')[0]
+    if library not in NATIVE_FORMATS:
+        return None
+    try:
+        if library == 'catboost':
+            return library if obj.is_fitted() else None
+        if library == 'xgboost':
+            obj.get_booster()
+            return library
+        return library if getattr(obj, 'fitted_', False) else None
+    except Exception:
+        return None
+
+
+class NativePickler(NumpyPickler):
+    """joblib pickler that writes booster estimators to native files and references them"""
+
+    def __init__(self, fobj, directory, stem):
+        super().__init__(fobj)
+        self.directory = directory
+        self.stem = stem
+        self.native_files = []
+        self._saved = {}
+
+    def save(self, obj, save_persistent_id=True):
+        # NumpyPickler.save lacks the argument pickle uses to write the references themselves
+        if not save_persistent_id:
+            return pickle._Pickler.save(self, obj, save_persistent_id=False)
+        return super().save(obj)
+
+    def persistent_id(self, obj):
+        library = native_library(obj)
+        if library is None:
+            return None
+        if id(obj) in self._saved:
+            return self._saved[id(obj)]
+
+        name = f"{self.stem}.{len(self.native_files)}.{NATIVE_FORMATS[library]}"
+        path = os.path.join(self.directory, name)
+        if library == 'catboost':
+            obj.save_model(path, format='cbm')
+            state = None
+        else:
+            # Everything but the booster stays in the pickle (classes, params, ...)
+            booster = obj.get_booster() if library == 'xgboost' else obj.booster_
+            booster.save_model(path)
+            state = {key: value for key, value in vars(obj).items() if key != '_Booster'}
+        self.native_files.append(name)
+        self._saved[id(obj)] = (library, type(obj).__name__, name, state)
+        return self._saved[id(obj)]
+
+
+class NativeUnpickler(NumpyUnpickler):
+    """Counterpart of NativePickler: rebuilds estimators from their native files"""
+
+    def __init__(self, filename, fobj, mmap_mode=None):
+        super().__init__(filename, fobj, mmap_mode=mmap_mode)
+        self.directory = os.path.dirname(filename)
+        self._loaded = {}
+
+    def persistent_load(self, pid):
+        library, class_name, name, state = pid
+        if name not in self._loaded:
+            self._loaded[name] = load_native(library, class_name, os.path.join(self.directory, name), state)
+        return self._loaded[name]
+
+
+def load_native(library, class_name, path, state):
+    if library == 'catboost':
+        import catboost
+        model = getattr(catboost, class_name)()
+        model.load_model(path, format='cbm')
+        return model
+    if library == 'xgboost':
+        import xgboost
+        cls = getattr(xgboost, class_name)
+        booster = xgboost.Booster()
+        booster.load_model(path)
+    else:
+        import lightgbm
+        cls = getattr(lightgbm, class_name)
+        booster = lightgbm.Booster(model_file=path)
+        booster.best_iteration = state.get('_best_iteration') or 0
+    model = cls.__new__(cls)
+    model.__dict__.update(state)
+    model._Booster = booster
+    return model
+
+
+def dump_native(model, directory, stem):
+    """Write model as <stem>.skl.joblib plus native booster files; returns the file names"""
+    entry = f"{stem}.skl.joblib"
+    with open(os.path.join(directory, entry), 'wb') as f:
+        pickler = NativePickler(f, directory, stem)
+        pickler.dump(model)
+    return [entry] + pickler.native_files
+
+
+def load_artifact(models_dir, entry, mmap_mode=None):
+    """Load a model from its manifest entry"""
+    path = artifact_path(models_dir, entry['entry'])
+    # compact: joblib file written by compaction.py
+    if entry['format'] in ('joblib', 'compact'):
+        import joblib
+        return joblib.load(path, mmap_mode=mmap_mode)
+    with open(path, 'rb') as f:
+        return NativeUnpickler(path, f, mmap_mode=mmap_mode).load()
+
+
+# ---------------------------------------------------------------------------
+# Offline conversion
+# ---------------------------------------------------------------------------
+
+def build_manifest(directory, models):
+    """Manifest for `models` ({model_name: entry without hashes}) stored in directory"""
+    files = {}
+    for entry in models.values():
+        for name in entry['files']:
+            files[name] = file_record(os.path.join(directory, name))
+    return {
+        'version': MANIFEST_VERSION,
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'files': files,
+        'models': models
+    }
+
+
+def convert_models(manager, output_dir, X_ref, native=True, tolerance=None):
+    """
+    Convert every model file of `manager` into output_dir and write the
+    manifest. Models without a native-format estimator are copied as they
+    are. Each converted model must reproduce the original predict_proba on
+    X_ref within tolerance. Returns a report row per model.
+    """
+    import joblib
+    import numpy as np
+    os.makedirs(output_dir, exist_ok=True)
+    same_dir = os.path.abspath(output_dir) == os.path.abspath(manager.models_dir)
+    entries, report = {}, []
+    for model_name, filename in manager.filenames.items():
+        source = os.path.join(manager.models_dir, filename)
+        if not os.path.exists(source):
+            log.warning("Skipping %s: %s not found", manager.display_names[model_name], source)
+            continue
+        start = time.perf_counter()
+        model = joblib.load(source)
+        source_seconds = time.perf_counter() - start
+        entry = {'format': 'joblib', 'entry': filename, 'files': [filename],
+                 'source': filename, 'source_sha256': file_sha256(source)}
+
+        if native:
+            stem = os.path.splitext(filename)[0]
+            files = dump_native(model, output_dir, stem)
+            if len(files) > 1:
+                entry.update(format='native', entry=files[0], files=files)
+            else:
+                os.remove(os.path.join(output_dir, files[0]))
+        if entry['format'] == 'joblib' and not same_dir:
+            shutil.copyfile(source, os.path.join(output_dir, filename))
+
+        start = time.perf_counter()
+        converted = load_artifact(output_dir, entry)
+        converted_seconds = time.perf_counter() - start
+        error = float(np.max(np.abs(converted.predict_proba(X_ref) - model.predict_proba(X_ref))))
+        if tolerance is not None and not error <= tolerance:
+            raise ArtifactError(f"{manager.display_names[model_name]} differs after conversion (max error {error:.2e})")
+        entries[model_name] = entry
+        report.append({
+            'model': model_name, 'format': entry['format'], 'files': len(entry['files']),
+            'mb': sum(os.path.getsize(os.path.join(output_dir, name)) for name in entry['files']) / (1024 * 1024),
+            'joblib_load_s': source_seconds, 'load_s': converted_seconds, 'max_error': error
+        })
+
+    write_manifest(output_dir, build_manifest(output_dir, entries))
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=['convert', 'manifest', 'verify'])
+    parser.add_argument('--models', help="model directory (default: MODEL_DIR or ./models)")
+    parser.add_argument('--output', help="convert: output directory (default: --models)")
+    args = parser.parse_args()
+    if args.models:
+        os.environ['MODEL_DIR'] = args.models
+
+    if args.command == 'verify':
+        models_dir = os.getenv('MODEL_DIR', './models')
+        manifest = read_manifest(models_dir)
+        if manifest is None:
+            sys.exit(f"No {ARTIFACT_MANIFEST} in {models_dir}")
+        failures = 0
+        for name, record in manifest['files'].items():
+            try:
+                verify_file(models_dir, name, record, mode='sha256')
+                print(f"ok      {name}")
+            except ArtifactError as e:
+                failures += 1
+                print(f"FAILED  {e}")
+        return 1 if failures else 0
+
+    from model_loader import ModelManager, import_estimator_modules
+    from fastpath import PARITY_TOLERANCE, load_reference_data
+    import_estimator_modules()
+    manager = ModelManager()
+    output_dir = args.output or manager.models_dir
+    report = convert_models(manager, output_dir, load_reference_data(),
+                            native=args.command == 'convert', tolerance=PARITY_TOLERANCE)
+    for row in report:
+        print(f"{manager.display_names[row['model']]:<22} {row['format']:<7} {row['files']} file(s) "
+              f"{row['mb']:>8.2f} MB  load {row['joblib_load_s']:.3f}s -> {row['load_s']:.3f}s  "
+              f"max error {row['max_error']:.1e}")
+    print(f"[INFO] Manifest written to {os.path.join(output_dir, ARTIFACT_MANIFEST)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+"""
+Dynamic micro-batching for single-row /predict traffic.
+Concurrent calls are collected for up to MICROBATCH_MAX_WAIT_MS (or until
+MICROBATCH_MAX_SIZE calls are waiting) and scored with one ensemble pass.
+"""
+
+import asyncio
+import os
+
+MICROBATCH_ENABLED = os.getenv('MICROBATCH_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+MICROBATCH_MAX_SIZE = int(os.getenv('MICROBATCH_MAX_SIZE', 32))
+MICROBATCH_MAX_WAIT_MS = float(os.getenv('MICROBATCH_MAX_WAIT_MS', 5))
+
+
+class MicroBatcher:
+    """
+    Groups concurrent submit() calls into batches for `run_batch`.
+    `run_batch(items)` is a coroutine returning one result for the whole
+    batch; each caller receives (result, index of its item in the batch).
+    """
+
+    def __init__(self, run_batch, max_batch_size=MICROBATCH_MAX_SIZE,
+                 max_wait_ms=MICROBATCH_MAX_WAIT_MS):
+        self.run_batch = run_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000
+        self.batches = 0
+        self.items = 0
+        self._pending = []
+        self._timer = None
+        self._tasks = set()
+
+    async def submit(self, item):
+        """Queue one item and wait for its batch to be scored"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch):
+        self.batches += 1
+        self.items += len(batch)
+        try:
+            result = await self.run_batch([item for item, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for index, (_, future) in enumerate(batch):
+            # Callers that went away (client disconnect) are already cancelled
+            if not future.done():
+                future.set_result((result, index))
+
+    async def close(self):
+        """Score anything still waiting and let in-flight batches finish"""
+        self._flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def queue_depth(self):
+        """Calls waiting for the current batch to be flushed"""
+        return len(self._pending)
+
+    def stats(self):
+        """Batch counters for /health"""
+        return {
+            "enabled": True,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches": self.batches,
+            "requests": self.items,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0
+        }
@@ -0,0 +1,584 @@
+"""
+Latency/throughput benchmark for the ML service.
+Measures model load time, single-row latency per model and for the whole
+ensemble, batch throughput across batch sizes, request parse + response
+serialize cost of the JSON and compact wire formats, and end-to-end HTTP
+latency through the FastAPI app, on synthetic HealthFeatures rows.
+--thread-budget also measures /predict p99 against concurrency with the
+libraries' default thread pools (MODEL_THREADS=off) and with per-model thread
+budgets (MODEL_THREADS=auto); --startup measures time to first byte, time to
+ready and first-request latency of a fresh server per startup configuration.
+Results are written as JSON so runs can be compared:
+
+    python benchmark.py --standin --output before.json      # train stand-in models first
+    python benchmark.py --models ./models --output after.json
+    python benchmark.py --compare before.json after.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import http.client
+from datetime import datetime, timezone
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+# Settings that change performance, recorded with every run
+RECORDED_SETTINGS = [
+    'MODEL_LOAD_MODE', 'MODEL_MMAP', 'STACKING_MODE', 'COMPILE_MODELS', 'MODEL_FANOUT',
+    'FANOUT_WORKERS', 'INFERENCE_EXECUTOR', 'INFERENCE_WORKERS', 'MICROBATCH_ENABLED',
+    'MODEL_THREADS', 'MODEL_THREAD_OVERRIDES', 'CPU_BUDGET', 'STARTUP_MODE', 'WARMUP_BATCH_SIZES',
+    'SHADOW_MODELS', 'SHADOW_SAMPLE_RATE', 'SHADOW_QUEUE_SIZE'
+]
+# Server settings compared by --startup: the original startup, then warm-up, then background loading
+STARTUP_CONFIGS = {
+    'blocking_no_warmup': {'STARTUP_MODE': 'blocking', 'WARMUP_BATCH_SIZES': ''},
+    'blocking_warmup': {'STARTUP_MODE': 'blocking'},
+    'background_warmup': {'STARTUP_MODE': 'background'}
+}
+LIBRARIES = ['numpy', 'pandas', 'sklearn', 'xgboost', 'lightgbm', 'catboost', 'fastapi', 'uvicorn']
+# Result fields describing the run rather than measuring it (left out of --compare)
+PARAMETER_FIELDS = {'batch_size', 'concurrency', 'n', 'batches'}
+
+
+def summarize(samples):
+    """Latency percentiles in ms from a list of seconds"""
+    ms = np.asarray(samples) * 1000
+    return {
+        "n": int(len(ms)),
+        "mean": round(float(ms.mean()), 3),
+        "p50": round(float(np.percentile(ms, 50)), 3),
+        "p90": round(float(np.percentile(ms, 90)), 3),
+        "p99": round(float(np.percentile(ms, 99)), 3),
+        "max": round(float(ms.max()), 3)
+    }
+
+
+def environment():
+    """Machine, library versions and settings the numbers depend on"""
+    import importlib
+    versions = {}
+    for name in LIBRARIES:
+        try:
+            versions[name] = importlib.import_module(name).__version__
+        except Exception:
+            versions[name] = None
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=HERE,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "libraries": versions,
+        "settings": {name: os.environ[name] for name in RECORDED_SETTINGS if name in os.environ}
+    }
+
+
+def bench_load(repeats):
+    """ModelManager.load_all_models wall time (first run includes library imports)"""
+    from model_loader import ModelManager, current_rss_mb
+
+    runs = []
+    manager = None
+    for _ in range(repeats):
+        manager = ModelManager()
+        start = time.perf_counter()
+        manager.load_all_models(lazy=False)
+        runs.append({
+            "seconds": round(time.perf_counter() - start, 3),
+            "models_loaded": manager.get_loaded_count(),
+            "per_model_seconds": {name: round(s, 4) for name, s in manager.load_times.items()}
+        })
+    return manager, {"runs": runs, "rss_mb": round(current_rss_mb(), 1)}
+
+
+def bench_models(manager, iterations, warmup):
+    """Single-row predict_proba latency per model and for the full ensemble"""
+    from ensemble import run_ensemble
+    from synthetic import make_feature_frame
+
+    X = make_feature_frame(iterations + warmup, seed=11)
+    rows = [X.iloc[[i]] for i in range(len(X))]
+    models, stacking_plan = manager.get_scoring_state()
+
+    per_model = {}
+    for name, model in models.items():
+        if model is None:
+            continue
+        samples = []
+        for i, row in enumerate(rows):
+            start = time.perf_counter()
+            model.predict_proba(row)
+            if i >= warmup:
+                samples.append(time.perf_counter() - start)
+        per_model[name] = summarize(samples)
+
+    samples = []
+    for i, row in enumerate(rows):
+        start = time.perf_counter()
+        run_ensemble(row, models, manager.display_names, stacking_plan)
+        if i >= warmup:
+            samples.append(time.perf_counter() - start)
+    return per_model, summarize(samples)
+
+
+def bench_batches(manager, batch_sizes, min_seconds):
+    """Ensemble throughput for each batch size"""
+    from ensemble import run_ensemble
+    from synthetic import make_feature_frame
+
+    models, stacking_plan = manager.get_scoring_state()
+    results = []
+    for size in batch_sizes:
+        X = make_feature_frame(size, seed=size)
+        run_ensemble(X, models, manager.display_names, stacking_plan)  # warm-up
+        samples = []
+        start = time.perf_counter()
+        while time.perf_counter() - start < min_seconds or len(samples) < 3:
+            t0 = time.perf_counter()
+            run_ensemble(X, models, manager.display_names, stacking_plan)
+            samples.append(time.perf_counter() - t0)
+        per_batch = float(np.median(samples))
+        results.append({
+            "batch_size": size,
+            "ms_per_batch": round(per_batch * 1000, 3),
+            "rows_per_second": round(size / per_batch, 1),
+            "batches": len(samples)
+        })
+    return results
+
+
+def bench_wire(batch_sizes, iterations):
+    """
+    Parse + serialize cost per request of the JSON path (FastAPI's json.loads,
+    HealthFeatures validation, PredictionResponse validation, JSON encoding)
+    against the compact binary format (wire.py), without running the models
+    """
+    from app import (
+        HealthFeatures, BatchPredictionRequest, PredictionResponse, BatchPredictionResponse,
+        records_from_rows
+    )
+    from wire import decode_features, encode_scores
+    from ensemble import BASE_MODELS
+
+    def median_us(fn):
+        samples = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            fn()
+            samples.append(time.perf_counter() - start)
+        return round(float(np.median(samples)) * 1e6, 1)
+
+    def to_json(content):
+        # Same arguments as starlette's JSONResponse.render
+        return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(',', ':')).encode()
+
+    rng = np.random.default_rng(31)
+    results = []
+    for size in batch_sizes:
+        records = http_records(size, seed=37)
+        compact_body = np.array([list(record.values()) for record in records], dtype='<f8').tobytes()
+        predictions = [{
+            "base_predictions": dict(zip(BASE_MODELS, rng.random(len(BASE_MODELS)).tolist())),
+            "stacked": {"probability": float(p), "label": "High" if p >= 0.5 else "Low"},
+            "models_run": BASE_MODELS + ['stacking']
+        } for p in rng.random(size)]
+
+        if size == 1:
+            json_body = json.dumps(records[0]).encode()
+            json_parse = lambda: HealthFeatures.model_validate(json.loads(json_body))
+            json_serialize = lambda: to_json(PredictionResponse.model_validate(predictions[0]).model_dump(mode='json'))
+        else:
+            json_body = json.dumps({"records": records}).encode()
+            json_parse = lambda: BatchPredictionRequest.model_validate(json.loads(json_body))
+            json_serialize = lambda: to_json(BatchPredictionResponse.model_validate(
+                {"predictions": predictions}).model_dump(mode='json'))
+
+        json_response = json_serialize()
+        compact_response = encode_scores(predictions)
+        results.append({
+            "batch_size": size,
+            "json_parse_us": median_us(json_parse),
+            "json_serialize_us": median_us(json_serialize),
+            "compact_parse_us": median_us(lambda: records_from_rows(decode_features(compact_body))),
+            "compact_serialize_us": median_us(lambda: encode_scores(predictions)),
+            "json_request_bytes": len(json_body),
+            "compact_request_bytes": len(compact_body),
+            "json_response_bytes": len(json_response),
+            "compact_response_bytes": len(compact_response)
+        })
+    return results
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def launch_server(port, settings=None):
+    """Start app.py under uvicorn in a subprocess without waiting for it"""
+    env = dict(os.environ, PORT=str(port), LOG_LEVEL=os.getenv('LOG_LEVEL', 'WARNING'), **(settings or {}))
+    env.setdefault('PREDICTION_CACHE_ENABLED', 'false')  # measure the models, not the cache
+    return subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'app:app', '--host', '127.0.0.1', '--port', str(port),
+         '--log-level', 'warning'],
+        cwd=HERE, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+
+def start_server(port, timeout=120, settings=None):
+    """Run app.py under uvicorn in a subprocess and wait until it answers /health"""
+    start = time.perf_counter()
+    process = launch_server(port, settings)
+    while time.perf_counter() - start < timeout:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}")
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+            connection.request('GET', '/health')
+            if connection.getresponse().status == 200:
+                return process, time.perf_counter() - start
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("Server did not become ready in time")
+
+
+def http_load(port, path, bodies, concurrency, headers=None):
+    """POST every body using `concurrency` keep-alive connections; latency per request"""
+    headers = headers or {'Content-Type': 'application/json'}
+    samples, errors = [], []
+    lock = threading.Lock()
+    next_index = [0]
+
+    def client():
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        while True:
+            with lock:
+                index = next_index[0]
+                next_index[0] += 1
+            if index >= len(bodies):
+                break
+            start = time.perf_counter()
+            connection.request('POST', path, body=bodies[index], headers=headers)
+            response = connection.getresponse()
+            response.read()
+            elapsed = time.perf_counter() - start
+            with lock:
+                (samples if response.status == 200 else errors).append(elapsed)
+        connection.close()
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+    result = summarize(samples) if samples else {"n": 0}
+    result.update({"concurrency": concurrency, "errors": len(errors),
+                   "requests_per_second": round(len(samples) / wall, 1)})
+    return result
+
+
+def http_records(n_rows, seed):
+    from synthetic import make_feature_frame
+    return make_feature_frame(n_rows, seed=seed).rename(columns={'active': 'ACTIVE'}).to_dict('records')
+
+
+def bench_http(requests, concurrency_levels, batch_size, batch_requests):
+    """End-to-end latency of /predict and /predict/batch over real HTTP, JSON and compact"""
+    from wire import FEATURES_MEDIA_TYPE, SCORES_MEDIA_TYPE
+    compact = {'Content-Type': FEATURES_MEDIA_TYPE, 'Accept': SCORES_MEDIA_TYPE}
+
+    def compact_body(records):
+        return np.array([list(record.values()) for record in records], dtype='<f8').tobytes()
+
+    single_records = http_records(requests, seed=23)
+    single = [json.dumps(record).encode() for record in single_records]
+    single_compact = [compact_body([record]) for record in single_records]
+    records = http_records(batch_size * batch_requests, seed=29)
+    batches = [json.dumps({"records": records[i:i + batch_size]}).encode()
+               for i in range(0, len(records), batch_size)]
+    batches_compact = [compact_body(records[i:i + batch_size]) for i in range(0, len(records), batch_size)]
+
+    port = free_port()
+    process, ready_seconds = start_server(port)
+    try:
+        http_load(port, '/predict', single[:max(10, requests // 10)], 1)  # warm-up
+        results = {
+            "server_ready_seconds": round(ready_seconds, 2),
+            "predict": [http_load(port, '/predict', single, c) for c in concurrency_levels],
+            "predict_batch": {"batch_size": batch_size, **http_load(port, '/predict/batch', batches, 1)},
+            "predict_compact": [http_load(port, '/predict', single_compact, c, compact) for c in concurrency_levels],
+            "predict_batch_compact": {
+                "batch_size": batch_size, **http_load(port, '/predict/batch', batches_compact, 1, compact)
+            }
+        }
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+    return results
+
+
+def bench_thread_budget(requests, concurrency_levels):
+    """/predict latency per concurrency level without and with model thread budgets"""
+    bodies = [json.dumps(record).encode() for record in http_records(requests, seed=31)]
+    results = {}
+    for mode in ('off', 'auto'):
+        port = free_port()
+        process, _ = start_server(port, settings={'MODEL_THREADS': mode})
+        try:
+            http_load(port, '/predict', bodies[:max(10, requests // 10)], 1)  # warm-up
+            results[mode] = [http_load(port, '/predict', bodies, c) for c in concurrency_levels]
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+    return results
+
+
+def bench_shadow(manager, requests, concurrency_levels):
+    """
+    /predict latency per concurrency level without and with shadow scoring of
+    every request, the candidates being copies of the production RF and stacker
+    """
+    bodies = [json.dumps(record).encode() for record in http_records(requests, seed=41)]
+    candidates = f"model4={manager.filenames['model4']},stacking={manager.filenames['stacking']}"
+    results = {}
+    for mode, settings in (('off', {}), ('on', {'SHADOW_MODELS': candidates, 'SHADOW_SAMPLE_RATE': '1'})):
+        port = free_port()
+        process, _ = start_server(port, settings=settings)
+        try:
+            http_load(port, '/predict', bodies[:max(10, requests // 10)], 1)  # warm-up
+            results[mode] = [http_load(port, '/predict', bodies, c) for c in concurrency_levels]
+            if mode == 'on':
+                time.sleep(1)  # let the worker drain its queue
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+                connection.request('GET', '/health')
+                results['shadow'] = json.loads(connection.getresponse().read())['shadow']
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+    return results
+
+
+def measure_startup(settings, bodies, timeout=120):
+    """
+    Seconds from process start to the first /health response (any status) and
+    to /health 200, then the latency of the first /predict and of the ones after it
+    """
+    port = free_port()
+    start = time.perf_counter()
+    process = launch_server(port, settings)
+    first_byte = ready = None
+    try:
+        while ready is None:
+            if process.poll() is not None:
+                raise RuntimeError(f"Server exited with code {process.returncode}")
+            if time.perf_counter() - start > timeout:
+                raise RuntimeError("Server did not become ready in time")
+            try:
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+                connection.request('GET', '/health')
+                status = connection.getresponse().status
+                now = time.perf_counter() - start
+                first_byte = first_byte or now
+                if status == 200:
+                    ready = now
+                    break
+            except OSError:
+                pass
+            time.sleep(0.01)
+        first = http_load(port, '/predict', bodies[:1], 1)
+        rest = http_load(port, '/predict', bodies[1:], 1)
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+    return {
+        "first_byte_seconds": round(first_byte, 3),
+        "ready_seconds": round(ready, 3),
+        "first_request_ms": first["max"],
+        "next_requests_p50_ms": rest["p50"]
+    }
+
+
+def bench_startup(repeats, requests=20):
+    """measure_startup per STARTUP_CONFIGS entry, median of `repeats` fresh servers"""
+    bodies = [json.dumps(record).encode() for record in http_records(requests + 1, seed=37)]
+    results = []
+    for name, settings in STARTUP_CONFIGS.items():
+        runs = [measure_startup(settings, bodies) for _ in range(repeats)]
+        results.append({
+            "config": name,
+            **{key: round(float(np.median([run[key] for run in runs])), 3) for key in runs[0]}
+        })
+    return results
+
+
+def flatten(data, prefix=''):
+    """{'a': {'b': 1}} -> {'a.b': 1}; list items keyed by batch_size/concurrency"""
+    flat = {}
+    if isinstance(data, dict):
+        for key, value in data.items():
+            flat.update(flatten(value, f"{prefix}{key}."))
+    elif isinstance(data, list):
+        for index, value in enumerate(data):
+            key = index
+            if isinstance(value, dict):
+                key = value.get('batch_size', value.get('concurrency', value.get('config', index)))
+            flat.update(flatten(value, f"{prefix}{key}."))
+    elif isinstance(data, (int, float)) and not isinstance(data, bool):
+        if prefix.rstrip('.').rsplit('.', 1)[-1] not in PARAMETER_FIELDS:
+            flat[prefix.rstrip('.')] = data
+    return flat
+
+
+def compare(before_path, after_path):
+    """Print every numeric result of two runs side by side"""
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+    old, new = flatten(before['results']), flatten(after['results'])
+    print(f"{'metric':<58}{'before':>12}{'after':>12}{'change':>10}")
+    for key in sorted(set(old) | set(new)):
+        a, b = old.get(key), new.get(key)
+        change = f"{(b - a) / a * 100:+.1f}%" if a and b is not None else ''
+        print(f"{key:<58}{'' if a is None else a:>12}{'' if b is None else b:>12}{change:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--models', help="model directory (default: MODEL_DIR or ./models)")
+    parser.add_argument('--standin', action='store_true', help="train stand-in models into a temp dir and use them")
+    parser.add_argument('--output', help="JSON results file (default: benchmark-<timestamp>.json)")
+    parser.add_argument('--iterations', type=int, default=200, help="single-row predictions per model")
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--batch-sizes', default='1,8,32,128,512,1000')
+    parser.add_argument('--min-seconds', type=float, default=1.0, help="minimum time per batch size")
+    parser.add_argument('--load-repeats', type=int, default=3)
+    parser.add_argument('--wire-sizes', default='1,100', help="batch sizes for the wire format comparison")
+    parser.add_argument('--wire-iterations', type=int, default=2000)
+    parser.add_argument('--http-requests', type=int, default=300, help="0 skips the HTTP benchmark")
+    parser.add_argument('--concurrency', default='1,4,16')
+    parser.add_argument('--http-batch-size', type=int, default=100)
+    parser.add_argument('--http-batch-requests', type=int, default=20)
+    parser.add_argument('--thread-budget', action='store_true',
+                        help="compare /predict p99 per concurrency with MODEL_THREADS=off and auto")
+    parser.add_argument('--thread-budget-concurrency', default='1,2,4,8,16,32')
+    parser.add_argument('--startup', action='store_true',
+                        help="measure time to first byte / ready and first-request latency per startup mode")
+    parser.add_argument('--startup-repeats', type=int, default=3)
+    parser.add_argument('--shadow', action='store_true',
+                        help="compare /predict latency per concurrency without and with shadow scoring")
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'), help="compare two result files")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return 0
+
+    if args.standin:
+        from standin_models import train_standin_models
+        models_dir = tempfile.mkdtemp(prefix='standin_models_')
+        print(f"[INFO] Training stand-in models in {models_dir}...")
+        train_standin_models(models_dir)
+    else:
+        models_dir = args.models or os.getenv('MODEL_DIR', './models')
+    # Read by ModelManager and by the app server subprocess
+    os.environ['MODEL_DIR'] = os.path.abspath(models_dir)
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+    results = {}
+    print("[INFO] Measuring model load time...")
+    manager, results["load"] = bench_load(max(1, args.load_repeats))
+    if manager.get_loaded_count() == 0:
+        print(f"[ERROR] No models found in {models_dir}")
+        return 1
+
+    print("[INFO] Measuring single-row latency...")
+    results["model_latency_ms"], results["ensemble_latency_ms"] = bench_models(
+        manager, args.iterations, args.warmup)
+
+    print("[INFO] Measuring batch throughput...")
+    batch_sizes = [int(size) for size in args.batch_sizes.split(',')]
+    results["batch_throughput"] = bench_batches(manager, batch_sizes, args.min_seconds)
+
+    print("[INFO] Measuring JSON vs compact parse/serialize cost...")
+    wire_sizes = [int(size) for size in args.wire_sizes.split(',')]
+    results["wire_format"] = bench_wire(wire_sizes, args.wire_iterations)
+
+    if args.http_requests > 0:
+        print("[INFO] Measuring HTTP latency...")
+        concurrency = [int(level) for level in args.concurrency.split(',')]
+        results["http"] = bench_http(args.http_requests, concurrency, args.http_batch_size,
+                                     args.http_batch_requests)
+
+    if args.thread_budget:
+        print("[INFO] Measuring p99 latency vs concurrency with and without thread budgets...")
+        concurrency = [int(level) for level in args.thread_budget_concurrency.split(',')]
+        results["thread_budget"] = bench_thread_budget(max(args.http_requests, 100), concurrency)
+
+    if args.startup:
+        print("[INFO] Measuring server startup and first-request latency...")
+        results["startup"] = bench_startup(max(1, args.startup_repeats))
+
+    if args.shadow:
+        print("[INFO] Measuring /predict latency with and without shadow scoring...")
+        concurrency = [int(level) for level in args.concurrency.split(',')]
+        results["shadow"] = bench_shadow(manager, max(args.http_requests, 100), concurrency)
+
+    report = {
+        "environment": environment(),
+        "models_dir": os.environ['MODEL_DIR'],
+        "standin_models": args.standin,
+        "results": results
+    }
+    output = args.output or f"benchmark-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    for name, stats in results["model_latency_ms"].items():
+        print(f"{manager.display_names[name]:<22} p50 {stats['p50']:>8.3f} ms   p99 {stats['p99']:>8.3f} ms")
+    stats = results["ensemble_latency_ms"]
+    print(f"{'Ensemble':<22} p50 {stats['p50']:>8.3f} ms   p99 {stats['p99']:>8.3f} ms")
+    for row in results["batch_throughput"]:
+        print(f"batch {row['batch_size']:>5}: {row['rows_per_second']:>10,.0f} rows/s")
+    for row in results["wire_format"]:
+        json_us = row['json_parse_us'] + row['json_serialize_us']
+        compact_us = row['compact_parse_us'] + row['compact_serialize_us']
+        print(f"wire {row['batch_size']:>5} rows: JSON {json_us:>9.1f} us, compact {compact_us:>9.1f} us "
+              f"(parse + serialize)")
+    for off, auto in zip(*results.get("thread_budget", {}).values()):
+        print(f"concurrency {off['concurrency']:>3}: p99 {off.get('p99', float('nan')):>8.2f} ms default threads, "
+              f"{auto.get('p99', float('nan')):>8.2f} ms thread budget")
+    for row in results.get("startup", []):
+        print(f"{row['config']:<20} first byte {row['first_byte_seconds']:>6.2f}s, ready {row['ready_seconds']:>6.2f}s, "
+              f"first /predict {row['first_request_ms']:>7.1f} ms (then p50 {row['next_requests_p50_ms']:.1f} ms)")
+    shadow = results.get("shadow", {})
+    for off, on in zip(shadow.get("off", []), shadow.get("on", [])):
+        print(f"concurrency {off['concurrency']:>3}: p50 {off.get('p50', float('nan')):>8.2f} / "
+              f"{on.get('p50', float('nan')):>8.2f} ms, p99 {off.get('p99', float('nan')):>8.2f} / "
+              f"{on.get('p99', float('nan')):>8.2f} ms without / with shadow scoring")
+    for name, stats in shadow.get("shadow", {}).get("candidates", {}).items():
+        print(f"shadow {name}: {stats['scored']} scored, agreement {stats['label_agreement']}, "
+              f"mean |diff| {stats['mean_abs_difference']}, dropped {shadow['shadow']['dropped']}")
+    print(f"[INFO] Results written to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,217 @@
+"""
+Bulk re-scoring of health_features exports (CSV or Parquet).
+The input is read in fixed-size chunks; each chunk is scored with the five
+base models plus stacking and appended to the output file right away, so
+memory use depends on --chunk-size and --workers, not on the file size.
+
+    python bulk_score.py health_features.csv scored.csv --chunk-size 20000 --workers 4
+
+The input needs the 11 raw columns; the six engineered ones are derived
+when any of them is absent. Output rows keep the input columns (or --keep)
+in input order, with base_model1_score..base_model5_score,
+stacked_probability, risk_label and models_used (re)written. Rows no model
+could score have models_used=0 and empty scores, or with --fallback the
+service's rule-based fallback scores.
+"""
+
+import argparse
+import multiprocessing
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from ensemble import BASE_MODELS, run_ensemble
+from model_loader import model_manager
+from features import FEATURE_COLUMNS, RAW_FEATURE_COLUMNS, ENGINEERED_COLUMNS, engineer_features
+from fallback import fallback_risk_frame, fallback_base_predictions
+
+# Input column for each model feature when it differs (the table stores ACTIVE)
+INPUT_ALIASES = {'active': 'ACTIVE'}
+# Same types HealthFeatures coerces /predict inputs to; the rest are floats
+INT_FEATURES = {'gender', 'cholesterol', 'gluc', 'smoke', 'alco', 'active', 'age_group', 'bmi_group'}
+SCORE_COLUMNS = [f'base_{name}_score' for name in BASE_MODELS] + ['stacked_probability', 'risk_label', 'models_used']
+
+
+def is_parquet(path):
+    return path.lower().endswith(('.parquet', '.pq'))
+
+
+def require_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        sys.exit("Parquet files need pyarrow: pip install pyarrow")
+
+
+def read_chunks(path, chunk_size):
+    """Yield DataFrames of at most chunk_size rows"""
+    if is_parquet(path):
+        require_pyarrow()
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_size)
+
+
+class ChunkWriter:
+    """Appends scored chunks to a CSV or Parquet file"""
+
+    def __init__(self, path):
+        self.path = path
+        self.rows = 0
+        self._file = None
+        self._parquet = None
+        self._schema = None
+        if is_parquet(path):
+            require_pyarrow()
+
+    def write(self, df):
+        if is_parquet(self.path):
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._parquet is None:
+                self._schema = table.schema
+                self._parquet = pq.ParquetWriter(self.path, self._schema)
+            # e.g. risk_label is all-null in a chunk no model could score
+            self._parquet.write_table(table.cast(self._schema))
+        else:
+            if self._file is None:
+                self._file = open(self.path, 'w', newline='')
+            df.to_csv(self._file, header=self.rows == 0, index=False)
+        self.rows += len(df)
+
+    def close(self):
+        if self._parquet is not None:
+            self._parquet.close()
+        if self._file is not None:
+            self._file.close()
+
+
+def build_features(chunk):
+    """
+    17-column model input with prepare_features' column order and types.
+    If any engineered column is missing, all six are derived from the raw ones.
+    """
+    derive = any(column not in chunk for column in ENGINEERED_COLUMNS)
+    columns = {}
+    for column in RAW_FEATURE_COLUMNS if derive else FEATURE_COLUMNS:
+        source = column if column in chunk else INPUT_ALIASES.get(column, column)
+        if source not in chunk:
+            raise ValueError(f"Input is missing feature column {source!r}")
+        values = pd.to_numeric(chunk[source])
+        if column in INT_FEATURES:
+            if values.isna().any():
+                raise ValueError(f"Column {source!r} has empty values")
+            values = values.astype('int64')
+        else:
+            values = values.astype('float64')
+        columns[column] = values.to_numpy()
+    X = pd.DataFrame(columns)
+    return engineer_features(X) if derive else X
+
+
+def score_chunk(chunk, keep=None, fallback=False):
+    """Input chunk (selected columns) plus the ensemble's scores"""
+    X = build_features(chunk)
+    models, stacking_plan = model_manager.get_scoring_state()
+    output = run_ensemble(X, models, model_manager.display_names, stacking_plan)
+    base, stacked = output.base, output.stacked
+
+    if keep is None:
+        keep = [column for column in chunk.columns if column not in SCORE_COLUMNS]
+    result = chunk[keep].reset_index(drop=True)
+    scored = output.valid_count > 0
+    if fallback and not scored.all():
+        # Same rule-based scores /predict returns when no model can score a row
+        risk = fallback_risk_frame(X[~scored])
+        base[~scored] = fallback_base_predictions(risk)
+        stacked[~scored] = risk
+        scored = np.ones(len(X), dtype=bool)
+    for col, name in enumerate(BASE_MODELS):
+        result[f'base_{name}_score'] = base[:, col]
+    result['stacked_probability'] = stacked
+    result['risk_label'] = pd.Series(np.where(output.stacked >= 0.5, 'High', 'Low')).where(scored)
+    result['models_used'] = output.valid_count
+    return result
+
+
+def _init_worker():
+    """Process pool initializer - finish loading inherited models, or load them"""
+    if model_manager.get_loaded_count() == 0:
+        model_manager.load_all_models(lazy=False)
+    else:
+        model_manager.finish_loading()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input', help="CSV or Parquet export of health_features")
+    parser.add_argument('output', help="CSV or Parquet file to write (by extension)")
+    parser.add_argument('--chunk-size', type=int, default=10000, help="rows scored per chunk")
+    parser.add_argument('--workers', type=int, default=1, help="scoring processes")
+    parser.add_argument('--fallback', action='store_true',
+                        help="give rows no model could score the rule-based fallback scores")
+    parser.add_argument('--keep', help="comma-separated input columns to copy to the output "
+                                       "(default: every column except the score columns)")
+    args = parser.parse_args()
+
+    keep = [column.strip() for column in args.keep.split(',')] if args.keep else None
+    workers = max(1, args.workers)
+    chunk_size = max(1, args.chunk_size)
+
+    if workers > 1 and 'fork' in multiprocessing.get_all_start_methods():
+        # Load once here and let the forked workers share the models; the
+        # prediction-based setup runs in each worker (see serve.py)
+        model_manager.load_all_models(finish=False, lazy=False)
+    elif workers == 1:
+        model_manager.load_all_models(lazy=False)
+    if workers == 1 and model_manager.get_loaded_count() == 0 and not args.fallback:
+        sys.exit("No models loaded - nothing to score with")
+
+    pool = None
+    if workers > 1:
+        context = multiprocessing.get_context('fork') if model_manager.load_attempted else None
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker)
+
+    writer = ChunkWriter(args.output)
+    start = time.perf_counter()
+    unscored = 0
+
+    def write(result):
+        nonlocal unscored
+        writer.write(result)
+        unscored += int((result['models_used'] == 0).sum())
+        elapsed = time.perf_counter() - start
+        print(f"[INFO] {writer.rows} rows scored ({writer.rows / elapsed:,.0f} rows/s)", flush=True)
+
+    try:
+        if pool is None:
+            for chunk in read_chunks(args.input, chunk_size):
+                write(score_chunk(chunk, keep, args.fallback))
+        else:
+            # At most two chunks per worker in flight; results written in input order
+            pending = deque()
+            for chunk in read_chunks(args.input, chunk_size):
+                pending.append(pool.submit(score_chunk, chunk, keep, args.fallback))
+                if len(pending) >= 2 * workers:
+                    write(pending.popleft().result())
+            while pending:
+                write(pending.popleft().result())
+    finally:
+        writer.close()
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+    elapsed = time.perf_counter() - start
+    outcome = 'scored by the rule-based fallback' if args.fallback else 'could not be scored'
+    print(f"[INFO] Wrote {writer.rows} rows to {args.output} in {elapsed:.1f}s"
+          + (f", {unscored} row(s) {outcome}" if unscored else ""))
+    return 1 if unscored == writer.rows and writer.rows and not args.fallback else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
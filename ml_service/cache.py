@@ -0,0 +1,105 @@
+"""
+LRU/TTL cache of prediction results keyed on the normalized feature vector.
+Repeat submissions of the same inputs are answered without touching a model.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Answer repeated inputs from the cache (opt-in)
+PREDICTION_CACHE_ENABLED = os.getenv('PREDICTION_CACHE_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+PREDICTION_CACHE_SIZE = int(os.getenv('PREDICTION_CACHE_SIZE', 10000))
+PREDICTION_CACHE_TTL = float(os.getenv('PREDICTION_CACHE_TTL', 3600))
+# Feature values are rounded to this many decimals before hashing
+PREDICTION_CACHE_DECIMALS = int(os.getenv('PREDICTION_CACHE_DECIMALS', 4))
+
+
+class PredictionCache:
+    """Thread-safe LRU cache with per-entry expiry and hit/miss/eviction counters"""
+
+    def __init__(self, fields, max_entries=PREDICTION_CACHE_SIZE,
+                 ttl=PREDICTION_CACHE_TTL, decimals=PREDICTION_CACHE_DECIMALS):
+        self.fields = list(fields)
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self.decimals = decimals
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.stale_puts = 0
+        # Bumped by clear(); a put() made for an earlier generation is dropped
+        self.generation = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def make_key(self, features):
+        """Canonical hash of the feature fields (ints and floats normalized alike)"""
+        # `+ 0.0` turns -0.0 into 0.0 so both hash the same
+        values = ','.join(
+            repr(round(float(getattr(features, field)), self.decimals) + 0.0)
+            for field in self.fields
+        )
+        return hashlib.blake2b(values.encode(), digest_size=16).digest()
+
+    def get(self, key):
+        """Cached value for key, or None if missing or expired"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._entries[key]
+                self.evictions += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, generation=None):
+        """
+        Store value; `generation` is self.generation read before the value was
+        computed, so a result scored by models a reload has since replaced is
+        not stored
+        """
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                self.stale_puts += 1
+                return
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every entry (called when the models are reloaded)"""
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+            self.generation += 1
+
+    def stats(self):
+        """Counters for /health"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": True,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "stale_puts": self.stale_puts,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
@@ -0,0 +1,346 @@
+"""
+Cascade (early-exit) inference.
+The cheapest base models score every row first; rows whose score is already
+past a calibrated low/high threshold are answered without running the
+remaining base models and the stacker. Everything else goes through the
+full ensemble, reusing the probabilities computed so far.
+
+Thresholds are calibrated offline against the full ensemble and stored
+next to the models, together with the checksums of the model files they
+were calibrated for:
+
+    python cascade.py --data health_features.csv --max-disagreement 0.005
+    CASCADE_ENABLED=true python app.py
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+import numpy as np
+from ensemble import BASE_MODELS, EnsembleOutput, run_ensemble, timed_predict
+from artifacts import ArtifactError, file_sha256, read_manifest
+from logs import get_logger
+
+# Answer confident rows from the cheap cascade stages (needs a thresholds file)
+CASCADE_ENABLED = os.getenv('CASCADE_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+# Thresholds file written by `python cascade.py`; relative to MODEL_DIR
+CASCADE_FILE = os.getenv('CASCADE_FILE', 'cascade_thresholds.json')
+
+CASCADE_FORMAT_VERSION = 1
+
+log = get_logger('cascade')
+
+
+class CascadeStage:
+    """Models averaged at one stage and the scores at which a row exits"""
+
+    def __init__(self, models, low=None, high=None):
+        self.models = list(models)
+        # Exit when score <= low or score >= high; None disables that side
+        self.low = low
+        self.high = high
+
+    def exits(self, score):
+        """Boolean mask of rows answered by this stage (NaN scores never exit)"""
+        mask = np.zeros(len(score), dtype=bool)
+        if self.low is not None:
+            mask |= score <= self.low
+        if self.high is not None:
+            mask |= score >= self.high
+        return mask
+
+    def to_dict(self):
+        return {'models': self.models, 'low': self.low, 'high': self.high}
+
+
+class CascadePlan:
+    """Ordered cascade stages; rows no stage answers use the full ensemble"""
+
+    def __init__(self, stages):
+        self.stages = stages
+
+    def describe(self):
+        return ' -> '.join(
+            f"{'+'.join(stage.models)} (<= {stage.low}, >= {stage.high})" for stage in self.stages
+        ) + ' -> full ensemble'
+
+
+def model_checksums(models_dir, filenames):
+    """
+    sha256 of each model file that exists, keyed by model name. Models in an
+    artifact manifest use the checksum of the joblib file they were converted
+    from, so calibrations carry over to converted artifacts.
+    """
+    try:
+        manifest = read_manifest(models_dir) or {'models': {}}
+    except (ArtifactError, OSError, ValueError):
+        manifest = {'models': {}}
+    checksums = {}
+    for name, filename in filenames.items():
+        path = os.path.join(models_dir, filename)
+        if name in manifest['models']:
+            checksums[name] = manifest['models'][name]['source_sha256']
+        elif os.path.exists(path):
+            checksums[name] = file_sha256(path)
+    return checksums
+
+
+def cascade_path(models_dir):
+    return CASCADE_FILE if os.path.isabs(CASCADE_FILE) else os.path.join(models_dir, CASCADE_FILE)
+
+
+def load_cascade_plan(models_dir, filenames, models):
+    """
+    CascadePlan from the thresholds file, or None (full ensemble) when the
+    file is missing or invalid, a stage model is not loaded, or the model
+    files changed since calibration.
+    """
+    path = cascade_path(models_dir)
+    if not os.path.exists(path):
+        log.warning("Cascade mode enabled but %s does not exist - run cascade.py to calibrate", path)
+        return None
+    try:
+        with open(path) as f:
+            data = json.load(f)
+        if data.get('version') != CASCADE_FORMAT_VERSION:
+            raise ValueError(f"unsupported version {data.get('version')!r}")
+        stages = [CascadeStage(s['models'], s.get('low'), s.get('high')) for s in data['stages']]
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        log.error("Cannot read cascade thresholds from %s: %s", path, e)
+        return None
+
+    for stage in stages:
+        missing = [name for name in stage.models if name not in BASE_MODELS or models.get(name) is None]
+        if missing:
+            log.warning("Cascade disabled: stage model(s) %s not loaded", ', '.join(missing))
+            return None
+    calibrated = data.get('model_sha256', {})
+    changed = [
+        name for name, checksum in model_checksums(models_dir, filenames).items()
+        if calibrated.get(name) != checksum
+    ]
+    if changed:
+        log.warning("Cascade disabled: %s changed since calibration - recalibrate", ', '.join(changed))
+        return None
+
+    plan = CascadePlan(stages)
+    log.info("Cascade mode: %s", plan.describe())
+    return plan
+
+
+def run_cascade(X, models, display_names, stacking_plan, plan):
+    """
+    Score X through the cascade. Returns an EnsembleOutput whose exit_stage
+    gives the stage that answered each row (-1: full ensemble). Early-exit
+    rows carry the stage score as their stacked probability.
+    """
+    n_rows = len(X)
+    pending = np.arange(n_rows)
+    exit_stage = np.full(n_rows, -1)
+    stacked = np.full(n_rows, np.nan)
+    probas = {}
+    timings = {}
+
+    for i, stage in enumerate(plan.stages):
+        if not pending.size:
+            break
+        X_pending = X if pending.size == n_rows else X.iloc[pending]
+        for name in stage.models:
+            if name not in probas:
+                proba, seconds = timed_predict(models[name], X_pending, display_names[name])
+                probas[name] = np.full(n_rows, np.nan)
+                probas[name][pending] = proba
+                timings[name] = seconds
+        # A failed stage model gives NaN, which sends the row on to the full ensemble
+        score = np.mean([probas[name][pending] for name in stage.models], axis=0)
+        done = stage.exits(score)
+        stacked[pending[done]] = score[done]
+        exit_stage[pending[done]] = i
+        pending = pending[~done]
+
+    base = np.full((n_rows, len(BASE_MODELS)), np.nan)
+    for col, name in enumerate(BASE_MODELS):
+        if name in probas:
+            base[:, col] = probas[name]
+    valid_count = (~np.isnan(base)).sum(axis=1)
+    failures = {}
+
+    if pending.size:
+        X_rest = X if pending.size == n_rows else X.iloc[pending]
+        rest = run_ensemble(
+            X_rest, models, display_names, stacking_plan,
+            precomputed={name: proba[pending] for name, proba in probas.items()}
+        )
+        base[pending] = rest.base
+        stacked[pending] = rest.stacked
+        valid_count[pending] = rest.valid_count
+        failures = rest.failures
+        for name, seconds in rest.timings.items():
+            timings[name] = timings.get(name, 0.0) + seconds
+
+    return EnsembleOutput(
+        base=base, stacked=stacked, valid_count=valid_count,
+        timings=timings, failures=failures, exit_stage=exit_stage
+    )
+
+
+def side_threshold(score, wrong, budget, descending=False):
+    """
+    Most permissive threshold on one side of 0.5 such that the rows it lets
+    exit include at most `budget` rows labelled differently by the full ensemble
+    """
+    order = np.argsort(-score if descending else score, kind='stable')
+    ranked = score[order]
+    errors = np.cumsum(wrong[order])
+    exits = int(np.searchsorted(errors, budget, side='right'))
+    # Rows tied with the threshold exit too, so never cut through a run of ties
+    while 0 < exits < len(ranked) and ranked[exits] == ranked[exits - 1]:
+        exits -= 1
+    return float(ranked[exits - 1]) if exits else None
+
+
+def calibrate(probas, stacked, stage_models, max_disagreement):
+    """
+    Stages with thresholds chosen so that at most max_disagreement of the
+    rows get a different label than the full ensemble (stacked) gives them.
+    probas: model name -> full-ensemble base probabilities for the same rows.
+    """
+    n_rows = len(stacked)
+    full_high = stacked >= 0.5
+    budget = int(max_disagreement * n_rows) // (2 * len(stage_models))
+    pending = np.arange(n_rows)
+    stages = []
+    for models in stage_models:
+        score = np.mean([probas[name][pending] for name in models], axis=0)
+        label = full_high[pending]
+        low_side = score < 0.5
+        high_side = ~low_side
+        low = side_threshold(score[low_side], label[low_side], budget)
+        high = side_threshold(score[high_side], ~label[high_side], budget, descending=True)
+        stage = CascadeStage(models, low, high)
+        stages.append(stage)
+        pending = pending[~stage.exits(score)]
+    return CascadePlan(stages)
+
+
+def evaluate(plan, probas, stacked, costs):
+    """Exit rates, label agreement and expected cost of the plan on calibration rows"""
+    n_rows = len(stacked)
+    answer = stacked.copy()
+    cost = np.full(n_rows, sum(costs.values()))
+    exit_rates = []
+    pending = np.arange(n_rows)
+    stage_cost = 0.0
+    ran = set()
+    for stage in plan.stages:
+        stage_cost += sum(costs[name] for name in stage.models if name not in ran)
+        ran.update(stage.models)
+        score = np.mean([probas[name][pending] for name in stage.models], axis=0)
+        done = stage.exits(score)
+        answer[pending[done]] = score[done]
+        cost[pending[done]] = stage_cost
+        exit_rates.append(round(float(done.sum()) / n_rows, 4))
+        pending = pending[~done]
+    return {
+        'rows': n_rows,
+        'exit_rate': exit_rates,
+        'label_agreement': round(float(np.mean((answer >= 0.5) == (stacked >= 0.5))), 5),
+        'max_probability_error': round(float(np.max(np.abs(answer - stacked))), 4),
+        'single_row_ms': {name: round(seconds * 1000, 3) for name, seconds in costs.items()},
+        'expected_cost_ratio': round(float(cost.mean() / sum(costs.values())), 3)
+    }
+
+
+def single_row_costs(X, models, display_names, stacking_plan, base, samples=50):
+    """Median single-row seconds per base model and for the stacking step"""
+    rows = [X.iloc[[i]] for i in range(min(samples, len(X)))]
+    costs = {}
+    for name in BASE_MODELS:
+        if models.get(name) is not None:
+            costs[name] = float(np.median([timed_predict(models[name], row, display_names[name])[1] for row in rows]))
+    if models.get('stacking') is not None:
+        times = []
+        for i, row in enumerate(rows):
+            start = time.perf_counter()
+            if stacking_plan is not None:
+                stacking_plan.predict_proba(base[i:i + 1])
+            else:
+                models['stacking'].predict_proba(row)
+            times.append(time.perf_counter() - start)
+        costs['stacking'] = float(np.median(times))
+    return costs
+
+
+def load_calibration_rows(path, rows):
+    """Feature rows from a health_features export, or synthetic rows"""
+    import pandas as pd
+    if path is None:
+        from synthetic import make_feature_frame
+        return make_feature_frame(rows, seed=2)
+    from bulk_score import read_chunks, build_features
+    frames, total = [], 0
+    for chunk in read_chunks(path, 10000):
+        frames.append(build_features(chunk))
+        total += len(frames[-1])
+        if total >= rows:
+            break
+    return pd.concat(frames, ignore_index=True).iloc[:rows]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data', help="CSV or Parquet export of health_features (default: synthetic rows)")
+    parser.add_argument('--rows', type=int, default=20000, help="calibration rows to use")
+    parser.add_argument('--stages', type=int, default=2, help="cascade stages (cheapest model first)")
+    parser.add_argument('--order', help="comma-separated stage model order (default: by measured cost)")
+    parser.add_argument('--max-disagreement', type=float, default=0.005,
+                        help="largest fraction of rows whose label may differ from the full ensemble")
+    parser.add_argument('--output', help="thresholds file (default: CASCADE_FILE in MODEL_DIR)")
+    args = parser.parse_args()
+
+    from model_loader import model_manager
+    model_manager.load_all_models(lazy=False)
+    models, stacking_plan = model_manager.get_scoring_state()
+    names = model_manager.display_names
+    if not all(models.get(name) is not None for name in BASE_MODELS + ['stacking']):
+        sys.exit("All six models must be loaded to calibrate the cascade")
+
+    X = load_calibration_rows(args.data, args.rows)
+    full = run_ensemble(X, models, names, stacking_plan)
+    if full.failures:
+        sys.exit(f"Full ensemble failed on calibration rows: {full.failures}")
+    probas = {name: full.base[:, col] for col, name in enumerate(BASE_MODELS)}
+    costs = single_row_costs(X, models, names, stacking_plan, full.base)
+
+    if args.order:
+        order = [name.strip() for name in args.order.split(',') if name.strip()]
+    else:
+        order = sorted(BASE_MODELS, key=costs.get)
+    stage_models = [order[:k] for k in range(1, min(args.stages, len(order)) + 1)]
+
+    plan = calibrate(probas, full.stacked, stage_models, args.max_disagreement)
+    report = evaluate(plan, probas, full.stacked, costs)
+    report.update(source=args.data or 'synthetic', max_disagreement=args.max_disagreement)
+
+    output = args.output or cascade_path(model_manager.models_dir)
+    with open(output, 'w') as f:
+        json.dump({
+            'version': CASCADE_FORMAT_VERSION,
+            'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'stages': [stage.to_dict() for stage in plan.stages],
+            'model_sha256': model_checksums(model_manager.models_dir, model_manager.filenames),
+            'calibration': report
+        }, f, indent=2)
+
+    print(f"[INFO] Cascade: {plan.describe()}")
+    print(f"[INFO] Exit rate per stage: {report['exit_rate']}, label agreement {report['label_agreement']:.2%}, "
+          f"expected CPU per request {report['expected_cost_ratio']:.0%} of the full ensemble")
+    print(f"[INFO] Thresholds written to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,383 @@
+"""
+Offline model compaction for a smaller resident footprint.
+
+sklearn forests keep 80 bytes per tree node (float64 threshold, impurity and
+sample counts, a float64 value per class) plus a full estimator object per
+tree. Compaction replaces them with one set of flattened node arrays at
+reduced precision:
+
+- thresholds as float32, rounded down: sklearn compares float32 inputs, so
+  every split still goes the same way
+- leaf class-1 fractions as float16 or float32 (COMPACTION_PRECISION=auto
+  picks the smallest one every model accepts)
+- 32-bit child indices, 8/16-bit feature indices
+
+Training-only attributes (iteration counts, OOB scores, evaluation history)
+are dropped from every estimator. A prefit StackingClassifier also refers
+to its base models through `estimators` and `named_estimators_`; those point
+at the compacted models too, so the originals are not kept in the file.
+Gradient-boosted models keep their native boosters, which are already stored
+at float32.
+
+Each compacted model must reproduce the original predict_proba on the
+reference dataset within COMPACTION_TOLERANCE or nothing is written:
+
+    python compaction.py --models ./models --output ./models_compact
+
+The output directory gets a manifest (see artifacts.py) with format
+"compact" entries; point MODEL_DIR at it to serve the compacted models.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import numpy as np
+from sklearn.utils import Tags, TargetTags
+from fastpath import TreeEnsemble, compile_sklearn_forest
+from logs import get_logger
+
+# Max allowed |compacted - original| class-1 probability on the reference data
+COMPACTION_TOLERANCE = float(os.getenv('COMPACTION_TOLERANCE', 1e-5))
+# Leaf value precision: auto (smallest within tolerance), float16 or float32
+COMPACTION_PRECISION = os.getenv('COMPACTION_PRECISION', 'auto').lower()
+
+# Cheapest first; auto uses the first one every model accepts
+PRECISIONS = {'float16': np.float16, 'float32': np.float32}
+
+FOREST_ESTIMATORS = ('DecisionTreeClassifier', 'RandomForestClassifier', 'ExtraTreesClassifier')
+
+# Fitted attributes that only describe training; prediction never reads them
+TRAINING_ATTRIBUTES = (
+    'n_iter_', 'oob_score_', 'oob_decision_function_', 'oob_prediction_',
+    '_n_samples', '_n_samples_bootstrap', 'train_score_', 'oob_improvement_', 'oob_scores_',
+    'loss_curve_', 'validation_scores_', 'evals_result_', '_evals_result', '_best_score'
+)
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+log = get_logger('compaction')
+
+
+class CompactionError(Exception):
+    """Raised when a compacted model drifts beyond the tolerance"""
+
+
+class CompactForestClassifier:
+    """
+    Fitted forest classifier scored from reduced-precision flattened trees.
+    Prediction-only, so deliberately not an sklearn estimator: clone(),
+    get_params() and is_classifier() do not apply to it.
+    """
+
+    def __init__(self, ensemble):
+        self.ensemble = ensemble
+
+    @classmethod
+    def from_forest(cls, estimator, value_dtype):
+        """Compact a fitted sklearn forest classifier into value_dtype leaf values"""
+        compact = cls(shrink_ensemble(compile_sklearn_forest(estimator), value_dtype))
+        compact.classes_ = estimator.classes_
+        compact.n_features_in_ = estimator.n_features_in_
+        if hasattr(estimator, 'feature_names_in_'):
+            compact.feature_names_in_ = estimator.feature_names_in_
+        return compact
+
+    def fit(self, X, y=None):
+        # Pipeline.predict_proba runs check_is_fitted on its last step, which
+        # rejects objects without a fit attribute
+        raise TypeError("CompactForestClassifier is prediction-only: fit a forest, "
+                        "then build one with CompactForestClassifier.from_forest(forest, dtype)")
+
+    def predict_proba(self, X):
+        proba = self.ensemble.positive_proba(np.asarray(X))
+        return np.column_stack([1.0 - proba, proba])
+
+    def predict(self, X):
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1))
+
+    def __sklearn_is_fitted__(self):
+        return self.ensemble is not None
+
+    def __sklearn_tags__(self):
+        # Read by Pipeline.predict_proba; no estimator type, so nothing treats it as a classifier to fit
+        return Tags(estimator_type=None, target_tags=TargetTags(required=False))
+
+
+def index_dtype(max_value):
+    """Smallest signed integer type holding 0..max_value"""
+    for dtype in (np.int8, np.int16, np.int32):
+        if max_value <= np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+def shrink_ensemble(ensemble, value_dtype):
+    """Copy of a compiled sklearn forest with reduced-precision node arrays"""
+    if ensemble.strict or ensemble.dtype != np.float32:
+        raise ValueError("Only forests comparing float32 inputs with x <= threshold can be shrunk")
+    threshold = ensemble.threshold.astype(np.float32)
+    # Round down: for float32 x, x <= t holds exactly when x <= float32-below(t)
+    above = threshold.astype(np.float64) > ensemble.threshold
+    threshold[above] = np.nextafter(threshold[above], np.float32(-np.inf))
+    nodes = index_dtype(len(ensemble.left))
+    return TreeEnsemble(
+        left=ensemble.left.astype(nodes),
+        right=ensemble.right.astype(nodes),
+        feature=ensemble.feature.astype(index_dtype(int(ensemble.feature.max(initial=0)))),
+        threshold=threshold,
+        default_left=ensemble.default_left,
+        missing=ensemble.missing,
+        value=ensemble.value.astype(value_dtype),
+        roots=ensemble.roots.astype(nodes),
+        max_depth=ensemble.max_depth,
+        dtype=np.float32,
+        aggregate=ensemble.aggregate
+    )
+
+
+def strip_training_attributes(estimator):
+    """Drop training-only attributes in place; returns how many were dropped"""
+    state = getattr(estimator, '__dict__', {})
+    dropped = [name for name in TRAINING_ATTRIBUTES if name in state]
+    for name in dropped:
+        # LightGBM's properties read these dicts, so they are emptied rather than removed
+        if isinstance(state[name], dict):
+            state[name] = {}
+        else:
+            del state[name]
+    return len(dropped)
+
+
+def compact_estimator(estimator, value_dtype):
+    """
+    Compacted version of an estimator and everything nested in it (pipeline
+    steps, stacker base and meta models). Forests are replaced; everything
+    else is stripped of training-only attributes in place.
+    """
+    if hasattr(estimator, 'steps'):
+        estimator.steps = [(name, compact_estimator(step, value_dtype)) for name, step in estimator.steps]
+        return estimator
+    # sklearn StackingClassifier
+    if hasattr(estimator, 'estimators_') and hasattr(estimator, 'final_estimator_'):
+        replaced = {}
+        for est in estimator.estimators_:
+            replaced[id(est)] = compact_estimator(est, value_dtype)
+        estimator.estimators_ = [replaced[id(est)] for est in estimator.estimators_]
+        estimator.final_estimator_ = compact_estimator(estimator.final_estimator_, value_dtype)
+        # With cv='prefit' these hold the same fitted objects as estimators_;
+        # left alone they would keep the uncompacted models in the file
+        estimator.estimators = [(name, replaced.get(id(est), est)) for name, est in estimator.estimators]
+        if hasattr(estimator, 'named_estimators_'):
+            for name, est in list(estimator.named_estimators_.items()):
+                estimator.named_estimators_[name] = replaced.get(id(est), est)
+        strip_training_attributes(estimator)
+        return estimator
+    # Custom StackingModel class defined in app.py
+    if hasattr(estimator, 'base_models') and hasattr(estimator, 'meta_model'):
+        if isinstance(estimator.base_models, dict):
+            estimator.base_models = {k: compact_estimator(m, value_dtype) for k, m in estimator.base_models.items()}
+        else:
+            estimator.base_models = [compact_estimator(m, value_dtype) for m in estimator.base_models]
+        estimator.meta_model = compact_estimator(estimator.meta_model, value_dtype)
+        return estimator
+
+    if type(estimator).__name__ in FOREST_ESTIMATORS and getattr(estimator, 'n_outputs_', 1) == 1:
+        return CompactForestClassifier.from_forest(estimator, value_dtype)
+    strip_training_attributes(estimator)
+    return estimator
+
+
+def count_compacted(model):
+    """Forests replaced inside a compacted model"""
+    if isinstance(model, CompactForestClassifier):
+        return 1
+    children = []
+    if hasattr(model, 'steps'):
+        children = [step for _, step in model.steps]
+    elif hasattr(model, 'estimators_') and hasattr(model, 'final_estimator_'):
+        children = list(model.estimators_) + [model.final_estimator_]
+    elif hasattr(model, 'base_models') and hasattr(model, 'meta_model'):
+        base_models = model.base_models
+        children = list(base_models.values() if isinstance(base_models, dict) else base_models) + [model.meta_model]
+    return sum(count_compacted(child) for child in children)
+
+
+def max_drift(original, compacted, X_ref):
+    """Max |class-1 probability difference| between the two models on X_ref"""
+    expected = np.asarray(original.predict_proba(X_ref)[:, 1], dtype=np.float64)
+    actual = np.asarray(compacted.predict_proba(X_ref)[:, 1], dtype=np.float64)
+    return float(np.max(np.abs(expected - actual)))
+
+
+# Run in a fresh interpreter so the number only reflects the one model
+RSS_PROBE = """
+import json, sys
+from model_loader import import_estimator_modules, current_rss_mb, release_memory
+from artifacts import load_artifact
+import_estimator_modules()
+release_memory()
+before = current_rss_mb()
+model = load_artifact(sys.argv[1], json.loads(sys.argv[2]))
+release_memory()
+print(current_rss_mb() - before)
+"""
+
+
+def resident_mb(models_dir, entry):
+    """RSS growth (MB) of a fresh process loading one model, None if it fails"""
+    env = dict(os.environ, MODEL_DIR=models_dir, LOG_LEVEL='ERROR')
+    result = subprocess.run(
+        [sys.executable, '-c', RSS_PROBE, models_dir, json.dumps(entry)],
+        cwd=HERE, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        log.warning("RSS probe failed for %s: %s", entry['entry'], result.stderr.strip()[-500:])
+        return None
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def load_source(manager, model_name):
+    """(model, manifest-style entry) for one model of the source directory, or None"""
+    from artifacts import load_artifact
+    entry = manager.artifact_entry(model_name)
+    if entry is None:
+        filename = manager.filenames[model_name]
+        if not os.path.exists(os.path.join(manager.models_dir, filename)):
+            return None
+        entry = {'format': 'joblib', 'entry': filename, 'files': [filename]}
+    return load_artifact(manager.models_dir, entry), entry
+
+
+def compact_models(manager, output_dir, X_ref, precision=COMPACTION_PRECISION,
+                   tolerance=COMPACTION_TOLERANCE, measure_rss=True):
+    """
+    Compact every model of `manager` into output_dir and write the manifest.
+    Raises CompactionError, before writing anything, when a model drifts
+    beyond tolerance at every allowed precision. Returns a report row per model.
+    """
+    import joblib
+    from artifacts import file_sha256, build_manifest, write_manifest, read_manifest
+    if precision == 'auto':
+        candidates = list(PRECISIONS)
+    elif precision in PRECISIONS:
+        candidates = [precision]
+    else:
+        raise ValueError(f"COMPACTION_PRECISION must be auto or one of {list(PRECISIONS)}, got {precision!r}")
+
+    manager.manifest = read_manifest(manager.models_dir)
+    sources = {}
+    for model_name in manager.models:
+        loaded = load_source(manager, model_name)
+        if loaded is None:
+            log.warning("Skipping %s: no model file in %s", manager.display_names[model_name], manager.models_dir)
+            continue
+        sources[model_name] = loaded
+
+    # One precision for every model, so the stacker's copies of the base
+    # models stay identical to the loaded ones (see stacking.py)
+    chosen = None
+    for value_name in candidates:
+        compacted, drift = {}, {}
+        for model_name, (model, entry) in sources.items():
+            # Loaded again: compaction replaces parts of the model in place
+            original = load_source(manager, model_name)[0]
+            start = time.perf_counter()
+            compacted[model_name] = compact_estimator(model, PRECISIONS[value_name])
+            seconds = time.perf_counter() - start
+            drift[model_name] = (max_drift(original, compacted[model_name], X_ref), seconds)
+        worst = max(error for error, _ in drift.values()) if drift else 0.0
+        log.info("%s leaf values: max drift %.2e (tolerance %.0e)", value_name, worst, tolerance)
+        if worst <= tolerance:
+            chosen = value_name
+            break
+        sources = {name: load_source(manager, name) for name in sources}
+    if chosen is None:
+        failing = [manager.display_names[name] for name, (error, _) in drift.items() if not error <= tolerance]
+        raise CompactionError(
+            f"{', '.join(failing)} drift beyond {tolerance:.0e} at every allowed precision ({', '.join(candidates)})"
+        )
+
+    os.makedirs(output_dir, exist_ok=True)
+    entries, report = {}, []
+    for model_name, model in compacted.items():
+        source_entry = sources[model_name][1]
+        filename = manager.filenames[model_name]
+        joblib.dump(model, os.path.join(output_dir, filename))
+        error, seconds = drift[model_name]
+        forests = count_compacted(model)
+        source_files = [os.path.join(manager.models_dir, name) for name in source_entry['files']]
+        entry = {
+            'format': 'compact', 'entry': filename, 'files': [filename],
+            # The original file's identity, so cascade thresholds keep matching
+            'source': source_entry.get('source', source_entry['entry']),
+            'source_sha256': source_entry.get('source_sha256') or file_sha256(source_files[0]),
+            'compaction': {'leaf_values': chosen if forests else None, 'max_error': error}
+        }
+        entries[model_name] = entry
+        report.append({
+            'model': model_name, 'forests': forests, 'compact_s': seconds, 'max_error': error,
+            'source_mb': sum(os.path.getsize(path) for path in source_files) / (1024 * 1024),
+            'mb': os.path.getsize(os.path.join(output_dir, filename)) / (1024 * 1024),
+            'source_rss_mb': resident_mb(manager.models_dir, source_entry) if measure_rss else None,
+            'rss_mb': resident_mb(output_dir, entry) if measure_rss else None
+        })
+
+    write_manifest(output_dir, build_manifest(output_dir, entries))
+    return chosen, report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--models', help="source model directory (default: MODEL_DIR or ./models)")
+    parser.add_argument('--output', required=True, help="directory for the compacted models and manifest")
+    parser.add_argument('--precision', default=COMPACTION_PRECISION, choices=['auto'] + list(PRECISIONS))
+    parser.add_argument('--tolerance', type=float, default=COMPACTION_TOLERANCE)
+    parser.add_argument('--data', help="reference CSV (default: PARITY_DATASET or synthetic rows)")
+    parser.add_argument('--rows', type=int, help="reference rows (default: PARITY_ROWS)")
+    parser.add_argument('--no-rss', action='store_true', help="skip the per-model RSS measurement")
+    args = parser.parse_args()
+    if args.models:
+        os.environ['MODEL_DIR'] = args.models
+
+    from model_loader import ModelManager, import_estimator_modules
+    from fastpath import PARITY_DATASET, PARITY_ROWS, load_reference_data
+    from artifacts import ARTIFACT_MANIFEST
+    import_estimator_modules()
+    manager = ModelManager()
+    if os.path.abspath(args.output) == os.path.abspath(manager.models_dir):
+        sys.exit("--output must differ from the source model directory")
+    X_ref = load_reference_data(args.data or PARITY_DATASET, args.rows or PARITY_ROWS)
+
+    try:
+        chosen, report = compact_models(manager, args.output, X_ref, args.precision,
+                                        args.tolerance, measure_rss=not args.no_rss)
+    except CompactionError as e:
+        print(f"[ERROR] Compaction failed: {e}")
+        return 1
+
+    def mb(value):
+        return f"{value:.1f}" if value is not None else "n/a"
+
+    print(f"\nLeaf values: {chosen}, tolerance {args.tolerance:.0e}, {len(X_ref)} reference rows")
+    total_saved = 0.0
+    for row in report:
+        saved = None
+        if row['source_rss_mb'] is not None and row['rss_mb'] is not None:
+            saved = row['source_rss_mb'] - row['rss_mb']
+            total_saved += saved
+        print(f"{manager.display_names[row['model']]:<22} file {row['source_mb']:>7.2f} -> {row['mb']:>6.2f} MB  "
+              f"RSS {mb(row['source_rss_mb']):>6} -> {mb(row['rss_mb']):>6} MB (saved {mb(saved)} MB)  "
+              f"forests {row['forests']}  max error {row['max_error']:.1e}")
+    if not args.no_rss:
+        print(f"Total RSS saved: {total_saved:.1f} MB")
+    print(f"[INFO] Manifest written to {os.path.join(args.output, ARTIFACT_MANIFEST)}")
+    return 0
+
+
+if __name__ == "__main__":
+    # Through the module, so pickles name compaction.CompactForestClassifier, not __main__
+    import compaction
+    sys.exit(compaction.main())
@@ -0,0 +1,157 @@
+"""
+SLO-aware load shedding by ensemble tier.
+When recent inference latency or the inference queue exceed their targets,
+predictions step down one tier at a time - full stacking, then a cheaper
+base-model subset averaged like failed models are, then the rule-based
+fallback - and step back up once load drops. Every prediction reports the
+tier that produced it.
+"""
+
+import math
+import os
+import threading
+import time
+from collections import deque
+from logs import get_logger
+
+# Every tier, cheapest last; the wire format sends a tier as its index here
+TIERS = ('full', 'subset', 'fallback')
+# Reported instead of 'full' for rows a cascade stage answered (never selected by load)
+CASCADE_TIER = 'cascade'
+
+# Step down through the tiers under load (opt-in)
+SLO_ENABLED = os.getenv('SLO_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+# Tiers to step through, in order (must start with full)
+SLO_TIERS = [tier.strip() for tier in os.getenv('SLO_TIERS', ','.join(TIERS)).split(',') if tier.strip()]
+# Target p95 inference latency (queue wait included), milliseconds
+SLO_LATENCY_MS = float(os.getenv('SLO_LATENCY_MS', 250))
+# Inference queue depth (running + waiting requests) treated as overload
+SLO_QUEUE_DEPTH = int(os.getenv('SLO_QUEUE_DEPTH', 16))
+# Recent latencies the p95 is taken over, and how many are needed to act on it
+SLO_WINDOW = int(os.getenv('SLO_WINDOW', 100))
+SLO_MIN_SAMPLES = int(os.getenv('SLO_MIN_SAMPLES', 20))
+# Step back up when p95 is below this fraction of the target and the queue is half empty
+SLO_RECOVERY_RATIO = float(os.getenv('SLO_RECOVERY_RATIO', 0.5))
+# Minimum seconds between two tier changes
+SLO_COOLDOWN = float(os.getenv('SLO_COOLDOWN', 5))
+# Seconds to wait before stepping up doubles after each failed recovery, up to this
+SLO_MAX_HOLD = float(os.getenv('SLO_MAX_HOLD', 120))
+# Base models run in the subset tier
+DEGRADED_MODELS = [name.strip() for name in os.getenv('DEGRADED_MODELS', 'model3,model5').split(',') if name.strip()]
+
+log = get_logger('degradation')
+
+
+def tier_code(tier):
+    """Numeric tier for the compact wire format and the tier gauge (cascade: 3)"""
+    return (*TIERS, CASCADE_TIER).index(tier)
+
+
+def most_degraded(tiers):
+    """The cheapest of several tiers (used for a micro-batch of requests)"""
+    return max(tiers, key=tier_code)
+
+
+class DegradationController:
+    """Picks the tier for new requests from recent latency and queue depth"""
+
+    def __init__(self, tiers=SLO_TIERS, latency_ms=SLO_LATENCY_MS, queue_depth=SLO_QUEUE_DEPTH,
+                 window=SLO_WINDOW, min_samples=SLO_MIN_SAMPLES,
+                 recovery_ratio=SLO_RECOVERY_RATIO, cooldown=SLO_COOLDOWN, max_hold=SLO_MAX_HOLD):
+        unknown = [tier for tier in tiers if tier not in TIERS]
+        if unknown or not tiers or tiers[0] != 'full':
+            raise ValueError(f"SLO_TIERS must start with 'full' and name tiers from {TIERS}, got {tiers!r}")
+        self.tiers = list(tiers)
+        self.target = latency_ms / 1000
+        self.queue_depth = max(1, queue_depth)
+        self.min_samples = max(1, min_samples)
+        self.recovery_ratio = recovery_ratio
+        self.cooldown = cooldown
+        self.max_hold = max(cooldown, max_hold)
+        # Seconds a tier is held before stepping up; doubled when a step up
+        # is undone before its tier proved itself on enough samples
+        self.hold = cooldown
+        self.recovering = False
+        self.level = 0
+        self.transitions = 0
+        self.changed_at = time.monotonic()
+        self._latencies = deque(maxlen=max(self.min_samples, window))
+        self._lock = threading.Lock()
+
+    @property
+    def tier(self):
+        return self.tiers[self.level]
+
+    def record(self, seconds, tier):
+        """Latency of one inference; samples from an earlier tier are ignored"""
+        if tier == self.tier:
+            self._latencies.append(seconds)
+
+    def record_overload(self, tier):
+        """A request rejected or timed out by the executor counts as an SLO miss"""
+        self.record(math.inf, tier)
+
+    def p95(self):
+        """p95 of the recent latencies, None until there are enough of them"""
+        samples = sorted(self._latencies)
+        if len(samples) < self.min_samples:
+            return None
+        return samples[math.ceil(0.95 * len(samples)) - 1]
+
+    def update(self, queue_depth):
+        """Tier for a new request, stepping down or up at most once per cooldown"""
+        with self._lock:
+            now = time.monotonic()
+            elapsed = now - self.changed_at
+            if elapsed < self.cooldown:
+                return self.tier
+
+            p95 = self.p95()
+            overloaded = queue_depth > self.queue_depth or (p95 is not None and p95 > self.target)
+            if p95 is None:
+                # Nothing is scored by a model in the fallback tier, so the queue decides
+                relaxed = self.tier == 'fallback'
+            else:
+                relaxed = p95 < self.target * self.recovery_ratio
+            relaxed = relaxed and queue_depth <= self.queue_depth // 2
+
+            if overloaded and self.level < len(self.tiers) - 1:
+                if self.recovering:
+                    # The tier we stepped up to could not take the load
+                    self.hold = min(self.hold * 2, self.max_hold)
+                    self.recovering = False
+                self._change(self.level + 1, now, p95, queue_depth)
+            elif self.recovering and p95 is not None and not overloaded:
+                # The step up held over SLO_MIN_SAMPLES inferences
+                self.recovering = False
+                self.hold = self.cooldown
+            elif relaxed and not overloaded and self.level > 0 and elapsed >= self.hold:
+                self.recovering = True
+                self._change(self.level - 1, now, p95, queue_depth)
+            return self.tier
+
+    def _change(self, level, now, p95, queue_depth):
+        previous = self.tier
+        self.level = level
+        self.changed_at = now
+        self.transitions += 1
+        self._latencies.clear()
+        p95_ms = 'n/a' if p95 is None else ('inf' if math.isinf(p95) else f"{p95 * 1000:.0f}ms")
+        log_method = log.warning if level > self.tiers.index(previous) else log.info
+        log_method("Ensemble tier %s -> %s (p95 %s, queue %s)", previous, self.tier, p95_ms, queue_depth)
+
+    def stats(self):
+        """Current tier and recent latency for /health"""
+        p95 = self.p95()
+        return {
+            "enabled": True,
+            "tier": self.tier,
+            "tiers": self.tiers,
+            "subset_models": DEGRADED_MODELS,
+            "target_p95_ms": self.target * 1000,
+            "recent_p95_ms": None if p95 is None or math.isinf(p95) else round(p95 * 1000, 1),
+            "queue_depth_limit": self.queue_depth,
+            "transitions": self.transitions,
+            "hold_seconds": self.hold,
+            "seconds_in_tier": round(time.monotonic() - self.changed_at, 1)
+        }
@@ -0,0 +1,175 @@
+"""
+Ensemble inference shared by the single-row and batch prediction paths.
+Each base model and the stacking model run once over an N-row DataFrame.
+"""
+
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import os
+import threading
+import time
+import numpy as np
+from logs import get_logger
+
+# Base model keys in response order (matches ModelManager.models)
+BASE_MODELS = ['model1', 'model2', 'model3', 'model4', 'model5']
+
+# Run the base models of one request concurrently on a shared thread pool
+MODEL_FANOUT = os.getenv('MODEL_FANOUT', 'true').lower() in ('1', 'true', 'yes')
+FANOUT_WORKERS = int(os.getenv('FANOUT_WORKERS', 8))
+
+log = get_logger('ensemble')
+
+# base: N x 5 probabilities with failed models filled by the row average
+# stacked: N stacking probabilities (row average where stacking failed)
+# valid_count: number of base models that produced a prediction per row
+# timings: seconds spent in each model that ran, keyed by model name
+# failures: rows each loaded model failed to score (only models with failures)
+# exit_stage: cascade mode only - stage that answered each row, -1 for the
+#   full ensemble; base holds NaN for models skipped by an early exit
+# tier: degradation tier that produced the output (see degradation.py)
+# Rows with valid_count == 0 hold NaN and must use the fallback predictor.
+EnsembleOutput = namedtuple(
+    'EnsembleOutput', ['base', 'stacked', 'valid_count', 'timings', 'failures', 'exit_stage', 'tier'],
+    defaults=(None, 'full')
+)
+
+_fanout_pool = None
+_fanout_pid = None
+_fanout_lock = threading.Lock()
+
+
+def get_fanout_pool():
+    """Shared fan-out pool, recreated after a fork (threads do not survive it)"""
+    global _fanout_pool, _fanout_pid
+    with _fanout_lock:
+        if _fanout_pool is None or _fanout_pid != os.getpid():
+            _fanout_pool = ThreadPoolExecutor(
+                max_workers=FANOUT_WORKERS, thread_name_prefix='fanout'
+            )
+            _fanout_pid = os.getpid()
+        return _fanout_pool
+
+
+def predict_positive_proba(model, X, display_name):
+    """
+    Probability of class 1 for every row of X, NaN where the model failed.
+    A failing batch call is retried row by row so one bad row does not
+    take down the whole batch (same isolation as the single-row path).
+    """
+    n_rows = len(X)
+    try:
+        return np.asarray(model.predict_proba(X)[:, 1], dtype=float)
+    except Exception as e:
+        if n_rows == 1:
+            log.error("%s prediction failed: %s", display_name, e)
+            return np.full(1, np.nan)
+        log.warning("%s batch prediction failed, retrying row by row: %s", display_name, e)
+
+    proba = np.full(n_rows, np.nan)
+    for i in range(n_rows):
+        try:
+            proba[i] = float(model.predict_proba(X.iloc[[i]])[0][1])
+        except Exception as e:
+            log.error("%s prediction failed for row %s: %s", display_name, i, e)
+    return proba
+
+
+def timed_predict(model, X, display_name):
+    """predict_positive_proba plus the seconds it took"""
+    start = time.perf_counter()
+    proba = predict_positive_proba(model, X, display_name)
+    return proba, time.perf_counter() - start
+
+
+def run_base_models(X, models, display_names, precomputed=None):
+    """
+    Score X with every loaded base model, concurrently when MODEL_FANOUT is on.
+    `precomputed` maps model name -> probabilities already computed for X
+    (e.g. by a cascade stage); those models are not run again.
+    Returns (N x 5 matrix with NaN for failed/missing models, timings, failures).
+    """
+    base = np.full((len(X), len(BASE_MODELS)), np.nan)
+    timings = {}
+    failures = {}
+    precomputed = precomputed or {}
+    jobs = [
+        (col, name, models.get(name))
+        for col, name in enumerate(BASE_MODELS)
+        if models.get(name) is not None and name not in precomputed
+    ]
+
+    if MODEL_FANOUT and len(jobs) > 1:
+        pool = get_fanout_pool()
+        futures = [
+            (col, name, pool.submit(timed_predict, model, X, display_names[name]))
+            for col, name, model in jobs
+        ]
+        results = [(col, name, future.result()) for col, name, future in futures]
+    else:
+        results = [
+            (col, name, timed_predict(model, X, display_names[name]))
+            for col, name, model in jobs
+        ]
+
+    for col, name in enumerate(BASE_MODELS):
+        if name in precomputed:
+            base[:, col] = precomputed[name]
+            failed = int(np.isnan(precomputed[name]).sum())
+            if failed:
+                failures[name] = failed
+    for col, name, (proba, seconds) in results:
+        base[:, col] = proba
+        timings[name] = seconds
+        failed = int(np.isnan(proba).sum())
+        if failed:
+            failures[name] = failed
+    return base, timings, failures
+
+
+def run_ensemble(X, models, display_names, stacking_plan=None, precomputed=None):
+    """
+    Run the 5 base models + stacking model over X.
+    `models` is the ModelManager.models dict; missing models are skipped.
+    With a StackingPlan the meta-model reuses the base outputs computed here;
+    rows missing a base output it needs go through the full stacking model.
+    """
+    n_rows = len(X)
+    base, timings, failures = run_base_models(X, models, display_names, precomputed)
+
+    valid = ~np.isnan(base)
+    valid_count = valid.sum(axis=1)
+    has_valid = valid_count > 0
+
+    avg_prob = np.full(n_rows, np.nan)
+    avg_prob[has_valid] = np.nansum(base[has_valid], axis=1) / valid_count[has_valid]
+
+    # Try stacking model, fallback to average if it fails
+    stacking_model = models.get('stacking')
+    stacked = np.full(n_rows, np.nan)
+    if stacking_model is not None and has_valid.any():
+        start = time.perf_counter()
+        full_rows = has_valid
+        if stacking_plan is not None:
+            ready = valid[:, stacking_plan.columns].all(axis=1)
+            if ready.any():
+                try:
+                    stacked[ready] = stacking_plan.predict_proba(base[ready])[:, 1]
+                    full_rows = has_valid & ~ready
+                except Exception as e:
+                    log.error("Stacking meta-model failed, using full stacking path: %s", e)
+        if full_rows.any():
+            X_full = X if full_rows.all() else X[full_rows]
+            stacked[full_rows] = predict_positive_proba(stacking_model, X_full, display_names['stacking'])
+            failed = int(np.isnan(stacked[full_rows]).sum())
+            if failed:
+                failures['stacking'] = failed
+        timings['stacking'] = time.perf_counter() - start
+    stacked = np.where(np.isnan(stacked), avg_prob, stacked)
+
+    # Fill missing predictions with average
+    base = np.where(valid, base, avg_prob[:, None])
+
+    return EnsembleOutput(
+        base=base, stacked=stacked, valid_count=valid_count, timings=timings, failures=failures
+    )
@@ -0,0 +1,132 @@
+"""
+Bounded worker pool that keeps CPU-bound model inference off the asyncio
+event loop, so /health and other requests stay responsive under load.
+"""
+
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from ensemble import run_ensemble
+from cascade import run_cascade
+from model_loader import model_manager
+from degradation import DEGRADED_MODELS
+from logs import get_logger
+
+# thread: models share memory; most estimators release the GIL while predicting
+# process: one model copy per worker, for estimators that hold the GIL
+INFERENCE_EXECUTOR = os.getenv('INFERENCE_EXECUTOR', 'thread').lower()
+INFERENCE_WORKERS = int(os.getenv('INFERENCE_WORKERS', min(4, os.cpu_count() or 1)))
+# Requests allowed to wait for a free worker before new ones get a 503
+INFERENCE_QUEUE_SIZE = int(os.getenv('INFERENCE_QUEUE_SIZE', 32))
+# Seconds a request may wait for its inference before giving up
+INFERENCE_TIMEOUT = float(os.getenv('INFERENCE_TIMEOUT', 10))
+# Retry-After value (seconds) sent with 503 responses when saturated
+INFERENCE_RETRY_AFTER = int(os.getenv('INFERENCE_RETRY_AFTER', 1))
+
+log = get_logger('executor')
+
+
+class ExecutorSaturated(Exception):
+    """Raised when every worker is busy and the wait queue is full"""
+
+
+class InferenceTimeout(Exception):
+    """Raised when an inference does not finish within the timeout"""
+
+
+def run_model_ensemble(X, tier='full'):
+    """
+    Worker task: score X with the models loaded in this process. The subset
+    tier runs only DEGRADED_MODELS and no stacking model, so the result is
+    their average with the other models filled by it, as for failed models.
+    """
+    models, stacking_plan, cascade_plan = model_manager.get_cascade_state()
+    if tier == 'subset':
+        subset = {name: models.get(name) for name in DEGRADED_MODELS}
+        return run_ensemble(X, subset, model_manager.display_names)._replace(tier=tier)
+    if cascade_plan is not None:
+        return run_cascade(X, models, model_manager.display_names, stacking_plan, cascade_plan)
+    return run_ensemble(X, models, model_manager.display_names, stacking_plan)
+
+
+def _init_process_worker():
+    """Process pool initializer - load models unless inherited via fork"""
+    if model_manager.get_loaded_count() == 0:
+        model_manager.load_all_models()
+
+
+class InferenceExecutor:
+    """Thread or process pool with a bounded number of pending tasks"""
+
+    def __init__(self, kind=INFERENCE_EXECUTOR, workers=INFERENCE_WORKERS,
+                 queue_size=INFERENCE_QUEUE_SIZE, timeout=INFERENCE_TIMEOUT):
+        if kind not in ('thread', 'process'):
+            raise ValueError(f"INFERENCE_EXECUTOR must be 'thread' or 'process', got {kind!r}")
+        self.kind = kind
+        self.workers = max(1, workers)
+        self.queue_size = max(0, queue_size)
+        self.timeout = timeout
+        self.pending = 0  # running + queued tasks
+        self._lock = threading.Lock()
+        self._pool = None
+
+    def start(self):
+        """Create the worker pool"""
+        if self.kind == 'process':
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers, initializer=_init_process_worker
+            )
+        else:
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix='inference'
+            )
+        log.info("Inference executor: %s pool, %s worker(s), queue %s, timeout %ss",
+                 self.kind, self.workers, self.queue_size, self.timeout)
+
+    def recycle(self):
+        """Replace a process pool so its workers fork with the current models"""
+        if self.kind != 'process' or self._pool is None:
+            return
+        old_pool, self._pool = self._pool, None
+        self.start()
+        # Tasks already running in the old workers still complete
+        old_pool.shutdown(wait=False)
+
+    def shutdown(self):
+        """Stop the worker pool, dropping queued tasks"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def _release(self, _future):
+        with self._lock:
+            self.pending -= 1
+
+    async def run(self, fn, *args):
+        """Run fn(*args) on the pool; raises ExecutorSaturated or InferenceTimeout"""
+        if self._pool is None:
+            self.start()
+
+        with self._lock:
+            if self.pending >= self.workers + self.queue_size:
+                raise ExecutorSaturated()
+            self.pending += 1
+
+        try:
+            future = self._pool.submit(fn, *args)
+        except Exception:
+            self._release(None)
+            raise
+        # The slot is freed when the task really finishes (or is cancelled
+        # while queued), not when the caller stops waiting for it
+        future.add_done_callback(self._release)
+
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            raise InferenceTimeout()
+
+
+# Global inference executor instance
+inference_executor = InferenceExecutor()
@@ -0,0 +1,167 @@
+"""
+Rule-based fallback risk, vectorized over NumPy feature arrays.
+Same points as calculate_fallback_risk in app.py: each factor's points are
+looked up from a table indexed by the number of thresholds the value
+exceeds, and the points are added in the same order, so scores are
+bit-for-bit identical to the scalar function.
+
+calculate_fallback_risk is kept as the reference implementation only; run
+`python fallback.py` (or tests/test_fallback.py) to check parity on every
+threshold boundary combination plus random rows.
+"""
+
+import numpy as np
+
+# (thresholds, points): points[k] applies when the value exceeds k thresholds
+AGE_POINTS = ([35, 45, 55, 65], [0.0, 0.10, 0.15, 0.20, 0.25])
+AP_HI_THRESHOLDS = [130, 140, 160]
+AP_LO_THRESHOLDS = [85, 90, 100]
+BP_POINTS = [0.0, 0.10, 0.20, 0.30]
+BMI_POINTS = ([25, 30, 35], [0.0, 0.10, 0.15, 0.20])
+# Exact category value -> points (anything else scores 0)
+CHOLESTEROL_POINTS = {3: 0.15, 2: 0.10}
+GLUC_POINTS = {3: 0.10, 2: 0.05}
+
+# Model feature columns the fallback reads
+FALLBACK_COLUMNS = ['age_years', 'ap_hi', 'ap_lo', 'bmi', 'cholesterol', 'gluc', 'smoke', 'alco', 'active']
+# Fallback base predictions are the risk score scaled per model
+BASE_FACTORS = {'model1': 0.95, 'model2': 1.05, 'model3': 0.98, 'model4': 1.02, 'model5': 1.0}
+
+
+def exceeded(values, thresholds):
+    """Number of thresholds each value is strictly greater than (NaN exceeds none)"""
+    count = np.zeros(len(values), dtype=np.intp)
+    for threshold in thresholds:
+        count += values > threshold
+    return count
+
+
+def category_points(values, points):
+    return np.select([values == value for value in points], list(points.values()), 0.0)
+
+
+def fallback_risk(age_years, ap_hi, ap_lo, bmi, cholesterol, gluc, smoke, alco, active):
+    """Fallback risk score (0-1) per row; arguments are equal-length arrays"""
+    age_years, ap_hi, ap_lo, bmi = (np.asarray(v, dtype=float) for v in (age_years, ap_hi, ap_lo, bmi))
+    cholesterol, gluc, smoke, alco, active = (np.asarray(v) for v in (cholesterol, gluc, smoke, alco, active))
+
+    # Blood pressure scores the worse tier of the systolic and diastolic readings
+    bp_tier = np.maximum(exceeded(ap_hi, AP_HI_THRESHOLDS), exceeded(ap_lo, AP_LO_THRESHOLDS))
+
+    # Summed in calculate_fallback_risk's order so rounding matches exactly
+    risk = np.zeros(len(age_years))
+    risk += np.take(AGE_POINTS[1], exceeded(age_years, AGE_POINTS[0]))
+    risk += np.take(BP_POINTS, bp_tier)
+    risk += np.take(BMI_POINTS[1], exceeded(bmi, BMI_POINTS[0]))
+    risk += category_points(cholesterol, CHOLESTEROL_POINTS)
+    risk += category_points(gluc, GLUC_POINTS)
+    risk += np.where(smoke == 1, 0.10, 0.0)
+    risk += np.where(alco == 1, 0.05, 0.0)
+    risk += np.where(active == 0, 0.05, 0.0)
+    return np.minimum(risk, 1.0)
+
+
+def fallback_risk_frame(X):
+    """fallback_risk for a DataFrame with the model feature columns"""
+    return fallback_risk(*(X[column].to_numpy() for column in FALLBACK_COLUMNS))
+
+
+def fallback_base_predictions(risk):
+    """N x 5 base-model predictions derived from the fallback risk"""
+    return np.column_stack([risk * factor for factor in BASE_FACTORS.values()])
+
+
+def _boundary_values(thresholds, step=1e-9):
+    values = {0.0, -1.0, 1e6, np.nan}
+    for threshold in thresholds:
+        values.update([threshold - 1, threshold - step, threshold, threshold + step, threshold + 1])
+    return sorted(values, key=lambda v: (np.isnan(v), v))
+
+
+def parity_rows(random_rows=100000, seed=0):
+    """
+    Every combination of the numeric factors' boundary values (just below,
+    at and just above each threshold, NaN, out of range), every combination
+    of the categorical codes, plus random rows
+    """
+    import itertools
+    import pandas as pd
+
+    numeric = {
+        'age_years': _boundary_values(AGE_POINTS[0]),
+        'ap_hi': _boundary_values(AP_HI_THRESHOLDS),
+        'ap_lo': _boundary_values(AP_LO_THRESHOLDS),
+        'bmi': _boundary_values(BMI_POINTS[0])
+    }
+    categorical = {
+        'cholesterol': [0, 1, 2, 3, 4],
+        'gluc': [0, 1, 2, 3, 4],
+        'smoke': [0, 1, 2],
+        'alco': [0, 1, 2],
+        'active': [0, 1, 2]
+    }
+    numeric_combos = list(itertools.product(*numeric.values()))
+    categorical_combos = list(itertools.product(*categorical.values()))
+    # Each grid cycles through the other one so all code/tier pairings occur
+    rows = [
+        numeric_row + categorical_combos[i % len(categorical_combos)]
+        for i, numeric_row in enumerate(numeric_combos)
+    ] + [
+        numeric_combos[(i * 7919) % len(numeric_combos)] + categorical_row
+        for i, categorical_row in enumerate(categorical_combos)
+        for _ in range(20)
+    ]
+    grid = pd.DataFrame(rows, columns=list(numeric) + list(categorical))
+
+    rng = np.random.default_rng(seed)
+    random = pd.DataFrame({
+        'age_years': rng.uniform(20, 80, random_rows).round(1),
+        'ap_hi': rng.integers(70, 230, random_rows).astype(float),
+        'ap_lo': rng.integers(40, 140, random_rows).astype(float),
+        'bmi': rng.uniform(15, 45, random_rows).round(2),
+        'cholesterol': rng.integers(1, 4, random_rows),
+        'gluc': rng.integers(1, 4, random_rows),
+        'smoke': rng.integers(0, 2, random_rows),
+        'alco': rng.integers(0, 2, random_rows),
+        'active': rng.integers(0, 2, random_rows)
+    })
+    return pd.concat([grid, random], ignore_index=True)
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+    import time
+    from collections import namedtuple
+
+    parser = argparse.ArgumentParser(description="Check fallback_risk against calculate_fallback_risk")
+    parser.add_argument('--random-rows', type=int, default=100000)
+    args = parser.parse_args()
+
+    from app import calculate_fallback_risk, build_fallback_predictions
+
+    X = parity_rows(args.random_rows)
+    # calculate_fallback_risk only reads attributes
+    Row = namedtuple('Row', [column if column != 'active' else 'ACTIVE' for column in X.columns])
+    records = [Row._make(row) for row in X.itertuples(index=False)]
+
+    start = time.perf_counter()
+    expected = np.array([calculate_fallback_risk(record) for record in records])
+    scalar_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    risk = fallback_risk_frame(X)
+    vector_seconds = time.perf_counter() - start
+
+    mismatched = np.flatnonzero(risk != expected)
+    # The app's response dicts, against the scalar score scaled per model
+    served = build_fallback_predictions(records[:20000])
+    served_base = np.array([[result['base_predictions'][name] for name in BASE_FACTORS] for result in served])
+    expected_base = np.column_stack([expected[:20000] * factor for factor in BASE_FACTORS.values()])
+    base_mismatched = int((served_base != expected_base).any(axis=1).sum())
+    base_mismatched += sum(result['stacked']['probability'] != score for result, score in zip(served, expected))
+
+    print(f"{len(X)} rows: {len(mismatched)} risk mismatches, {base_mismatched} base prediction mismatches")
+    print(f"scalar {scalar_seconds / len(X) * 1e6:.2f} us/row, vectorized {vector_seconds / len(X) * 1e6:.3f} us/row")
+    for i in mismatched[:10]:
+        print(f"  {X.iloc[i].to_dict()}: expected {expected[i]!r}, got {risk[i]!r}")
+    sys.exit(1 if len(mismatched) or base_mismatched else 0)
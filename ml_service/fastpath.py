@@ -0,0 +1,563 @@
+"""
+NumPy fast scoring path for the loaded sklearn pipelines.
+Each pipeline is compiled into plain arrays (scaler statistics, linear
+coefficients, flattened tree nodes) and scored without the per-call
+DataFrame validation and transformer dispatch of sklearn's Pipeline.
+
+Run `python fastpath.py` to check numerical parity of every compiled model
+against the original predict_proba on a reference dataset.
+"""
+
+import json
+import os
+import tempfile
+import numpy as np
+from synthetic import FEATURE_COLUMNS, make_feature_frame
+from logs import get_logger
+
+# Compile the loaded pipelines at startup and score from the compiled form
+COMPILE_MODELS = os.getenv('COMPILE_MODELS', 'false').lower() in ('1', 'true', 'yes')
+# Max allowed |compiled - original| class-1 probability on the reference data
+PARITY_TOLERANCE = float(os.getenv('PARITY_TOLERANCE', 1e-6))
+# Optional CSV used as the parity reference dataset (synthetic rows otherwise)
+PARITY_DATASET = os.getenv('PARITY_DATASET')
+PARITY_ROWS = int(os.getenv('PARITY_ROWS', 1000))
+
+log = get_logger('fastpath')
+
+
+class UnsupportedModel(Exception):
+    """Raised when a pipeline step has no compiled equivalent"""
+
+
+def sigmoid(z):
+    return 1.0 / (1.0 + np.exp(-z))
+
+
+# ---------------------------------------------------------------------------
+# Preprocessing
+# ---------------------------------------------------------------------------
+
+class ScaleTransform:
+    """Column-wise x -> clip(((x - sub) / div) * mul + add), same op order as sklearn"""
+
+    def __init__(self, sub=None, div=None, mul=None, add=None, clip=None):
+        self.sub = sub
+        self.div = div
+        self.mul = mul
+        self.add = add
+        self.clip = clip
+
+    def __call__(self, A):
+        A = A.copy()
+        if self.sub is not None:
+            A -= self.sub
+        if self.div is not None:
+            A /= self.div
+        if self.mul is not None:
+            A *= self.mul
+        if self.add is not None:
+            A += self.add
+        if self.clip is not None:
+            np.clip(A, self.clip[0], self.clip[1], out=A)
+        return A
+
+
+class ImputeTransform:
+    """Replace NaN with a per-column fill value"""
+
+    def __init__(self, fill):
+        self.fill = fill
+
+    def __call__(self, A):
+        missing = np.isnan(A)
+        if not missing.any():
+            return A
+        return np.where(missing, self.fill, A)
+
+
+def compile_transform(step):
+    """Compiled equivalent of one fitted preprocessing step"""
+    name = type(step).__name__
+
+    if name == 'StandardScaler':
+        return ScaleTransform(sub=step.mean_ if step.with_mean else None,
+                              div=step.scale_ if step.with_std else None)
+    if name == 'RobustScaler':
+        return ScaleTransform(sub=step.center_ if step.with_centering else None,
+                              div=step.scale_ if step.with_scaling else None)
+    if name == 'MaxAbsScaler':
+        return ScaleTransform(div=step.scale_)
+    if name == 'MinMaxScaler':
+        return ScaleTransform(mul=step.scale_, add=step.min_,
+                              clip=step.feature_range if step.clip else None)
+    if name == 'SimpleImputer':
+        statistics = np.asarray(step.statistics_, dtype=float)
+        missing_values = step.missing_values
+        if step.add_indicator or np.isnan(statistics).any():
+            raise UnsupportedModel("SimpleImputer with indicator or dropped columns")
+        if not (isinstance(missing_values, float) and np.isnan(missing_values)):
+            raise UnsupportedModel("SimpleImputer with non-NaN missing_values")
+        return ImputeTransform(statistics)
+    if name == 'FunctionTransformer' and step.func is None:
+        return None
+
+    raise UnsupportedModel(f"preprocessing step {name}")
+
+
+# ---------------------------------------------------------------------------
+# Estimators
+# ---------------------------------------------------------------------------
+
+class LinearModel:
+    """Binary logistic regression: sigmoid(A @ coef + intercept)"""
+
+    def __init__(self, coef, intercept):
+        self.coef = coef
+        self.intercept = intercept
+
+    def positive_proba(self, A):
+        return sigmoid(A @ self.coef + self.intercept)
+
+
+# Missing-value handling per tree node
+MISSING_NAN = 0        # NaN goes to the default child
+MISSING_AS_ZERO = 1    # NaN is treated as 0 (LightGBM missing_type=None)
+MISSING_ZERO_NAN = 2   # NaN and 0 go to the default child (LightGBM missing_type=Zero)
+
+
+class TreeEnsemble:
+    """
+    Binary trees flattened into shared node arrays and traversed for all
+    rows and trees at once. Leaves point to themselves so every path can run
+    for max_depth steps without masking.
+    aggregate='mean': average of per-tree class-1 probabilities (random forest)
+    aggregate='sigmoid': sigmoid(base_margin + sum of leaf values) (boosting)
+    """
+
+    def __init__(self, left, right, feature, threshold, default_left, missing,
+                 value, roots, max_depth, strict=False, dtype=np.float64,
+                 aggregate='mean', base_margin=0.0):
+        self.left = left
+        self.right = right
+        self.feature = feature
+        self.threshold = threshold
+        self.default_left = default_left
+        self.missing = missing
+        self.value = value
+        self.roots = roots
+        self.max_depth = max_depth
+        self.strict = strict  # x < threshold goes left (XGBoost), else x <= threshold
+        self.dtype = dtype
+        self.aggregate = aggregate
+        self.base_margin = base_margin
+        self.has_zero_missing = bool((missing == MISSING_ZERO_NAN).any())
+
+    def positive_proba(self, A):
+        A = np.asarray(A, dtype=self.dtype)
+        slow_path = self.has_zero_missing or np.isnan(A).any()
+        if self.aggregate == 'mean' and not slow_path:
+            # Forest paths end far apart; only the unfinished ones are advanced
+            return self._descend(A).mean(axis=1, dtype=np.float64)
+        rows = np.arange(len(A))[:, None]
+        node = np.broadcast_to(self.roots, (len(A), len(self.roots)))
+
+        for _ in range(self.max_depth):
+            x = A[rows, self.feature[node]]
+            threshold = self.threshold[node]
+            if slow_path:
+                nan = np.isnan(x)
+                code = self.missing[node]
+                x = np.where(nan & (code == MISSING_AS_ZERO), 0.0, x)
+                to_default = (nan & (code != MISSING_AS_ZERO)) | ((code == MISSING_ZERO_NAN) & (x == 0))
+                go_left = x < threshold if self.strict else x <= threshold
+                go_left = np.where(to_default, self.default_left[node], go_left)
+            else:
+                go_left = x < threshold if self.strict else x <= threshold
+            node = np.where(go_left, self.left[node], self.right[node])
+
+        leaves = self.value[node]
+        if self.aggregate == 'mean':
+            return leaves.mean(axis=1, dtype=np.float64)
+        return sigmoid(leaves.sum(axis=1, dtype=np.float64) + self.base_margin)
+
+    def _descend(self, A):
+        """Leaf values (rows x trees) for finite inputs, advancing only paths not yet at a leaf"""
+        n_rows, n_trees = len(A), len(self.roots)
+        flat = np.ascontiguousarray(A).ravel()
+        node = np.tile(self.roots, n_rows)
+        active = np.arange(len(node))
+        active_node = node.copy()
+        offset = np.repeat(np.arange(n_rows) * A.shape[1], n_trees)
+        while len(active):
+            x = flat[offset + self.feature[active_node]]
+            go_left = x < self.threshold[active_node] if self.strict else x <= self.threshold[active_node]
+            active_node = np.where(go_left, self.left[active_node], self.right[active_node])
+            node[active] = active_node
+            # Leaves point to themselves
+            internal = self.left[active_node] != active_node
+            if not internal.all():
+                active, active_node, offset = active[internal], active_node[internal], offset[internal]
+        return self.value[node].reshape(n_rows, n_trees)
+
+
+class ObliviousEnsemble:
+    """
+    CatBoost symmetric trees: every level of a tree shares one split, so the
+    leaf index is the bit pattern of (x[feature] > border) over the levels.
+    """
+
+    def __init__(self, feature, border, leaf_values, leaf_offsets, scale, bias):
+        self.feature = feature        # trees x depth
+        self.border = border          # trees x depth (+inf pads shorter trees)
+        self.leaf_values = leaf_values
+        self.leaf_offsets = leaf_offsets
+        self.powers = (1 << np.arange(feature.shape[1])).astype(np.int64)
+        self.scale = scale
+        self.bias = bias
+
+    def positive_proba(self, A):
+        A = np.nan_to_num(np.asarray(A, dtype=np.float32), nan=-np.inf)
+        bits = A[:, self.feature] > self.border
+        index = bits.astype(np.int64) @ self.powers
+        raw = self.leaf_values[self.leaf_offsets + index].sum(axis=1)
+        return sigmoid(self.scale * raw + self.bias)
+
+
+def _pack_trees(trees, leaf_value_dtype=np.float64):
+    """
+    Concatenate per-tree node lists into one TreeEnsemble array set.
+    Each tree is a dict of equal-length lists: left, right, feature,
+    threshold, default_left, missing, value; leaves have left == -1.
+    """
+    arrays = {key: [] for key in ('left', 'right', 'feature', 'threshold', 'default_left', 'missing', 'value')}
+    roots = []
+    max_depth = 0
+    offset = 0
+
+    for tree in trees:
+        left = np.asarray(tree['left'], dtype=np.int64)
+        right = np.asarray(tree['right'], dtype=np.int64)
+        n_nodes = len(left)
+        is_leaf = left < 0
+        node_ids = np.arange(n_nodes)
+
+        arrays['left'].append(np.where(is_leaf, node_ids, left) + offset)
+        arrays['right'].append(np.where(is_leaf, node_ids, right) + offset)
+        arrays['feature'].append(np.where(is_leaf, 0, np.asarray(tree['feature'], dtype=np.int64)))
+        arrays['threshold'].append(np.asarray(tree['threshold']))
+        arrays['default_left'].append(np.asarray(tree['default_left'], dtype=bool))
+        arrays['missing'].append(np.asarray(tree['missing'], dtype=np.int8))
+        arrays['value'].append(np.asarray(tree['value'], dtype=leaf_value_dtype))
+        roots.append(offset)
+        max_depth = max(max_depth, _tree_depth(left, right))
+        offset += n_nodes
+
+    packed = {key: np.concatenate(parts) for key, parts in arrays.items()}
+    packed['roots'] = np.asarray(roots, dtype=np.int64)
+    packed['max_depth'] = max_depth
+    return packed
+
+
+def _tree_depth(left, right):
+    depth = 0
+    frontier = [0]
+    while frontier:
+        frontier = [child for node in frontier if left[node] >= 0 for child in (left[node], right[node])]
+        if frontier:
+            depth += 1
+    return depth
+
+
+def compile_sklearn_forest(estimator):
+    """DecisionTree / RandomForest / ExtraTrees classifier"""
+    trees = getattr(estimator, 'estimators_', [estimator])
+    if estimator.n_outputs_ != 1:
+        raise UnsupportedModel("multi-output trees")
+
+    flat = []
+    for tree_model in trees:
+        tree = tree_model.tree_
+        value = tree.value[:, 0, :]
+        total = value.sum(axis=1)
+        total[total == 0] = 1.0
+        missing_left = getattr(tree, 'missing_go_to_left', np.zeros(tree.node_count, dtype=np.uint8))
+        flat.append({
+            'left': tree.children_left,
+            'right': tree.children_right,
+            'feature': tree.feature,
+            'threshold': tree.threshold,
+            'default_left': missing_left,
+            'missing': np.full(tree.node_count, MISSING_NAN),
+            'value': value[:, 1] / total
+        })
+
+    # sklearn casts inputs to float32 before comparing with float64 thresholds
+    return TreeEnsemble(**_pack_trees(flat), dtype=np.float32, aggregate='mean')
+
+
+def compile_xgboost(estimator):
+    """XGBClassifier (gbtree, binary:logistic, numerical splits only)"""
+    booster = estimator.get_booster()
+    learner = json.loads(booster.save_raw('json'))['learner']
+    if learner['objective']['name'] != 'binary:logistic':
+        raise UnsupportedModel(f"XGBoost objective {learner['objective']['name']}")
+    if learner['gradient_booster']['name'] != 'gbtree':
+        raise UnsupportedModel(f"XGBoost booster {learner['gradient_booster']['name']}")
+
+    model = learner['gradient_booster']['model']
+    trees = model['trees']
+    best_iteration = booster.attr('best_iteration')
+    if best_iteration is not None:
+        indptr = model.get('iteration_indptr')
+        n_trees = indptr[int(best_iteration) + 1] if indptr else int(best_iteration) + 1
+        trees = trees[:n_trees]
+
+    flat = []
+    for tree in trees:
+        if any(tree.get('split_type', [])) or tree.get('categories'):
+            raise UnsupportedModel("XGBoost categorical splits")
+        left = np.asarray(tree['left_children'])
+        conditions = np.asarray(tree['split_conditions'], dtype=np.float32)
+        flat.append({
+            'left': left,
+            'right': tree['right_children'],
+            'feature': tree['split_indices'],
+            'threshold': conditions,
+            'default_left': tree['default_left'],
+            'missing': np.full(len(left), MISSING_NAN),
+            # Leaf values are stored in split_conditions
+            'value': np.where(left < 0, conditions, 0.0)
+        })
+
+    base_score = float(str(learner['learner_model_param']['base_score']).strip('[]'))
+    base_margin = float(np.log(base_score / (1.0 - base_score)))
+    return TreeEnsemble(**_pack_trees(flat, np.float32), strict=True, dtype=np.float32,
+                        aggregate='sigmoid', base_margin=base_margin)
+
+
+def compile_lightgbm(estimator):
+    """LGBMClassifier (gbdt, binary objective, numerical splits only)"""
+    dump = estimator.booster_.dump_model()
+    objective = dump.get('objective', '')
+    if not objective.startswith('binary') or dump.get('average_output'):
+        raise UnsupportedModel(f"LightGBM objective {objective}")
+    sigmoid_scale = 1.0
+    for part in objective.split():
+        if part.startswith('sigmoid:'):
+            sigmoid_scale = float(part.split(':', 1)[1])
+
+    missing_codes = {'NaN': MISSING_NAN, 'None': MISSING_AS_ZERO, 'Zero': MISSING_ZERO_NAN}
+    flat = []
+    for info in dump['tree_info']:
+        nodes = {key: [] for key in ('left', 'right', 'feature', 'threshold', 'default_left', 'missing', 'value')}
+
+        def add(node):
+            index = len(nodes['left'])
+            for key in nodes:
+                nodes[key].append(0)
+            if 'leaf_value' in node:
+                nodes['left'][index] = nodes['right'][index] = -1
+                nodes['value'][index] = node['leaf_value']
+                return index
+            if node['decision_type'] != '<=':
+                raise UnsupportedModel("LightGBM categorical splits")
+            nodes['feature'][index] = node['split_feature']
+            nodes['threshold'][index] = node['threshold']
+            nodes['default_left'][index] = node['default_left']
+            nodes['missing'][index] = missing_codes[node['missing_type']]
+            nodes['left'][index] = add(node['left_child'])
+            nodes['right'][index] = add(node['right_child'])
+            return index
+
+        add(info['tree_structure'])
+        flat.append(nodes)
+
+    packed = _pack_trees(flat)
+    # sigmoid(scale * raw): fold the scale into the leaf values
+    packed['value'] = packed['value'] * sigmoid_scale
+    return TreeEnsemble(**packed, aggregate='sigmoid')
+
+
+def compile_catboost(estimator):
+    """CatBoostClassifier with symmetric trees over float features"""
+    handle, path = tempfile.mkstemp(suffix='.json')
+    os.close(handle)
+    try:
+        estimator.save_model(path, format='json')
+        with open(path) as f:
+            dump = json.load(f)
+    finally:
+        os.remove(path)
+
+    features_info = dump.get('features_info', {})
+    if set(features_info) - {'float_features'} or 'oblivious_trees' not in dump:
+        raise UnsupportedModel("CatBoost categorical/text features or non-symmetric trees")
+    flat_index = {f['feature_index']: f['flat_feature_index'] for f in features_info['float_features']}
+    if any(f.get('nan_value_treatment') == 'AsTrue' for f in features_info['float_features']):
+        raise UnsupportedModel("CatBoost nan_mode=Max")
+
+    trees = dump['oblivious_trees']
+    depth = max(len(tree['splits']) for tree in trees)
+    feature = np.zeros((len(trees), depth), dtype=np.int64)
+    border = np.full((len(trees), depth), np.inf, dtype=np.float32)
+    leaf_values, leaf_offsets = [], []
+    offset = 0
+    for t, tree in enumerate(trees):
+        for level, split in enumerate(tree['splits']):
+            if split.get('split_type') != 'FloatFeature':
+                raise UnsupportedModel(f"CatBoost split type {split.get('split_type')}")
+            feature[t, level] = flat_index[split['float_feature_index']]
+            border[t, level] = split['border']
+        leaf_values.extend(tree['leaf_values'])
+        leaf_offsets.append(offset)
+        offset += len(tree['leaf_values'])
+
+    scale, bias = dump.get('scale_and_bias', [1.0, [0.0]])
+    bias = bias[0] if isinstance(bias, list) else bias
+    return ObliviousEnsemble(feature, border, np.asarray(leaf_values, dtype=np.float64),
+                             np.asarray(leaf_offsets, dtype=np.int64), float(scale), float(bias))
+
+
+def compile_estimator(estimator):
+    """Compiled equivalent of a fitted binary classifier"""
+    # Thread-budget wrappers (thread_budget.ThreadCountPredictor) hold the real estimator
+    estimator = getattr(estimator, 'wrapped_estimator', estimator)
+    name = type(estimator).__name__
+    classes = getattr(estimator, 'classes_', None)
+    if classes is not None and len(classes) != 2:
+        raise UnsupportedModel(f"{name} with {len(classes)} classes")
+
+    if name == 'LogisticRegression':
+        return LinearModel(estimator.coef_[0].copy(), float(estimator.intercept_[0]))
+    if name in ('DecisionTreeClassifier', 'RandomForestClassifier', 'ExtraTreesClassifier'):
+        return compile_sklearn_forest(estimator)
+    if name == 'XGBClassifier':
+        return compile_xgboost(estimator)
+    if name == 'LGBMClassifier':
+        return compile_lightgbm(estimator)
+    if name == 'CatBoostClassifier':
+        return compile_catboost(estimator)
+    if name == 'CompactForestClassifier':
+        # Already flattened by compaction.py
+        return estimator.ensemble
+
+    raise UnsupportedModel(f"estimator {name}")
+
+
+# ---------------------------------------------------------------------------
+# Compiled pipeline
+# ---------------------------------------------------------------------------
+
+class CompiledPipeline:
+    """Drop-in predict_proba replacement for a fitted sklearn pipeline"""
+
+    def __init__(self, feature_names, transforms, estimator):
+        self.feature_names = feature_names
+        self.transforms = transforms
+        self.estimator = estimator
+
+    def predict_proba(self, X):
+        if hasattr(X, 'to_numpy'):  # DataFrame
+            if self.feature_names is not None:
+                X = X[self.feature_names]
+            A = X.to_numpy(dtype=np.float64)
+        else:
+            A = np.asarray(X, dtype=np.float64)
+        for transform in self.transforms:
+            A = transform(A)
+        proba = self.estimator.positive_proba(A)
+        return np.column_stack([1.0 - proba, proba])
+
+
+def compile_pipeline(model):
+    """Compile a fitted Pipeline (or bare estimator); raises UnsupportedModel"""
+    steps = [step for _, step in model.steps] if hasattr(model, 'steps') else [model]
+    steps = [step for step in steps if step is not None and step != 'passthrough']
+    transforms = [compile_transform(step) for step in steps[:-1]]
+    feature_names = getattr(model, 'feature_names_in_', None)
+    return CompiledPipeline(
+        list(feature_names) if feature_names is not None else None,
+        [transform for transform in transforms if transform is not None],
+        compile_estimator(steps[-1])
+    )
+
+
+# ---------------------------------------------------------------------------
+# Parity verification
+# ---------------------------------------------------------------------------
+
+def load_reference_data(path=PARITY_DATASET, n_rows=PARITY_ROWS):
+    """Reference rows for parity checks: a CSV export if given, else synthetic"""
+    if not path:
+        return make_feature_frame(n_rows, seed=7)
+    import pandas as pd
+    frame = pd.read_csv(path).rename(columns={'ACTIVE': 'active'})
+    return frame[FEATURE_COLUMNS].head(n_rows)
+
+
+def parity_error(model, compiled, X_ref):
+    """Max |class-1 probability difference| between original and compiled model"""
+    expected = np.asarray(model.predict_proba(X_ref)[:, 1], dtype=np.float64)
+    actual = compiled.predict_proba(X_ref)[:, 1]
+    return float(np.max(np.abs(expected - actual)))
+
+
+def compile_verified(model, X_ref, display_name, tolerance=PARITY_TOLERANCE):
+    """Compiled model if it matches the original within tolerance, else None"""
+    try:
+        compiled = compile_pipeline(model)
+        error = parity_error(model, compiled, X_ref)
+    except UnsupportedModel as e:
+        log.info("%s: not compiled (%s)", display_name, e)
+        return None
+    except Exception as e:
+        log.warning("%s: compilation failed: %s", display_name, e)
+        return None
+
+    if not error <= tolerance:
+        log.warning("%s: compiled model rejected, max error %.2e > %.0e", display_name, error, tolerance)
+        return None
+    log.info("%s: compiled (max error %.2e)", display_name, error)
+    return compiled
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+    import time
+    from model_loader import model_manager
+
+    parser = argparse.ArgumentParser(description="Check compiled models against the original pipelines")
+    parser.add_argument('--data', default=PARITY_DATASET, help="reference CSV (default: synthetic rows)")
+    parser.add_argument('--rows', type=int, default=PARITY_ROWS)
+    parser.add_argument('--tolerance', type=float, default=PARITY_TOLERANCE)
+    args = parser.parse_args()
+
+    model_manager.load_all_models()
+    X_ref = load_reference_data(args.data, args.rows)
+    single = X_ref.head(1)
+    failed = False
+
+    print(f"\n{'Model':<22}{'max error':>12}{'pipeline ms':>14}{'compiled ms':>14}")
+    for name, model in model_manager.models.items():
+        if model is None:
+            continue
+        display_name = model_manager.display_names[name]
+        try:
+            compiled = compile_pipeline(model)
+        except UnsupportedModel as e:
+            print(f"{display_name:<22}{'unsupported':>12}  ({e})")
+            continue
+        error = parity_error(model, compiled, X_ref)
+        timings = []
+        for scorer in (model, compiled):
+            start = time.perf_counter()
+            for _ in range(20):
+                scorer.predict_proba(single)
+            timings.append((time.perf_counter() - start) / 20 * 1000)
+        status = '' if error <= args.tolerance else '  FAIL'
+        failed = failed or bool(status)
+        print(f"{display_name:<22}{error:>12.2e}{timings[0]:>14.2f}{timings[1]:>14.2f}{status}")
+
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,72 @@
+"""
+Vectorized feature engineering: the six derived model features computed
+from the 11 raw HealthFeatures fields, for one row or a whole batch.
+Same formulas as computeEngineeredFeatures in backend/validators.js.
+"""
+
+from __future__ import annotations
+from typing import TYPE_CHECKING
+import numpy as np
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# DataFrame columns in model training order
+FEATURE_COLUMNS = [
+    'age_years', 'gender', 'height', 'weight', 'ap_hi', 'ap_lo',
+    'cholesterol', 'gluc', 'smoke', 'alco', 'active',
+    'bmi', 'pulse_pressure', 'age_group', 'bmi_group', 'smoke_age', 'chol_bmi'
+]
+RAW_FEATURE_COLUMNS = FEATURE_COLUMNS[:11]
+ENGINEERED_COLUMNS = FEATURE_COLUMNS[11:]
+
+
+def _two_product(a, b):
+    """p, e with p + e == a * b exactly (Dekker's product)"""
+    p = a * b
+    split = 134217729.0  # 2**27 + 1
+    a_big = split * a
+    a_hi = a_big - (a_big - a)
+    a_lo = a - a_hi
+    b_big = split * b
+    b_hi = b_big - (b_big - b)
+    b_lo = b - b_hi
+    e = ((a_hi * b_hi - p) + a_hi * b_lo + a_lo * b_hi) + a_lo * b_lo
+    return p, e
+
+
+def round_half_up(values, decimals=2):
+    """
+    Round like JavaScript's toFixed() for non-negative values: on the exact
+    binary value, ties away from zero. values * 10**decimals is evaluated
+    exactly so results near a tie (e.g. 24.825) match the backend.
+    """
+    values = np.asarray(values, dtype=float)
+    p, e = _two_product(values, float(10 ** decimals))
+    whole = np.floor(p)
+    up = ((p - whole) - 0.5) + e >= 0
+    return (whole + up) / 10 ** decimals
+
+
+def engineer_features(raw: pd.DataFrame) -> pd.DataFrame:
+    """17-column model input (training column order) from the 11 raw columns"""
+    age_years = raw['age_years'].to_numpy(dtype=float)
+    height = raw['height'].to_numpy(dtype=float)
+    weight = raw['weight'].to_numpy(dtype=float)
+    ap_hi = raw['ap_hi'].to_numpy()
+    ap_lo = raw['ap_lo'].to_numpy()
+    cholesterol = raw['cholesterol'].to_numpy()
+    smoke = raw['smoke'].to_numpy()
+
+    bmi = weight / (height / 100) ** 2
+    X = raw[RAW_FEATURE_COLUMNS].copy()
+    X['bmi'] = round_half_up(bmi)
+    X['pulse_pressure'] = ap_hi - ap_lo
+    # <30: 0, <40: 1, <50: 2, <60: 3, <70: 4, else 5
+    X['age_group'] = np.digitize(age_years, [30, 40, 50, 60, 70])
+    # underweight: 1, normal: 0, overweight: 2, obese: 3
+    X['bmi_group'] = np.select([bmi < 18.5, bmi < 25, bmi < 30], [1, 0, 2], 3)
+    X['smoke_age'] = smoke * age_years
+    # Uses the unrounded BMI, as the backend does
+    X['chol_bmi'] = round_half_up(cholesterol * bmi)
+    return X[FEATURE_COLUMNS]
@@ -0,0 +1,132 @@
+"""
+Queue-backed structured logging for the ML service.
+Callers only put a LogRecord on a queue; a background listener thread
+formats it and writes it to stdout, so request handlers never block on
+string formatting or terminal I/O.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import time
+
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+# text: "[INFO] message key=value", json: one JSON object per line
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text').lower()
+# Fraction of per-request INFO logs emitted (warnings and errors are never sampled)
+LOG_SAMPLE_RATE = float(os.getenv('LOG_SAMPLE_RATE', 1.0))
+# Records waiting for the writer thread; further records are dropped and counted
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', 10000))
+
+ROOT_LOGGER = 'ml_service'
+
+
+class TextFormatter(logging.Formatter):
+    """Same "[LEVEL] message" lines as before, with structured fields appended"""
+
+    def format(self, record):
+        line = f"[{record.levelname}] {record.getMessage()}"
+        fields = getattr(record, 'fields', None)
+        if fields:
+            line += ' ' + ' '.join(f'{key}={value}' for key, value in fields.items())
+        if record.exc_info:
+            line += '\n' + self.formatException(record.exc_info)
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: time, level, logger, message and fields"""
+
+    def format(self, record):
+        entry = {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created))
+                    + f'.{int(record.msecs):03d}Z',
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        entry.update(getattr(record, 'fields', None) or {})
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that never blocks or formats in the calling thread"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # The listener runs in this process, so the record does not need to be
+        # made picklable: message formatting is left to the writer thread
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_handler = None
+_listener = None
+
+
+def _start_listener():
+    global _listener
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(JsonFormatter() if LOG_FORMAT == 'json' else TextFormatter())
+    _handler.queue = queue.Queue(maxsize=max(1, LOG_QUEUE_SIZE))
+    _listener = logging.handlers.QueueListener(_handler.queue, stream)
+    _listener.start()
+
+
+def shutdown_logging():
+    """Write out queued records and stop the writer thread"""
+    if _listener is not None and _listener._thread is not None:
+        _listener.stop()
+
+
+def setup_logging():
+    """Attach the queue handler to the service logger and start the writer thread"""
+    global _handler
+    if _handler is not None:
+        return
+    _handler = NonBlockingQueueHandler(queue.Queue())
+    _start_listener()
+
+    logger = logging.getLogger(ROOT_LOGGER)
+    logger.setLevel(LOG_LEVEL)
+    logger.addHandler(_handler)
+    logger.propagate = False
+
+    atexit.register(shutdown_logging)
+    # Threads do not survive fork(): serve.py workers and process-pool
+    # workers start their own writer thread on a fresh queue
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=_start_listener)
+
+
+def get_logger(name):
+    """Logger under the service root, e.g. get_logger('app') -> 'ml_service.app'"""
+    setup_logging()
+    return logging.getLogger(f'{ROOT_LOGGER}.{name}')
+
+
+def sampled(logger, level=logging.INFO):
+    """Whether a per-request log at `level` should be built and emitted"""
+    if not logger.isEnabledFor(level):
+        return False
+    return LOG_SAMPLE_RATE >= 1.0 or random.random() < LOG_SAMPLE_RATE
+
+
+def dropped_count():
+    """Records dropped because the log queue was full"""
+    return _handler.dropped if _handler is not None else 0
@@ -0,0 +1,272 @@
+"""
+Minimal Prometheus metrics (text exposition format 0.0.4) for the ML service.
+Counters and histograms are updated on the hot path with one lock per
+labelled series; gauges backed by callbacks are only evaluated on scrape.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from starlette.responses import JSONResponse
+from logs import get_logger
+
+# Seconds; covers sub-millisecond compiled models up to slow batch requests
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# perf_counter() value when the current HTTP request arrived (set by MetricsMiddleware)
+request_start = ContextVar('request_start', default=None)
+
+log = get_logger('metrics')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+class _Metric:
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        """Series for the given label values (created on first use)"""
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def header(self):
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+
+
+class _CounterChild:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1.0):
+        with self._lock:
+            self.value += amount
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1.0):
+        self.labels().inc(amount)
+
+    def render(self):
+        lines = self.header()
+        for values, child in list(self._children.items()):
+            lines.append(f'{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}')
+        return lines
+
+
+class _HistogramChild:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def render(self):
+        lines = self.header()
+        for values, child in list(self._children.items()):
+            with child._lock:
+                counts, total = list(child.counts), child.sum
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, values, ('le', _format_value(bound)))
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.labelnames, values)
+            lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class CallbackMetric(_Metric):
+    """Gauge (or counter) whose samples come from callback() -> [(label_values, value), ...] at scrape time"""
+
+    def __init__(self, name, documentation, labelnames, callback, kind='gauge'):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+        self.kind = kind
+
+    def render(self):
+        lines = self.header()
+        try:
+            samples = self.callback()
+        except Exception as e:
+            log.error("Metric %s callback failed: %s", self.name, e)
+            samples = []
+        for values, value in samples:
+            if value is not None:
+                lines.append(f'{self.name}{_format_labels(self.labelnames, values)} {_format_value(value)}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+REQUEST_LATENCY = registry.register(Histogram(
+    'ml_request_duration_seconds', 'HTTP request latency', ('endpoint', 'status')))
+STAGE_LATENCY = registry.register(Histogram(
+    'ml_stage_duration_seconds',
+    'Latency of each prediction stage (parse, prepare_features, stacking, serialize)', ('stage',)))
+MODEL_LATENCY = registry.register(Histogram(
+    'ml_model_inference_seconds', 'Inference latency per base model', ('model',)))
+MODEL_CACHE_HITS = registry.register(Counter(
+    'ml_model_cache_hits_total', 'Rows answered from the prediction cache, per model behind the cached result',
+    ('model',)))
+MODEL_FAILURES = registry.register(Counter(
+    'ml_model_failures_total', 'Rows a model failed to score', ('model',)))
+FALLBACK_PREDICTIONS = registry.register(Counter(
+    'ml_fallback_predictions_total', 'Rows scored by calculate_fallback_risk', ('reason',)))
+MODEL_RELOADS = registry.register(Counter(
+    'ml_model_reloads_total', 'Hot model reloads by outcome', ('result',)))
+PREDICTION_TIERS = registry.register(Counter(
+    'ml_predictions_by_tier_total', 'Rows scored by each tier (full, cascade, subset, fallback)', ('tier',)))
+CASCADE_ROWS = registry.register(Counter(
+    'ml_cascade_rows_total', 'Rows scored in cascade mode by the stage that answered them', ('stage',)))
+SHADOW_PREDICTIONS = registry.register(Counter(
+    'ml_shadow_predictions_total', 'Sampled rows scored by each shadow candidate, by agreement with production',
+    ('candidate', 'outcome')))
+SHADOW_LATENCY = registry.register(Histogram(
+    'ml_shadow_inference_seconds', 'Single-request inference latency per shadow candidate', ('candidate',)))
+SHADOW_DIFFERENCE = registry.register(Histogram(
+    'ml_shadow_abs_difference', 'Absolute probability difference between a shadow candidate and production',
+    ('candidate',), buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)))
+
+
+def observe_stage(stage, seconds):
+    STAGE_LATENCY.labels(stage).observe(seconds)
+
+
+def observe_parse():
+    """Record time from request arrival to handler entry (body read + validation)"""
+    start = request_start.get()
+    if start is not None:
+        observe_stage('parse', time.perf_counter() - start)
+
+
+def observe_ensemble(output):
+    """Record per-model timings and failures carried by an EnsembleOutput"""
+    for name, seconds in output.timings.items():
+        if name == 'stacking':
+            observe_stage('stacking', seconds)
+        else:
+            MODEL_LATENCY.labels(name).observe(seconds)
+    for name, rows in output.failures.items():
+        MODEL_FAILURES.labels(name).inc(rows)
+    if output.exit_stage is not None:
+        rows = {}
+        for stage in output.exit_stage.tolist():
+            rows[stage] = rows.get(stage, 0) + 1
+        for stage, count in rows.items():
+            CASCADE_ROWS.labels('full' if stage < 0 else str(stage)).inc(count)
+
+
+def observe_cache_hits(results):
+    """Count results answered from the prediction cache by tier and by the models behind them"""
+    for result in results:
+        PREDICTION_TIERS.labels(result['tier']).inc()
+        for name in result['models_run']:
+            MODEL_CACHE_HITS.labels(name).inc()
+
+
+class TimedJSONResponse(JSONResponse):
+    """JSONResponse that records its rendering time as the 'serialize' stage"""
+
+    def render(self, content):
+        start = time.perf_counter()
+        body = super().render(content)
+        observe_stage('serialize', time.perf_counter() - start)
+        return body
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware timing every HTTP request"""
+
+    def __init__(self, app, endpoints=()):
+        self.app = app
+        # Paths reported by name; anything else is grouped as "other"
+        self.endpoints = set(endpoints)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        token = request_start.set(start)
+        status = [500]
+
+        async def send_with_status(message):
+            if message['type'] == 'http.response.start':
+                status[0] = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            request_start.reset(token)
+            path = scope.get('path', '')
+            endpoint = path if path in self.endpoints else 'other'
+            REQUEST_LATENCY.labels(endpoint, str(status[0])).observe(time.perf_counter() - start)
@@ -1,11 +1,100 @@
+import gc
 import os
+import threading
+import time
 import joblib
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from dotenv import load_dotenv
+from logs import get_logger
 
-# Load environment variables from .env file
+# Load environment variables from .env file (before modules that read settings)
 load_dotenv()
 
+from ensemble import BASE_MODELS, run_ensemble
+from synthetic import make_feature_frame
+from stacking import build_stacking_plan
+from fastpath import COMPILE_MODELS, compile_verified, load_reference_data
+from cascade import CASCADE_ENABLED, load_cascade_plan
+from artifacts import (ARTIFACT_SOURCE, ARTIFACT_VERIFY, ArtifactError, load_artifact, read_manifest,
+                       sync_artifacts, verify_model)
+from thread_budget import apply_thread_budget, limit_native_threads, limit_threads, model_threads
+from shadow import SHADOW_MODEL_DIR, SHADOW_MODELS
+
+log = get_logger('model_loader')
+
+# eager: load every model at startup; lazy: load each model on first use
+MODEL_LOAD_MODE = os.getenv('MODEL_LOAD_MODE', 'eager').lower()
+# Number of model files loaded in parallel
+MODEL_LOAD_WORKERS = int(os.getenv('MODEL_LOAD_WORKERS', 6))
+# Models loaded with joblib mmap_mode='r' (arrays stay in the page cache and
+# are shared between processes). Only works for uncompressed joblib files.
+MODEL_MMAP = [name.strip() for name in os.getenv('MODEL_MMAP', 'model4,stacking').split(',') if name.strip()]
+# Synthetic rows scored by a freshly loaded model set before it is swapped in
+RELOAD_SMOKE_ROWS = int(os.getenv('RELOAD_SMOKE_ROWS', 16))
+
+# Libraries the pickled pipelines need. They are imported once before the
+# parallel load: concurrent first imports of sklearn from several unpickling
+# threads can fail with "partially initialized module" errors.
+ESTIMATOR_MODULES = ['sklearn.pipeline', 'sklearn.ensemble', 'sklearn.linear_model',
+                     'sklearn.preprocessing', 'xgboost', 'lightgbm', 'catboost']
+
+
+_import_lock = threading.Lock()
+
+
+def import_estimator_modules():
+    """Import the estimator libraries that are installed, ignoring missing ones"""
+    import importlib
+    with _import_lock:
+        for module in ESTIMATOR_MODULES:
+            try:
+                importlib.import_module(module)
+            except ImportError:
+                pass
+
+
+def current_rss_mb():
+    """Resident set size of this process in MB"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError):
+        # Not Linux - fall back to peak RSS (KB on Linux, bytes on macOS)
+        import resource
+        import sys
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def release_memory():
+    """Collect garbage and hand freed heap pages back to the OS (glibc only)"""
+    gc.collect()
+    try:
+        import ctypes
+        ctypes.CDLL('libc.so.6').malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+class ReloadInProgress(Exception):
+    """Raised when a model reload is requested while another one is running"""
+
+
+class LazyModel:
+    """Placeholder that loads the real model the first time it is used"""
+    
+    def __init__(self, manager, model_name):
+        self.manager = manager
+        self.model_name = model_name
+    
+    def predict_proba(self, X):
+        model = self.manager.resolve(self.model_name)
+        if model is None:
+            raise RuntimeError(f"{self.manager.display_names[self.model_name]} failed to load")
+        return model.predict_proba(X)
+
 class ModelManager:
     def __init__(self):
         # Use local models directory only
@@ -53,6 +142,38 @@ class ModelManager:
         
         # Track which models loaded successfully
         self.loaded_models = set()
+        
+        # Artifact manifest of models_dir (see artifacts.py); None loads the joblib files unchecked
+        self.manifest = None
+        
+        # Set when the stacker can reuse the loaded base models' outputs
+        self.stacking_plan = None
+        
+        # NumPy fast-path versions of the loaded models (see fastpath.py)
+        self.compiled = {}
+        
+        # Early-exit stages when CASCADE_ENABLED is set (see cascade.py)
+        self.cascade_plan = None
+        
+        # SHADOW_MODELS candidates: name -> {'target', 'model', 'path'} (see shadow.py)
+        self.candidates = {}
+        
+        # Set by load_all_models; lets forked workers skip reloading
+        self.load_attempted = False
+        
+        # Seconds spent loading each model, and process RSS once loading finished
+        self.load_times = {}
+        self.rss_after_load_mb = None
+        self._load_locks = {name: threading.Lock() for name in self.models}
+        self._finish_lock = threading.Lock()
+        
+        # Guards the model set swapped in by reload(); scoring reads take it
+        # briefly so they never mix models from the old and new sets
+        self._swap_lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        
+        # Called with no arguments whenever the loaded model set changes
+        self._reload_listeners = []
     
     def download_from_gdrive(self, model_name):
         """Download model from Google Drive if file ID is provided"""
@@ -60,22 +181,22 @@ class ModelManager:
         display_name = self.display_names[model_name]
         
         if not gdrive_id:
-            print(f"[DEBUG] No Google Drive ID for {display_name}")
+            log.debug("No Google Drive ID for %s", display_name)
             return False
         
         filename = self.filenames[model_name]
         output_path = os.path.join(self.models_dir, filename)
         
-        print(f"[DEBUG] Checking {display_name}: file={filename}, exists={os.path.exists(output_path)}")
+        log.debug("Checking %s: file=%s, exists=%s", display_name, filename, os.path.exists(output_path))
         
         # Skip if file already exists
         if os.path.exists(output_path):
-            print(f"[INFO] ✓ {display_name} already exists locally")
+            log.info("✓ %s already exists locally", display_name)
             return True
         
         try:
-            print(f"[INFO] ⬇ Downloading {display_name} from Google Drive...")
-            print(f"[DEBUG] File ID: {gdrive_id}")
+            log.info("⬇ Downloading %s from Google Drive...", display_name)
+            log.debug("File ID: %s", gdrive_id)
             import gdown
             url = f'https://drive.google.com/uc?id={gdrive_id}'
             gdown.download(url, output_path, quiet=False)
@@ -83,114 +204,357 @@ class ModelManager:
             # Verify download
             if os.path.exists(output_path):
                 size_mb = os.path.getsize(output_path) / (1024 * 1024)
-                print(f"[INFO] ✓ Successfully downloaded {display_name} ({size_mb:.2f} MB)")
+                log.info("✓ Successfully downloaded %s (%.2f MB)", display_name, size_mb)
                 return True
             else:
-                print(f"[ERROR] Download completed but file not found: {output_path}")
+                log.error("Download completed but file not found: %s", output_path)
                 return False
                 
         except Exception as e:
-            print(f"[ERROR] Failed to download {display_name}: {e}")
-            import traceback
-            traceback.print_exc()
+            log.exception("Failed to download %s: %s", display_name, e)
             return False
     
+    def fetch_artifacts(self):
+        """Fetch missing or changed artifacts listed in the manifest at ARTIFACT_SOURCE"""
+        try:
+            start = time.perf_counter()
+            summary = sync_artifacts(ARTIFACT_SOURCE, self.models_dir)
+            log.info("Artifacts synced from %s in %.2fs: %s fetched (%.2f MB), %s unchanged",
+                     ARTIFACT_SOURCE, time.perf_counter() - start, summary['fetched'],
+                     summary['bytes'] / (1024 * 1024), summary['unchanged'])
+        except (ArtifactError, OSError, ValueError) as e:
+            log.error("Artifact sync from %s failed: %s - using local files", ARTIFACT_SOURCE, e)
+    
+    def artifact_entry(self, model_name):
+        """Manifest entry of a model, or None when it loads from its joblib file"""
+        if self.manifest is None:
+            return None
+        return self.manifest['models'].get(model_name)
+    
+    def model_path(self, model_name):
+        entry = self.artifact_entry(model_name)
+        return os.path.join(self.models_dir, entry['entry'] if entry else self.filenames[model_name])
+    
     def load_local_model(self, model_name):
         """Load model from local directory"""
-        filename = self.filenames[model_name]
         display_name = self.display_names[model_name]
-        output_path = os.path.join(self.models_dir, filename)
+        entry = self.artifact_entry(model_name)
+        output_path = self.model_path(model_name)
         
         if not os.path.exists(output_path):
-            print(f"[WARNING] Model file not found: {output_path}")
+            log.warning("Model file not found: %s", output_path)
             return None
         
         try:
             # Load the model
-            model = joblib.load(output_path)
+            start = time.perf_counter()
+            mmap_mode = 'r' if model_name in MODEL_MMAP else None
+            if entry is not None:
+                # Refuse files whose size or sha256 differ from the manifest
+                verify_model(self.models_dir, self.manifest, model_name)
+                model = load_artifact(self.models_dir, entry, mmap_mode=mmap_mode)
+            else:
+                model = joblib.load(output_path, mmap_mode=mmap_mode)
+            self.load_times[model_name] = time.perf_counter() - start
             
             # Verify the model is fitted (has required attributes)
             if hasattr(model, 'predict_proba'):
-                file_size = os.path.getsize(output_path) / (1024 * 1024)
-                print(f"[INFO] Loaded {display_name} from {output_path} ({file_size:.2f} MB)")
+                # Limit the model's prediction thread pools to its share of the CPU
+                model = apply_thread_budget(model, model_name)
+                files = entry['files'] if entry else [os.path.basename(output_path)]
+                file_size = sum(os.path.getsize(os.path.join(self.models_dir, name)) for name in files) / (1024 * 1024)
+                mmap_note = ", mmap" if mmap_mode else ""
+                if entry is not None and entry['format'] == 'compact':
+                    leaf_values = entry.get('compaction', {}).get('leaf_values')
+                    mmap_note += f", compact {leaf_values}" if leaf_values else ", compact"
+                log.info("Loaded %s from %s (%.2f MB%s) in %.2fs, threads: %s", display_name, output_path,
+                         file_size, mmap_note, self.load_times[model_name], model_threads(model_name) or 'default')
                 self.loaded_models.add(model_name)
                 return model
             else:
-                print(f"[WARNING] {display_name} does not have predict_proba method")
+                log.warning("%s does not have predict_proba method", display_name)
                 return None
                 
         except Exception as e:
-            print(f"[ERROR] Failed to load {display_name}: {str(e)}")
+            log.error("Failed to load %s: %s", display_name, e)
             return None
     
-    def load_all_models(self):
-        """Load all models from local directory or download from Google Drive"""
-        print("=" * 60)
-        print("[MIGRATION] Starting model loading process...")
-        print(f"[MIGRATION] Model directory: {self.models_dir}")
-        print("=" * 60)
+    def load_all_models(self, finish=True, lazy=None):
+        """
+        Load all models from local directory or download from Google Drive
+        finish=False skips the steps that run predictions (stacking check,
+        compilation) so a pre-fork master never starts estimator thread pools
+        lazy overrides MODEL_LOAD_MODE (reload() always loads eagerly)
+        """
+        if lazy is None:
+            lazy = MODEL_LOAD_MODE == 'lazy'
+        self.load_attempted = True
+        log.info("Starting model loading process...")
+        log.info("Model directory: %s", self.models_dir)
+        
+        if ARTIFACT_SOURCE:
+            self.fetch_artifacts()
+        try:
+            self.manifest = read_manifest(self.models_dir)
+        except (ArtifactError, OSError, ValueError) as e:
+            log.error("Ignoring unreadable artifact manifest: %s", e)
+            self.manifest = None
+        if self.manifest is not None:
+            log.info("Artifact manifest lists %s model(s), verify: %s", len(self.manifest['models']), ARTIFACT_VERIFY)
         
         # Try to download models from Google Drive if IDs are provided
-        print("[MIGRATION] Checking for Google Drive downloads...")
+        log.info("Checking for Google Drive downloads...")
         for model_name in ['model1', 'model2', 'model3', 'model4', 'model5', 'stacking']:
             gdrive_id = self.gdrive_ids.get(model_name)
-            if gdrive_id:
+            if gdrive_id and self.artifact_entry(model_name) is None:
                 display_name = self.display_names[model_name]
-                print(f"[INFO] Google Drive ID found for {display_name}")
+                log.info("Google Drive ID found for %s", display_name)
                 self.download_from_gdrive(model_name)
             else:
                 display_name = self.display_names[model_name]
-                print(f"[INFO] No Google Drive ID for {display_name} - will use local file")
+                log.info("No Google Drive ID for %s - will use local file", display_name)
         
         # Check what's in the directory
         if os.path.exists(self.models_dir):
             existing_files = os.listdir(self.models_dir)
             joblib_files = [f for f in existing_files if f.endswith('.joblib')]
             if joblib_files:
-                print(f"[MIGRATION] Found {len(joblib_files)} model file(s):")
-                for f in joblib_files:
-                    file_path = os.path.join(self.models_dir, f)
-                    size_mb = os.path.getsize(file_path) / (1024 * 1024)
-                    print(f"   - {f} ({size_mb:.2f} MB)")
+                log.info("Found %s model file(s): %s", len(joblib_files), ', '.join(
+                    f"{f} ({os.path.getsize(os.path.join(self.models_dir, f)) / (1024 * 1024):.2f} MB)"
+                    for f in joblib_files
+                ))
             else:
-                print("[MIGRATION] No model files found in directory")
+                log.info("No model files found in directory")
         else:
-            print(f"[ERROR] Model directory does not exist: {self.models_dir}")
-        
-        print("=" * 60)
+            log.error("Model directory does not exist: %s", self.models_dir)
         
         try:
-            # Load all 5 base models + 1 stacking model
-            for model_name in ['model1', 'model2', 'model3', 'model4', 'model5', 'stacking']:
-                display_name = self.display_names[model_name]
-                print(f"\n[MIGRATION] Loading {display_name}...")
-                self.models[model_name] = self.load_local_model(model_name)
+            if lazy:
+                # Register placeholders; each model loads on first use
+                for model_name in self.models:
+                    path = self.model_path(model_name)
+                    if os.path.exists(path):
+                        self.models[model_name] = LazyModel(self, model_name)
+                    else:
+                        log.warning("Model file not found: %s", path)
+                available = self.get_loaded_count()
+                log.info("Lazy mode: %s/%s model(s) will load on first use", available, len(self.models))
+                return available > 0
+            
+            # Load all 5 base models + 1 stacking model in parallel
+            start = time.perf_counter()
+            import_estimator_modules()
+            model_names = list(self.models)
+            for model_name in model_names:
+                log.info("Loading %s...", self.display_names[model_name])
+            with ThreadPoolExecutor(max_workers=max(1, MODEL_LOAD_WORKERS)) as pool:
+                loaded = list(pool.map(self.load_local_model, model_names))
+            for model_name, model in zip(model_names, loaded):
+                self.models[model_name] = model
+            
+            self.rss_after_load_mb = current_rss_mb()
+            log.info("Loading took %.2fs, RSS after loading: %.1f MB",
+                     time.perf_counter() - start, self.rss_after_load_mb)
+            
+            if finish:
+                self.finish_loading()
+            else:
+                self.notify_reload()
             
-            print("=" * 60)
             loaded_count = len(self.loaded_models)
             total_count = len(self.models)
             
             if loaded_count == total_count:
-                print(f"[MIGRATION] All {total_count} models loaded successfully!")
-                print("   • 5 Base Models: CatBoost, LightGBM, LogReg, RF, XGBoost")
-                print("   • 1 Stacking Ensemble Model")
+                log.info("All %s models loaded successfully! (5 base models + stacking ensemble)", total_count)
             elif loaded_count > 0:
-                print(f"[WARNING] Partially loaded: {loaded_count}/{total_count} models")
-                print(f"[WARNING] Loaded models: {', '.join(sorted(self.loaded_models))}")
-                print(f"[WARNING] Service will continue with available models")
+                log.warning("Partially loaded: %s/%s models", loaded_count, total_count)
+                log.warning("Loaded models: %s", ', '.join(sorted(self.loaded_models)))
+                log.warning("Service will continue with available models")
             else:
-                print("[ERROR] No models loaded successfully")
-                print("[WARNING] Service will run in fallback mode")
-            print("=" * 60)
+                log.error("No models loaded successfully")
+                log.warning("Service will run in fallback mode")
             return loaded_count > 0
             
         except Exception as e:
-            print("=" * 60)
-            print(f"[ERROR] Error loading models: {str(e)}")
-            print("[WARNING] Service will run in fallback mode")
-            print("=" * 60)
+            log.exception("Error loading models: %s", e)
+            log.warning("Service will run in fallback mode")
             return False
     
+    def resolve(self, model_name):
+        """Load a lazily registered model (once) and return it"""
+        with self._load_locks[model_name]:
+            model = self.models[model_name]
+            if isinstance(model, LazyModel):
+                log.info("Lazy-loading %s...", self.display_names[model_name])
+                import_estimator_modules()
+                model = self.load_local_model(model_name)
+                self.models[model_name] = model
+                self.rss_after_load_mb = current_rss_mb()
+                log.info("RSS after loading: %.1f MB", self.rss_after_load_mb)
+                if not any(isinstance(m, LazyModel) for m in self.models.values()):
+                    self.finish_loading()
+        return model
+    
+    def finish_loading(self):
+        """Build the stacking plan and compiled models once the real models are in place"""
+        if any(isinstance(model, LazyModel) for model in self.models.values()):
+            return
+        with self._finish_lock:
+            limit_native_threads()
+            self.stacking_plan = build_stacking_plan(
+                self.models['stacking'],
+                {col: self.models[name] for col, name in enumerate(BASE_MODELS)}
+            )
+            
+            if COMPILE_MODELS:
+                self.compile_models()
+            
+            if CASCADE_ENABLED:
+                self.cascade_plan = load_cascade_plan(self.models_dir, self.filenames, self.models)
+            
+            if SHADOW_MODELS:
+                self.load_candidates()
+        self.notify_reload()
+    
+    def load_candidates(self):
+        """Load the SHADOW_MODELS candidates; one that fails to load is left out"""
+        candidates = {}
+        for target, filename in SHADOW_MODELS:
+            if target not in self.models:
+                log.error("Shadow candidate %s targets unknown model %s", filename, target)
+                continue
+            path = os.path.join(SHADOW_MODEL_DIR or self.models_dir, filename)
+            name = Path(filename).stem
+            try:
+                start = time.perf_counter()
+                # One thread: candidates must not compete with production for cores
+                model = limit_threads(joblib.load(path), 1)
+                candidates[name] = {'target': target, 'model': model, 'path': path}
+                log.info("Loaded shadow candidate %s for %s in %.2fs",
+                         name, self.display_names[target], time.perf_counter() - start)
+            except Exception as e:
+                log.error("Failed to load shadow candidate %s: %s", path, e)
+        self.candidates = candidates
+    
+    def add_reload_listener(self, callback):
+        """Register callback() to run whenever the loaded model set changes"""
+        self._reload_listeners.append(callback)
+    
+    def notify_reload(self):
+        for callback in self._reload_listeners:
+            try:
+                callback()
+            except Exception as e:
+                log.error("Reload listener failed: %s", e)
+    
+    def compile_models(self):
+        """Compile loaded models into the NumPy fast path, keeping only those that pass parity"""
+        log.info("Compiling models into the NumPy fast path...")
+        X_ref = load_reference_data()
+        self.compiled = {}
+        
+        for model_name in BASE_MODELS:
+            model = self.models[model_name]
+            if model is not None:
+                compiled = compile_verified(model, X_ref, self.display_names[model_name])
+                if compiled is not None:
+                    self.compiled[model_name] = compiled
+        
+        # The stacking meta-model sees base-model probabilities, not raw features
+        if self.stacking_plan is not None:
+            base_ref = np.column_stack([
+                self.models[BASE_MODELS[col]].predict_proba(X_ref)[:, 1]
+                for col in self.stacking_plan.columns
+            ])
+            compiled = compile_verified(
+                self.stacking_plan.meta_model, base_ref, f"{self.display_names['stacking']} meta-model"
+            )
+            if compiled is not None:
+                self.stacking_plan.meta_model = compiled
+        
+        log.info("Compiled %s/%s base models", len(self.compiled), len(BASE_MODELS))
+    
+    def get_scoring_models(self):
+        """Models used for inference: compiled where available, else the loaded pipelines"""
+        return {name: self.compiled.get(name, model) for name, model in self.models.items()}
+    
+    def get_scoring_state(self):
+        """(scoring models, stacking plan) taken from one consistent model set"""
+        with self._swap_lock:
+            return self.get_scoring_models(), self.stacking_plan
+    
+    def get_cascade_state(self):
+        """get_scoring_state() plus the cascade plan of the same model set"""
+        with self._swap_lock:
+            return self.get_scoring_models(), self.stacking_plan, self.cascade_plan
+    
+    def get_candidates(self):
+        """Shadow candidates of the current model set"""
+        with self._swap_lock:
+            return self.candidates
+    
+    def smoke_test(self, min_models):
+        """Reason this model set is not fit to serve, or None if it is"""
+        loaded_count = len(self.loaded_models)
+        if loaded_count == 0 or loaded_count < min_models:
+            return f"only {loaded_count} model(s) loaded, {min_models} currently serving"
+        X = make_feature_frame(RELOAD_SMOKE_ROWS, seed=1)
+        output = run_ensemble(X, self.get_scoring_models(), self.display_names, self.stacking_plan)
+        if output.failures:
+            names = ', '.join(self.display_names[name] for name in output.failures)
+            return f"smoke prediction failed for {names}"
+        if not np.all((output.stacked >= 0) & (output.stacked <= 1)):
+            return "smoke prediction returned invalid probabilities"
+        return None
+    
+    def reload(self):
+        """
+        Load the model files again while the current set keeps serving, check
+        the new set with a smoke prediction and swap it in. Requests already
+        scoring finish on the old set, which is freed once they let go of it.
+        """
+        if not self._reload_lock.acquire(blocking=False):
+            raise ReloadInProgress()
+        try:
+            start = time.perf_counter()
+            rss_before = current_rss_mb()
+            log.info("Reloading models from %s...", self.models_dir)
+            
+            staged = ModelManager()
+            staged.load_all_models(lazy=False)
+            reason = staged.smoke_test(min_models=len(self.loaded_models))
+            if reason is not None:
+                log.error("Model reload rejected: %s", reason)
+                del staged
+                release_memory()
+                return {"status": "rejected", "reason": reason}
+            
+            with self._swap_lock:
+                self.models = staged.models
+                self.loaded_models = staged.loaded_models
+                self.manifest = staged.manifest
+                self.stacking_plan = staged.stacking_plan
+                self.compiled = staged.compiled
+                self.cascade_plan = staged.cascade_plan
+                self.candidates = staged.candidates
+                self.load_times = staged.load_times
+            del staged
+            self.notify_reload()
+            
+            release_memory()
+            self.rss_after_load_mb = current_rss_mb()
+            seconds = time.perf_counter() - start
+            log.info("Models reloaded in %.2fs, RSS %.1f MB -> %.1f MB",
+                     seconds, rss_before, self.rss_after_load_mb)
+            return {
+                "status": "reloaded",
+                "models_loaded": self.get_loaded_count(),
+                "seconds": round(seconds, 2),
+                "rss_mb": round(self.rss_after_load_mb, 1)
+            }
+        finally:
+            self._reload_lock.release()
+    
     def get_models(self):
         """Get all loaded models"""
         return (
@@ -0,0 +1,181 @@
+"""
+Pre-fork multi-worker server for the ML service.
+The master process imports the app and loads the models once, then forks
+ML_WORKERS uvicorn workers that share the loaded models copy-on-write
+instead of each worker loading its own copy.
+
+    ML_WORKERS=4 python serve.py
+
+Send SIGUSR1 to the master to log a per-process memory report, and SIGHUP
+to hot-reload the models in every worker.
+"""
+
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+
+ML_WORKERS = int(os.getenv('ML_WORKERS', os.getenv('WEB_CONCURRENCY', 2)))
+# Load models in the master before forking (disable to compare memory use)
+PRELOAD_MODELS = os.getenv('PRELOAD_MODELS', 'true').lower() in ('1', 'true', 'yes')
+# Seconds after startup before the first memory report is logged
+MEMORY_REPORT_DELAY = float(os.getenv('MEMORY_REPORT_DELAY', 10))
+
+
+def read_memory(pid):
+    """RSS / PSS / shared / private memory of a process in MB (Linux only)"""
+    fields = {}
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 3 and parts[2] == 'kB':
+                    fields[parts[0].rstrip(':')] = int(parts[1]) / 1024
+    except OSError:
+        return None
+    return {
+        'rss': fields.get('Rss', 0.0),
+        'pss': fields.get('Pss', 0.0),
+        'shared': fields.get('Shared_Clean', 0.0) + fields.get('Shared_Dirty', 0.0),
+        'private': fields.get('Private_Clean', 0.0) + fields.get('Private_Dirty', 0.0)
+    }
+
+
+def log_memory_report(master_pid, worker_pids):
+    """Print memory per process; total PSS is the real footprint of the group"""
+    print(f"[MEMORY] {'process':<16}{'RSS MB':>10}{'PSS MB':>10}{'shared MB':>12}{'private MB':>12}")
+    total_pss = 0.0
+    for label, pid in [('master', master_pid)] + [(f'worker {pid}', pid) for pid in worker_pids]:
+        memory = read_memory(pid)
+        if memory is None:
+            print(f"[MEMORY] {label:<16} unavailable")
+            continue
+        total_pss += memory['pss']
+        print(f"[MEMORY] {label:<16}{memory['rss']:>10.1f}{memory['pss']:>10.1f}"
+              f"{memory['shared']:>12.1f}{memory['private']:>12.1f}")
+    print(f"[MEMORY] total PSS for {len(worker_pids)} worker(s): {total_pss:.1f} MB")
+
+
+def bind_socket(host, port):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(app, sock, fresh_models=False):
+    """Child process: serve the already-imported app on the shared socket"""
+    import uvicorn
+
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGUSR1, signal.SIG_DFL)
+    # The app installs its own SIGHUP (reload) handler once it has started
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    if fresh_models:
+        # The models were reloaded since the master preloaded them: load the
+        # current files at startup instead of serving the inherited set
+        from model_loader import model_manager
+        model_manager.load_attempted = False
+    config = uvicorn.Config(app, log_level="info", access_log=True)
+    uvicorn.Server(config).run(sockets=[sock])
+    # os._exit() skips atexit handlers, so flush queued log records first
+    from logs import shutdown_logging
+    shutdown_logging()
+    os._exit(0)
+
+
+def spawn_worker(app, sock, fresh_models=False):
+    pid = os.fork()
+    if pid == 0:
+        try:
+            run_worker(app, sock, fresh_models)
+        finally:
+            os._exit(1)
+    return pid
+
+
+def main():
+    port = int(os.getenv("PORT", 8000))
+    # Model thread budgets split the CPU between this many processes
+    os.environ['ML_WORKERS'] = str(ML_WORKERS)
+    # Import the app (pandas, numpy, estimator libraries) once in the master
+    from app import app
+    from model_loader import model_manager
+
+    if PRELOAD_MODELS:
+        # Load only: no predictions in the master, since OpenMP and CatBoost
+        # thread pools started before fork() can deadlock in the workers
+        model_manager.load_all_models(finish=False)
+    # Move everything allocated so far out of the GC's reach so collections
+    # in the workers do not write to (and un-share) those pages
+    gc.collect()
+    gc.freeze()
+
+    sock = bind_socket("0.0.0.0", port)
+    print(f"✅ Starting {ML_WORKERS} ML Service worker(s) on 0.0.0.0:{port} "
+          f"(models {'preloaded' if PRELOAD_MODELS else 'loaded per worker'})")
+
+    workers = set(spawn_worker(app, sock) for _ in range(ML_WORKERS))
+    state = {'stopping': False, 'report': False, 'reload': False, 'reloaded': False}
+
+    def stop(signum, frame):
+        state['stopping'] = True
+
+    def request_report(signum, frame):
+        state['report'] = True
+
+    def request_reload(signum, frame):
+        state['reload'] = True
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGUSR1, request_report)
+    signal.signal(signal.SIGHUP, request_reload)
+
+    report_at = time.monotonic() + MEMORY_REPORT_DELAY
+    while not state['stopping']:
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            pid, status = 0, 0
+        if pid and pid in workers:
+            workers.discard(pid)
+            print(f"[WARNING] Worker {pid} exited with status {status}, restarting")
+            workers.add(spawn_worker(app, sock, fresh_models=state['reloaded']))
+        if state['report'] or (report_at and time.monotonic() >= report_at):
+            log_memory_report(os.getpid(), sorted(workers))
+            state['report'] = False
+            report_at = None
+        if state['reload']:
+            # Each worker loads and swaps in the new files itself; the master
+            # keeps its preloaded set, so workers restarted from now on load
+            # the current files instead of inheriting it
+            print(f"[INFO] Reloading models in {len(workers)} worker(s)")
+            for pid in workers:
+                os.kill(pid, signal.SIGHUP)
+            state['reload'] = False
+            state['reloaded'] = True
+        time.sleep(0.2)
+
+    print("[INFO] Shutting down workers...")
+    for pid in workers:
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+    for pid in workers:
+        try:
+            os.waitpid(pid, 0)
+        except ChildProcessError:
+            pass
+    sock.close()
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""
+Shadow scoring of candidate models on live traffic.
+Candidates listed in SHADOW_MODELS are loaded next to the production models
+(ModelManager.candidates) and scored on a sample of /predict requests by one
+background thread, after the response has been computed. The queue in front
+of it is bounded: when the candidates fall behind, new samples are dropped
+instead of slowing production down. Agreement with the production model each
+candidate would replace, and both latencies, are reported by /health and
+/metrics.
+"""
+
+import math
+import os
+import queue
+import random
+import threading
+import time
+from collections import deque
+import numpy as np
+from metrics import SHADOW_DIFFERENCE, SHADOW_LATENCY, SHADOW_PREDICTIONS
+from logs import get_logger
+
+# Candidates as target=file pairs, e.g. "model4=rf_pipeline_v2.joblib,stacking=stacking_v2.joblib";
+# target is the production model the candidate would replace
+SHADOW_MODELS = [
+    tuple(part.strip() for part in item.split('=', 1))
+    for item in os.getenv('SHADOW_MODELS', '').split(',') if '=' in item
+]
+# Directory of the candidate files (default: MODEL_DIR)
+SHADOW_MODEL_DIR = os.getenv('SHADOW_MODEL_DIR', '')
+# Fraction of /predict requests also scored by the candidates
+SHADOW_SAMPLE_RATE = float(os.getenv('SHADOW_SAMPLE_RATE', 0.1))
+# Sampled requests allowed to wait for the shadow worker; more are dropped
+SHADOW_QUEUE_SIZE = int(os.getenv('SHADOW_QUEUE_SIZE', 64))
+# Niceness of the shadow worker thread, so production threads get the CPU first (Linux)
+SHADOW_NICE = int(os.getenv('SHADOW_NICE', 10))
+# Recent latencies per candidate the percentiles are taken over
+SHADOW_WINDOW = int(os.getenv('SHADOW_WINDOW', 1000))
+
+log = get_logger('shadow')
+
+
+def percentiles_ms(samples):
+    if not samples:
+        return None
+    ms = np.asarray(samples) * 1000
+    return {"p50": round(float(np.percentile(ms, 50)), 3), "p95": round(float(np.percentile(ms, 95)), 3)}
+
+
+class CandidateStats:
+    """Agreement and latency of one candidate against its production model"""
+
+    def __init__(self, window=SHADOW_WINDOW):
+        self.scored = 0
+        self.failed = 0
+        self.agreed = 0
+        self.abs_difference_sum = 0.0
+        self.max_abs_difference = 0.0
+        self.latencies = deque(maxlen=window)
+        self.production_latencies = deque(maxlen=window)
+
+    def record(self, candidate, production, seconds, production_seconds):
+        difference = abs(candidate - production)
+        self.scored += 1
+        self.agreed += (candidate >= 0.5) == (production >= 0.5)
+        self.abs_difference_sum += difference
+        self.max_abs_difference = max(self.max_abs_difference, difference)
+        self.latencies.append(seconds)
+        if production_seconds is not None:
+            self.production_latencies.append(production_seconds)
+
+    def stats(self):
+        return {
+            "scored": self.scored,
+            "failed": self.failed,
+            "label_agreement": round(self.agreed / self.scored, 4) if self.scored else None,
+            "mean_abs_difference": round(self.abs_difference_sum / self.scored, 6) if self.scored else None,
+            "max_abs_difference": round(self.max_abs_difference, 6),
+            "latency_ms": percentiles_ms(list(self.latencies)),
+            "production_latency_ms": percentiles_ms(list(self.production_latencies))
+        }
+
+
+class ShadowScorer:
+    """Background worker scoring sampled requests with the manager's candidate models"""
+
+    def __init__(self, manager, sample_rate=SHADOW_SAMPLE_RATE, queue_size=SHADOW_QUEUE_SIZE):
+        self.manager = manager
+        self.sample_rate = sample_rate
+        self.queue_size = max(1, queue_size)
+        self.sampled = 0
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=self.queue_size)
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        """Start the worker thread (after any fork, like the inference pool)"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='shadow', daemon=True)
+            self._thread.start()
+            log.info("Shadow scoring %s candidate(s) on %.0f%% of /predict requests, queue %s",
+                     len(self.manager.candidates), self.sample_rate * 100, self.queue_size)
+
+    def stop(self):
+        """Stop the worker once it finishes its current row; queued samples are discarded"""
+        if self._thread is None:
+            return
+        # Never blocks: a submit racing this can refill the queue, so drain until the stop marker fits
+        while True:
+            try:
+                self._queue.get_nowait()
+                continue
+            except queue.Empty:
+                pass
+            try:
+                self._queue.put_nowait(None)
+                break
+            except queue.Full:
+                pass
+        self._thread = None
+
+    def submit(self, make_frame, result, production_models, timings=None):
+        """
+        Queue a scored request for the candidates. `make_frame()` returns its
+        feature frame and is only called by the worker, so micro-batched
+        requests never build one on the request path. `production_models` are
+        the models whose own output is in `result` (not failed, not averaged
+        in); candidates of any other target skip the request. `timings` are
+        the production per-model seconds when the row was scored on its own
+        (comparable latency). Never blocks; returns False when the request was
+        not sampled or dropped.
+        """
+        candidates = self.manager.candidates
+        if not any(candidate['target'] in production_models for candidate in candidates.values()):
+            return False
+        if random.random() >= self.sample_rate:
+            return False
+        self.sampled += 1
+        try:
+            self._queue.put_nowait((make_frame, result, production_models, timings))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def reset(self):
+        """Forget the statistics (the production or candidate models changed)"""
+        with self._lock:
+            self._stats = {}
+
+    def _run(self):
+        try:
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), SHADOW_NICE)
+        except (AttributeError, OSError):
+            pass
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            try:
+                self.score(*job)
+            except Exception as e:
+                log.error("Shadow scoring failed: %s", e)
+
+    def score(self, make_frame, result, production_models, timings):
+        """Score one request with every candidate and compare with production"""
+        X = make_frame()
+        for name, candidate in self.manager.get_candidates().items():
+            target = candidate['target']
+            if target not in production_models:
+                # Production skipped or failed this model for the row
+                continue
+            if target == 'stacking':
+                production = result['stacked']['probability']
+                production_seconds = sum(timings.values()) if timings else None
+            else:
+                production = result['base_predictions'][target]
+                production_seconds = timings.get(target) if timings else None
+
+            start = time.perf_counter()
+            try:
+                proba = float(candidate['model'].predict_proba(X)[0, 1])
+            except Exception as e:
+                log.warning("Shadow candidate %s failed: %s", name, e)
+                with self._lock:
+                    self._stats.setdefault(name, CandidateStats()).failed += 1
+                SHADOW_PREDICTIONS.labels(name, 'failed').inc()
+                continue
+            seconds = time.perf_counter() - start
+            if not math.isfinite(proba):
+                continue
+
+            with self._lock:
+                self._stats.setdefault(name, CandidateStats()).record(proba, production, seconds, production_seconds)
+            SHADOW_PREDICTIONS.labels(name, 'agree' if (proba >= 0.5) == (production >= 0.5) else 'disagree').inc()
+            SHADOW_LATENCY.labels(name).observe(seconds)
+            SHADOW_DIFFERENCE.labels(name).observe(abs(proba - production))
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def stats(self):
+        """Sampling counters and per-candidate comparison for /health"""
+        candidates = {}
+        with self._lock:
+            for name, candidate in self.manager.get_candidates().items():
+                stats = self._stats.get(name) or CandidateStats()
+                candidates[name] = {"target": candidate['target'], "file": candidate['path'], **stats.stats()}
+        return {
+            "enabled": True,
+            "sample_rate": self.sample_rate,
+            "queue_size": self.queue_size,
+            "pending": self.pending(),
+            "sampled": self.sampled,
+            "dropped": self.dropped,
+            "candidates": candidates
+        }
@@ -0,0 +1,107 @@
+"""
+Stacking execution plans.
+Lets the stacking meta-model consume the base-model probabilities already
+computed by the ensemble instead of running all five base models again.
+"""
+
+import os
+import numpy as np
+from synthetic import make_feature_frame
+from logs import get_logger
+
+# auto: reuse base outputs when the stacker's base models are verified
+#       to be the loaded ones, otherwise run the full stacker
+# full: always run the full stacker (previous behaviour)
+STACKING_MODE = os.getenv('STACKING_MODE', 'auto').lower()
+
+# Rows used to check that two models produce the same predictions
+PROBE_ROWS = 64
+PROBE_TOLERANCE = 1e-9
+
+log = get_logger('stacking')
+
+
+class StackingPlan:
+    """Feeds precomputed base-model probabilities straight to the meta-model"""
+
+    def __init__(self, meta_model, columns):
+        self.meta_model = meta_model
+        # Column of the ensemble base matrix for each stacker input, in order
+        self.columns = list(columns)
+
+    def predict_proba(self, base):
+        """Meta-model probabilities from an N x 5 base-probability matrix"""
+        return self.meta_model.predict_proba(base[:, self.columns])
+
+
+def unpack_stacker(stacking_model):
+    """
+    Return (base_estimators, meta_model) for a stacker whose meta-model input
+    is exactly the class-1 probability of each base estimator, else None
+    """
+    # sklearn StackingClassifier (possibly the only step of a Pipeline)
+    if hasattr(stacking_model, 'steps'):
+        if len(stacking_model.steps) != 1:
+            return None
+        stacking_model = stacking_model.steps[0][1]
+
+    if hasattr(stacking_model, 'estimators_') and hasattr(stacking_model, 'final_estimator_'):
+        if getattr(stacking_model, 'passthrough', False):
+            return None
+        if len(getattr(stacking_model, 'classes_', [])) != 2:
+            return None
+        if any(method != 'predict_proba' for method in stacking_model.stack_method_):
+            return None
+        return list(stacking_model.estimators_), stacking_model.final_estimator_
+
+    # Custom StackingModel class defined in app.py
+    if hasattr(stacking_model, 'base_models') and hasattr(stacking_model, 'meta_model'):
+        base_models = stacking_model.base_models
+        if isinstance(base_models, dict):
+            base_models = list(base_models.values())
+        if not isinstance(base_models, list) or stacking_model.meta_model is None:
+            return None
+        return base_models, stacking_model.meta_model
+
+    return None
+
+
+def build_stacking_plan(stacking_model, base_models):
+    """
+    Build a StackingPlan if every base estimator inside the stacker matches
+    one of the loaded base models on a probe dataset, else return None.
+    `base_models` maps ensemble column index -> loaded model (or None).
+    """
+    if STACKING_MODE == 'full' or stacking_model is None:
+        return None
+
+    unpacked = unpack_stacker(stacking_model)
+    if unpacked is None:
+        log.info("Stacking model layout not supported for base-output reuse")
+        return None
+    stacker_bases, meta_model = unpacked
+
+    probe = make_feature_frame(PROBE_ROWS, seed=42)
+    try:
+        loaded = {
+            col: model.predict_proba(probe)[:, 1]
+            for col, model in base_models.items() if model is not None
+        }
+        columns = []
+        for estimator in stacker_bases:
+            expected = estimator.predict_proba(probe)[:, 1]
+            match = next(
+                (col for col, proba in loaded.items()
+                 if col not in columns and np.allclose(proba, expected, rtol=0, atol=PROBE_TOLERANCE)),
+                None
+            )
+            if match is None:
+                log.warning("Stacking base models differ from loaded models - using full stacking path")
+                return None
+            columns.append(match)
+    except Exception as e:
+        log.warning("Could not verify stacking base models: %s", e)
+        return None
+
+    log.info("Stacking will reuse base model outputs (columns %s)", columns)
+    return StackingPlan(meta_model, columns)
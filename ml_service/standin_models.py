@@ -0,0 +1,88 @@
+"""
+Small stand-in versions of the six production pipelines, trained on
+synthetic rows, for benchmarks and local runs without the real joblib files.
+Same estimator types, file names and predict_proba interface; the scores
+mean nothing medically.
+
+    python standin_models.py ./standin_models
+    MODEL_DIR=./standin_models python app.py
+"""
+
+import argparse
+import os
+import joblib
+import numpy as np
+from synthetic import make_feature_frame
+
+DEFAULT_FILENAMES = {
+    'model1': 'cb_pipeline_tuned.joblib',
+    'model2': 'lgb_pipeline_tuned.joblib',
+    'model3': 'logreg_pipeline_tuned.joblib',
+    'model4': 'rf_pipeline_tuned.joblib',
+    'model5': 'xgb_pipeline_tuned.joblib',
+    'stacking': 'stacking_pipeline_tuned.joblib'
+}
+
+
+def make_labels(X, seed=0):
+    """Risk labels loosely following the usual cardio risk factors"""
+    rng = np.random.default_rng(seed)
+    logit = (0.05 * (X['age_years'] - 50) + 0.04 * (X['ap_hi'] - 128)
+             + 0.5 * (X['cholesterol'] - 2) + 0.05 * (X['bmi'] - 27) - 0.3 * X['active'])
+    return (rng.random(len(X)) < 1 / (1 + np.exp(-logit))).astype(int)
+
+
+def build_pipelines(trees=200):
+    """Unfitted base pipelines keyed by model name"""
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import StandardScaler
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.ensemble import RandomForestClassifier
+    from xgboost import XGBClassifier
+    from lightgbm import LGBMClassifier
+    from catboost import CatBoostClassifier
+
+    def pipeline(estimator):
+        return Pipeline([('scaler', StandardScaler()), ('model', estimator)])
+
+    return {
+        'model1': pipeline(CatBoostClassifier(iterations=trees, depth=6, verbose=0, random_seed=0,
+                                              allow_writing_files=False)),
+        'model2': pipeline(LGBMClassifier(n_estimators=trees, verbose=-1, random_state=0)),
+        'model3': pipeline(LogisticRegression(max_iter=1000)),
+        'model4': pipeline(RandomForestClassifier(n_estimators=trees, random_state=0)),
+        'model5': pipeline(XGBClassifier(n_estimators=trees, max_depth=5, random_state=0))
+    }
+
+
+def train_standin_models(out_dir, rows=3000, trees=200, seed=0):
+    """Fit the five base pipelines plus a stacking model and save them to out_dir"""
+    from sklearn.ensemble import StackingClassifier
+    from sklearn.linear_model import LogisticRegression
+
+    os.makedirs(out_dir, exist_ok=True)
+    X = make_feature_frame(rows, seed=seed)
+    y = make_labels(X, seed=seed)
+
+    base = build_pipelines(trees)
+    for name, model in base.items():
+        model.fit(X, y)
+        joblib.dump(model, os.path.join(out_dir, DEFAULT_FILENAMES[name]))
+
+    stacking = StackingClassifier(
+        estimators=list(base.items()), final_estimator=LogisticRegression(), cv='prefit'
+    )
+    stacking.fit(X, y)
+    joblib.dump(stacking, os.path.join(out_dir, DEFAULT_FILENAMES['stacking']))
+    return out_dir
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train stand-in models on synthetic data")
+    parser.add_argument('out_dir', help="directory to write the six joblib files to")
+    parser.add_argument('--rows', type=int, default=3000, help="synthetic training rows")
+    parser.add_argument('--trees', type=int, default=200, help="trees/iterations per tree ensemble")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    train_standin_models(args.out_dir, args.rows, args.trees, args.seed)
+    print(f"[INFO] Stand-in models written to {args.out_dir}")
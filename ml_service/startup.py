@@ -0,0 +1,63 @@
+"""
+Startup sequencing: model warm-up and readiness.
+
+STARTUP_MODE=blocking (default) loads and warms up the models inside the
+lifespan, before the server accepts connections. STARTUP_MODE=background
+accepts connections right away and loads in the background: /health answers
+503 ("starting") and the predict endpoints 503 with Retry-After until the
+models are loaded and warmed up. pandas and the estimator libraries are
+imported on first use, not when app.py is imported, so in background mode
+the port opens before they load.
+"""
+
+import os
+import time
+from dotenv import load_dotenv
+
+# Read before app.py's other imports, so .env has to be loaded here already
+load_dotenv()
+
+# blocking: ready when the server starts; background: start serving /health first
+STARTUP_MODE = os.getenv('STARTUP_MODE', 'blocking').lower()
+# Synthetic batch sizes scored through every loaded model before reporting ready (empty: no warm-up)
+WARMUP_BATCH_SIZES = [int(size) for size in os.getenv('WARMUP_BATCH_SIZES', '1,32').split(',') if size.strip()]
+# Warm-up passes per batch size (each pass runs once per inference worker)
+WARMUP_ROUNDS = int(os.getenv('WARMUP_ROUNDS', 2))
+
+# Close to process start: app.py imports this module first
+STARTED_AT = time.monotonic()
+
+
+class StartupState:
+    """Startup phase and the time spent in each step, reported by /health"""
+
+    def __init__(self):
+        self.phase = 'starting'
+        self.seconds = {}
+        self.ready_after = None
+
+    @property
+    def ready(self):
+        return self.phase == 'ready'
+
+    def step(self, phase):
+        """Enter a phase; returns a callable that records its duration"""
+        self.phase = phase
+        start = time.monotonic()
+
+        def done():
+            self.seconds[phase] = round(time.monotonic() - start, 3)
+        return done
+
+    def mark_ready(self):
+        self.phase = 'ready'
+        self.ready_after = round(time.monotonic() - STARTED_AT, 3)
+
+    def stats(self):
+        return {
+            "mode": STARTUP_MODE,
+            "phase": self.phase,
+            "ready": self.ready,
+            "seconds": self.seconds,
+            "ready_after_seconds": self.ready_after
+        }
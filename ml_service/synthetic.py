@@ -0,0 +1,37 @@
+"""
+Synthetic HealthFeatures rows for probes, warm-up and parity checks.
+Raw features follow the cardio dataset ranges; engineered features are
+derived by features.engineer_features (same as the backend).
+"""
+
+import numpy as np
+from features import FEATURE_COLUMNS, RAW_FEATURE_COLUMNS, engineer_features
+
+
+def make_feature_frame(n_rows, seed=0):
+    """Deterministic N-row DataFrame with all 17 model features"""
+    import pandas as pd
+    rng = np.random.default_rng(seed)
+
+    age_years = rng.uniform(30, 65, n_rows).round(1)
+    height = rng.normal(165, 8, n_rows).round()
+    weight = rng.normal(74, 14, n_rows).clip(40, 180).round(1)
+    ap_hi = rng.normal(128, 17, n_rows).clip(80, 220).round()
+    ap_lo = np.minimum(rng.normal(82, 10, n_rows).round(), ap_hi - 10)
+    cholesterol = rng.integers(1, 4, n_rows)
+    smoke = rng.integers(0, 2, n_rows)
+
+    raw = pd.DataFrame({
+        'age_years': age_years,
+        'gender': rng.integers(0, 2, n_rows),
+        'height': height,
+        'weight': weight,
+        'ap_hi': ap_hi,
+        'ap_lo': ap_lo,
+        'cholesterol': cholesterol,
+        'gluc': rng.integers(1, 4, n_rows),
+        'smoke': smoke,
+        'alco': rng.integers(0, 2, n_rows),
+        'active': rng.integers(0, 2, n_rows)
+    }, columns=RAW_FEATURE_COLUMNS)
+    return engineer_features(raw)
@@ -0,0 +1,7 @@
+import os
+import sys
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The service modules are flat and import each other by name
+sys.path.insert(0, SERVICE_DIR)
+os.environ.setdefault('MODEL_DIR', os.path.join(SERVICE_DIR, 'models'))
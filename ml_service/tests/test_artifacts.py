@@ -0,0 +1,114 @@
+"""Artifact sync from local and HTTP sources, checksum and name checks"""
+
+import functools
+import json
+import os
+import threading
+from http.server import HTTPServer, SimpleHTTPRequestHandler
+
+import pytest
+
+from artifacts import (ARTIFACT_MANIFEST, MANIFEST_VERSION, ArtifactError, file_record,
+                       read_manifest, sync_artifacts, verify_file)
+
+FILES = {'model_a.joblib': b'first model', 'model_b.joblib': b'second model' * 100}
+
+
+def publish(directory, files=FILES, records=None):
+    """Write files and a manifest listing them (records override the computed ones)"""
+    os.makedirs(directory, exist_ok=True)
+    for name, data in files.items():
+        with open(os.path.join(directory, name), 'wb') as f:
+            f.write(data)
+    manifest = {
+        'version': MANIFEST_VERSION,
+        'files': records or {name: file_record(os.path.join(directory, name)) for name in files},
+        'models': {}
+    }
+    with open(os.path.join(directory, ARTIFACT_MANIFEST), 'w') as f:
+        json.dump(manifest, f)
+    return manifest
+
+
+@pytest.fixture
+def http_source(tmp_path):
+    """A stub HTTP server over tmp_path/remote; yields (directory, base URL)"""
+    root = tmp_path / 'remote'
+    root.mkdir()
+
+    class QuietHandler(SimpleHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(('127.0.0.1', 0), functools.partial(QuietHandler, directory=str(root)))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield root, f"http://127.0.0.1:{server.server_port}/"
+    server.shutdown()
+    server.server_close()
+
+
+def test_sync_from_a_directory_fetches_only_changed_files(tmp_path):
+    source, local = tmp_path / 'source', tmp_path / 'local'
+    manifest = publish(source)
+    local.mkdir()
+
+    assert sync_artifacts(str(source), str(local)) == {
+        'fetched': 2, 'unchanged': 0, 'bytes': sum(len(data) for data in FILES.values())}
+    assert read_manifest(str(local)) == manifest
+    for name, record in manifest['files'].items():
+        verify_file(str(local), name, record, mode='sha256')
+
+    (local / 'model_a.joblib').write_bytes(b'edited locally')
+    summary = sync_artifacts(str(source), str(local))
+    assert (summary['fetched'], summary['unchanged']) == (1, 1)
+    assert (local / 'model_a.joblib').read_bytes() == FILES['model_a.joblib']
+
+
+def test_sync_over_http(http_source, tmp_path):
+    root, url = http_source
+    publish(root)
+    local = tmp_path / 'local'
+    local.mkdir()
+
+    assert sync_artifacts(url, str(local))['fetched'] == 2
+    assert sync_artifacts(url, str(local)) == {'fetched': 0, 'unchanged': 2, 'bytes': 0}
+    assert (local / 'model_b.joblib').read_bytes() == FILES['model_b.joblib']
+
+
+def test_checksum_mismatch_keeps_the_local_file(http_source, tmp_path):
+    root, url = http_source
+    records = publish(root)['files']
+    # The served file no longer matches the manifest
+    (root / 'model_a.joblib').write_bytes(b'tampered!!!')
+    local = tmp_path / 'local'
+    local.mkdir()
+    (local / 'model_a.joblib').write_bytes(b'previous')
+
+    with pytest.raises(ArtifactError, match='model_a.joblib'):
+        sync_artifacts(url, str(local))
+    assert (local / 'model_a.joblib').read_bytes() == b'previous'
+    assert not (local / 'model_a.joblib.part').exists()
+    assert read_manifest(str(local)) is None
+
+    with pytest.raises(ArtifactError):
+        verify_file(str(root), 'model_a.joblib', records['model_a.joblib'], mode='sha256')
+
+
+@pytest.mark.parametrize('name', ['../outside.joblib', 'sub/model.joblib', '/tmp/model.joblib', '..', ''])
+def test_names_outside_the_model_directory_are_rejected(tmp_path, http_source, name):
+    record = {'sha256': '0' * 64, 'size': 1}
+    source, local = tmp_path / 'source', tmp_path / 'local'
+    publish(source, files={}, records={'model_a.joblib': record, name: record})
+    local.mkdir()
+
+    with pytest.raises(ArtifactError, match='invalid artifact name'):
+        sync_artifacts(str(source), str(local))
+    with pytest.raises(ArtifactError, match='invalid artifact name'):
+        verify_file(str(local), name, record)
+
+    root, url = http_source
+    publish(root, files={}, records={name: record})
+    with pytest.raises(ArtifactError, match='invalid artifact name'):
+        sync_artifacts(url, str(local))
+    assert os.listdir(local) == []
@@ -0,0 +1,49 @@
+"""PredictionCache keys, expiry, eviction and invalidation on reload"""
+
+from collections import namedtuple
+
+from cache import PredictionCache
+from model_loader import ModelManager
+
+Row = namedtuple('Row', ['age', 'bmi'])
+
+
+def test_equal_values_share_a_key():
+    cache = PredictionCache(Row._fields, decimals=4)
+    assert cache.make_key(Row(50, 1)) == cache.make_key(Row(50.0, 1.00001))
+    assert cache.make_key(Row(0.0, 1)) == cache.make_key(Row(-0.0, 1))
+    assert cache.make_key(Row(50, 1)) != cache.make_key(Row(51, 1))
+
+
+def test_expired_and_evicted_entries_miss():
+    cache = PredictionCache(Row._fields, max_entries=2, ttl=0)
+    cache.put(b'a', 1)
+    assert cache.get(b'a') is None
+
+    cache = PredictionCache(Row._fields, max_entries=2)
+    for key in (b'a', b'b', b'c'):
+        cache.put(key, key)
+    assert cache.get(b'a') is None and cache.get(b'c') == b'c'
+    assert cache.stats()['evictions'] == 1
+
+
+def test_put_after_a_reload_is_dropped():
+    manager = ModelManager()
+    cache = PredictionCache(Row._fields)
+    manager.add_reload_listener(cache.clear)
+    cache.put(b'old', 'old scores')
+
+    # A request looks the key up, then a reload swaps the models while it scores
+    generation = cache.generation
+    assert cache.get(b'key') is None
+    manager.notify_reload()
+    cache.put(b'key', 'old model scores', generation)
+
+    assert cache.get(b'key') is None
+    assert cache.get(b'old') is None
+    assert cache.stats()['stale_puts'] == 1
+
+    # Requests starting after the reload are cached as before
+    generation = cache.generation
+    cache.put(b'key', 'new model scores', generation)
+    assert cache.get(b'key') == 'new model scores'
@@ -0,0 +1,70 @@
+"""Cascade threshold calibration and early-exit scoring"""
+
+import numpy as np
+import pytest
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+from app import build_prediction
+from cascade import CascadePlan, CascadeStage, calibrate, run_cascade, side_threshold
+from synthetic import make_feature_frame
+
+NAMES = {name: name for name in ('model1', 'model2', 'model3', 'model4', 'model5', 'stacking')}
+
+
+def test_threshold_never_splits_tied_scores():
+    score = np.array([0.1, 0.1, 0.1, 0.2])
+    wrong = np.array([False, False, True, False])
+    # Accepting the first two 0.1 rows would also let the wrong third one exit
+    assert side_threshold(score, wrong, budget=0) is None
+    assert side_threshold(score, wrong, budget=1) == 0.2
+    assert side_threshold(np.full(4, 0.9), wrong, budget=0, descending=True) is None
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_calibrated_disagreement_stays_within_budget(seed):
+    rng = np.random.default_rng(seed)
+    n_rows = 4000
+    # Coarsely rounded scores give many ties at every threshold
+    probas = {name: rng.uniform(0, 1, n_rows).round(1) for name in ('model3', 'model5')}
+    stacked = np.clip(probas['model3'] + rng.normal(0, 0.2, n_rows), 0, 1)
+    max_disagreement = 0.01
+
+    plan = calibrate(probas, stacked, [['model3'], ['model3', 'model5']], max_disagreement)
+
+    answer = stacked.copy()
+    pending = np.arange(n_rows)
+    for stage in plan.stages:
+        score = np.mean([probas[name][pending] for name in stage.models], axis=0)
+        done = stage.exits(score)
+        answer[pending[done]] = score[done]
+        pending = pending[~done]
+    disagreements = int(np.sum((answer >= 0.5) != (stacked >= 0.5)))
+    assert disagreements <= max_disagreement * n_rows
+
+
+def fitted(seed):
+    X = make_feature_frame(400, seed=seed)
+    y = (X['ap_hi'] > 130).astype(int)
+    return Pipeline([('scaler', StandardScaler()), ('model', LogisticRegression(max_iter=500))]).fit(X, y)
+
+
+def test_early_exits_are_reported_as_cascade_tier():
+    models = {'model3': fitted(1), 'model5': fitted(2)}
+    X = make_feature_frame(200, seed=3)
+    plan = CascadePlan([CascadeStage(['model3'], low=0.2, high=0.8)])
+
+    output = run_cascade(X, models, NAMES, None, plan)
+
+    exited = output.exit_stage >= 0
+    assert exited.any() and (~exited).any()
+    for row in range(len(X)):
+        result = build_prediction(output, row)
+        if exited[row]:
+            assert result['tier'] == 'cascade'
+            assert result['models_run'] == ['model3']
+            assert result['base_predictions']['model5'] is None
+        else:
+            assert result['tier'] == 'full'
+            assert set(result['models_run']) == {'model3', 'model5'}
@@ -0,0 +1,58 @@
+"""Compacted forests reproduce the originals, inside pipelines and stackers"""
+
+import copy
+import io
+
+import joblib
+import numpy as np
+import pytest
+from sklearn.base import clone, is_classifier
+from sklearn.datasets import make_classification
+from sklearn.ensemble import RandomForestClassifier, StackingClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+
+from compaction import CompactForestClassifier, compact_estimator, count_compacted, max_drift
+
+X, y = make_classification(n_samples=400, n_features=8, random_state=0)
+
+
+def forest_pipeline():
+    return make_pipeline(StandardScaler(), RandomForestClassifier(n_estimators=25, random_state=0)).fit(X, y)
+
+
+@pytest.mark.parametrize('value_dtype, tolerance', [(np.float32, 1e-6), (np.float16, 1e-3)])
+def test_compacted_pipeline_round_trip(value_dtype, tolerance):
+    original = forest_pipeline()
+    compacted = compact_estimator(copy.deepcopy(original), value_dtype)
+    assert count_compacted(compacted) == 1
+    assert isinstance(compacted.steps[-1][1], CompactForestClassifier)
+    assert max_drift(original, compacted, X) <= tolerance
+    assert np.array_equal(compacted.predict(X), original.predict(X))
+
+    buffer = io.BytesIO()
+    joblib.dump(compacted, buffer)
+    buffer.seek(0)
+    loaded = joblib.load(buffer)
+    assert np.array_equal(loaded.predict_proba(X), compacted.predict_proba(X))
+
+
+def test_compacted_stacker_drops_the_original_forests():
+    stacker = StackingClassifier(
+        [('rf', RandomForestClassifier(n_estimators=10, random_state=0)), ('lr', LogisticRegression())],
+        final_estimator=LogisticRegression(), cv=3).fit(X, y)
+    compacted = compact_estimator(copy.deepcopy(stacker), np.float32)
+    assert count_compacted(compacted) == 1
+    assert isinstance(compacted.named_estimators_['rf'], CompactForestClassifier)
+    assert max_drift(stacker, compacted, X) <= 1e-6
+
+
+def test_compact_forest_is_not_a_fittable_estimator():
+    compacted = compact_estimator(forest_pipeline(), np.float32)
+    forest = compacted.steps[-1][1]
+    assert not is_classifier(forest)
+    with pytest.raises(TypeError):
+        forest.fit(X, y)
+    with pytest.raises(TypeError):
+        clone(forest)
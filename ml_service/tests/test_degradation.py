@@ -0,0 +1,99 @@
+"""DegradationController tier changes, recovery hold and tier codes"""
+
+import pytest
+
+import degradation
+from degradation import CASCADE_TIER, TIERS, DegradationController, most_degraded, tier_code
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(degradation, 'time', clock)
+    return clock
+
+
+def make_controller():
+    # 100ms target, 10s cooldown, holds of 10s doubling up to 40s
+    return DegradationController(tiers=TIERS, latency_ms=100, queue_depth=8, window=10, min_samples=5,
+                                 recovery_ratio=0.5, cooldown=10, max_hold=40)
+
+
+def feed(controller, seconds, clock, advance=11, queue_depth=0):
+    """Record enough latencies at the current tier, let time pass and update"""
+    for _ in range(controller.min_samples):
+        controller.record(seconds, controller.tier)
+    clock.now += advance
+    return controller.update(queue_depth)
+
+
+def test_steps_down_under_load_and_back_up(clock):
+    controller = make_controller()
+    assert feed(controller, 0.01, clock) == 'full'
+    assert feed(controller, 0.3, clock) == 'subset'
+    # Within the cooldown nothing changes, whatever the load
+    assert feed(controller, 0.3, clock, advance=1) == 'subset'
+    assert feed(controller, 0.3, clock) == 'fallback'
+    # A deep queue alone is overload too
+    controller.level = 0
+    clock.now += 11
+    assert controller.update(queue_depth=9) == 'subset'
+
+    # Fallback runs no model, so an idle queue is enough to step up
+    controller.level = 2
+    clock.now += 11
+    assert controller.update(queue_depth=0) == 'subset'
+    assert feed(controller, 0.01, clock) == 'subset'  # step up confirmed, hold restarts
+    assert feed(controller, 0.01, clock) == 'full'
+    assert controller.transitions == 5
+
+
+def test_failed_recovery_doubles_the_hold_up_to_the_cap(clock):
+    controller = make_controller()
+    feed(controller, 0.3, clock)
+    assert controller.tier == 'subset'
+
+    for expected_hold in (20, 40, 40):
+        # Relaxed: steps up once the hold has passed...
+        assert feed(controller, 0.01, clock, advance=controller.hold) == 'full'
+        # ...and the full tier misses its target again before proving itself
+        assert feed(controller, 0.3, clock) == 'subset'
+        assert controller.hold == expected_hold
+        # Relaxed again, but the hold has not passed yet
+        assert feed(controller, 0.01, clock, advance=expected_hold - 1) == 'subset'
+
+    # A step up that holds over enough samples resets the hold
+    assert feed(controller, 0.01, clock, advance=1) == 'full'
+    assert feed(controller, 0.01, clock) == 'full'
+    assert controller.hold == controller.cooldown
+    assert controller.stats()['hold_seconds'] == 10
+
+
+def test_overload_samples_and_earlier_tiers():
+    controller = make_controller()
+    for _ in range(4):
+        controller.record_overload('full')
+    controller.record(0.01, 'subset')  # scored before a tier change: ignored
+    assert controller.p95() is None
+    controller.record(0.01, 'full')
+    assert controller.p95() == float('inf')
+    assert controller.stats()['recent_p95_ms'] is None
+
+
+@pytest.mark.parametrize('tiers', [['subset', 'fallback'], ['full', 'cheap'], []])
+def test_invalid_tiers_are_rejected(tiers):
+    with pytest.raises(ValueError):
+        DegradationController(tiers=tiers)
+
+
+def test_tier_codes():
+    assert [tier_code(tier) for tier in (*TIERS, CASCADE_TIER)] == [0, 1, 2, 3]
+    assert most_degraded(['full', 'fallback', 'subset']) == 'fallback'
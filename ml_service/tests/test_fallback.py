@@ -0,0 +1,40 @@
+"""fallback.fallback_risk must score exactly like the scalar calculate_fallback_risk"""
+
+from collections import namedtuple
+
+import numpy as np
+import pytest
+
+from app import FEATURE_FIELDS, build_fallback_prediction, build_fallback_predictions, calculate_fallback_risk
+from fallback import BASE_FACTORS, fallback_risk_frame, parity_rows
+
+
+@pytest.fixture(scope='module')
+def rows():
+    X = parity_rows(random_rows=20000, seed=1)
+    # calculate_fallback_risk only reads attributes
+    Row = namedtuple('Row', [FEATURE_FIELDS.get(column, column) for column in X.columns])
+    records = [Row._make(row) for row in X.itertuples(index=False)]
+    expected = np.array([calculate_fallback_risk(record) for record in records])
+    return X, records, expected
+
+
+def test_risk_matches_scalar_on_boundaries_and_random_rows(rows):
+    X, _, expected = rows
+    np.testing.assert_array_equal(fallback_risk_frame(X), expected)
+
+
+def test_batch_predictions_match_scalar(rows):
+    _, records, expected = rows
+    results = build_fallback_predictions(records)
+    assert [result['stacked']['probability'] for result in results] == expected.tolist()
+    for result, score in zip(results, expected):
+        assert result['base_predictions'] == {name: score * factor for name, factor in BASE_FACTORS.items()}
+        assert result['stacked']['label'] == ('High' if score >= 0.5 else 'Low')
+        assert result['tier'] == 'fallback' and result['models_run'] == []
+
+
+def test_single_row_prediction_matches_batch(rows):
+    _, records, _ = rows
+    for record in records[:200]:
+        assert build_fallback_prediction(record) == build_fallback_predictions([record])[0]
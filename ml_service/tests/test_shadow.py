@@ -0,0 +1,106 @@
+"""ShadowScorer sampling, agreement statistics and shutdown"""
+
+import queue
+import threading
+
+import numpy as np
+
+from shadow import ShadowScorer
+
+
+class FixedModel:
+    def __init__(self, proba):
+        self.proba = proba
+
+    def predict_proba(self, X):
+        return np.array([[1 - self.proba, self.proba]])
+
+
+class FakeManager:
+    def __init__(self, candidates):
+        self.candidates = candidates
+
+    def get_candidates(self):
+        return self.candidates
+
+
+def candidate(target, proba):
+    return {'target': target, 'model': FixedModel(proba), 'path': f'{target}_v2.joblib'}
+
+
+RESULT = {'base_predictions': {'model4': 0.7}, 'stacked': {'probability': 0.4}}
+
+
+def test_only_sampled_requests_with_a_production_target_are_queued():
+    scorer = ShadowScorer(FakeManager({'rf_v2': candidate('model4', 0.6)}), sample_rate=1.0, queue_size=2)
+    # model4 failed for this row: nothing to compare against
+    assert not scorer.submit(lambda: None, RESULT, {'stacking'})
+    assert scorer.sampled == 0
+
+    assert scorer.submit(lambda: None, RESULT, {'model4'})
+    assert scorer.submit(lambda: None, RESULT, {'model4'})
+    assert not scorer.submit(lambda: None, RESULT, {'model4'})
+    assert (scorer.sampled, scorer.dropped, scorer.pending()) == (3, 1, 2)
+
+    unsampled = ShadowScorer(FakeManager({'rf_v2': candidate('model4', 0.6)}), sample_rate=0.0)
+    assert not unsampled.submit(lambda: None, RESULT, {'model4'})
+    assert unsampled.sampled == 0
+
+
+def test_candidates_are_compared_with_their_own_target():
+    manager = FakeManager({'rf_v2': candidate('model4', 0.6), 'stack_v2': candidate('stacking', 0.55)})
+    scorer = ShadowScorer(manager)
+    scorer.score(lambda: None, RESULT, {'model4', 'stacking'}, {'model4': 0.002, 'model1': 0.003})
+    scorer.score(lambda: None, RESULT, {'model4'}, None)
+
+    stats = scorer.stats()['candidates']
+    rf, stack = stats['rf_v2'], stats['stack_v2']
+    assert rf['scored'] == 2 and rf['label_agreement'] == 1.0
+    assert np.isclose(rf['max_abs_difference'], 0.1)
+    assert rf['production_latency_ms']['p50'] == 2.0
+    # Stacking was left out of the second row
+    assert stack['scored'] == 1 and stack['label_agreement'] == 0.0
+    assert np.isclose(stack['mean_abs_difference'], 0.15)
+    assert stack['production_latency_ms']['p50'] == 5.0
+
+    scorer.reset()
+    assert scorer.stats()['candidates']['rf_v2']['scored'] == 0
+
+
+class RacingQueue(queue.Queue):
+    """Queue a submit refills the moment stop() has drained it"""
+
+    def __init__(self, refills):
+        super().__init__(maxsize=1)
+        self.refills = refills
+
+    def get_nowait(self):
+        try:
+            return super().get_nowait()
+        except queue.Empty:
+            if self.refills:
+                self.refills -= 1
+                self.put_nowait('submitted while stopping')
+            raise
+
+
+def test_stop_does_not_block_when_a_submit_refills_the_queue():
+    scorer = ShadowScorer(FakeManager({'rf_v2': candidate('model4', 0.6)}))
+    scorer._thread = threading.current_thread()  # started, but nothing consumes the queue
+    scorer._queue = RacingQueue(refills=3)
+    scorer._queue.put_nowait('sampled row')
+
+    stopping = threading.Thread(target=scorer.stop, daemon=True)
+    stopping.start()
+    stopping.join(5)
+    assert not stopping.is_alive()
+    assert scorer._queue.get_nowait() is None
+
+
+def test_stop_ends_the_worker():
+    scorer = ShadowScorer(FakeManager({'rf_v2': candidate('model4', 0.6)}), sample_rate=1.0)
+    scorer.start()
+    worker = scorer._thread
+    scorer.stop()
+    worker.join(5)
+    assert not worker.is_alive()
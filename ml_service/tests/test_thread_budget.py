@@ -0,0 +1,45 @@
+"""limit_threads only ever lowers thread counts and keeps models picklable"""
+
+import pickle
+
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+from thread_budget import ThreadCountPredictor, limit_threads
+
+rng = np.random.default_rng(0)
+X = rng.normal(size=(60, 4))
+y = (X[:, 0] > 0).astype(int)
+
+
+@pytest.mark.parametrize('n_jobs, expected', [(None, 1), (1, 1), (2, 2), (8, 4), (-1, 4)])
+def test_forest_threads_are_only_lowered(n_jobs, expected):
+    forest = RandomForestClassifier(n_estimators=3, n_jobs=n_jobs, random_state=0).fit(X, y)
+    assert limit_threads(forest, 4).n_jobs == expected
+
+
+@pytest.mark.parametrize('n_jobs, expected', [(None, 4), (1, 1), (2, 2), (8, 4), (-1, 4)])
+def test_boosted_threads_are_only_lowered(n_jobs, expected):
+    xgboost = pytest.importorskip('xgboost')
+    lightgbm = pytest.importorskip('lightgbm')
+    for model in (xgboost.XGBClassifier(n_estimators=3, n_jobs=n_jobs),
+                  lightgbm.LGBMClassifier(n_estimators=3, n_jobs=n_jobs, verbose=-1)):
+        model.fit(X, y)
+        assert limit_threads(model, 4).get_params()['n_jobs'] == expected
+
+
+def test_budgeted_catboost_pipeline_pickles():
+    catboost = pytest.importorskip('catboost')
+    pipeline = Pipeline([
+        ('scaler', StandardScaler()),
+        ('model', catboost.CatBoostClassifier(iterations=5, verbose=0, allow_writing_files=False))
+    ]).fit(X, y)
+    budgeted = limit_threads(pipeline, 1)
+    assert isinstance(budgeted.steps[-1][1], ThreadCountPredictor)
+
+    restored = pickle.loads(pickle.dumps(budgeted))
+    assert restored.steps[-1][1].thread_count == 1
+    np.testing.assert_array_equal(restored.predict_proba(X), budgeted.predict_proba(X))
@@ -0,0 +1,76 @@
+"""Compact wire format codec and its parity with the JSON routes"""
+
+import math
+import struct
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import app
+from features import FEATURE_COLUMNS
+from synthetic import make_feature_frame
+from wire import (FEATURES_MEDIA_TYPE, ROW_BYTES, SCORE_LAYOUT, SCORES_MEDIA_TYPE, WireFormatError,
+                  decode_features, encode_scores)
+
+
+def encode_rows(rows):
+    return np.asarray(rows, dtype='<f8').tobytes()
+
+
+@pytest.mark.parametrize('n_rows', [1, 7])
+def test_features_round_trip(n_rows):
+    X = make_feature_frame(n_rows, seed=4)[FEATURE_COLUMNS]
+    rows = decode_features(encode_rows(X.to_numpy()))
+    assert [list(row) for row in rows] == X.to_numpy().tolist()
+    assert type(rows[0][FEATURE_COLUMNS.index('cholesterol')]) is int
+
+
+@pytest.mark.parametrize('n_rows', [1, 3])
+def test_invalid_bodies_are_rejected(n_rows):
+    rows = make_feature_frame(n_rows, seed=5)[FEATURE_COLUMNS].to_numpy()
+    with pytest.raises(WireFormatError):
+        decode_features(encode_rows(rows)[:-1])
+    bad = rows.copy()
+    bad[0, 0] = math.nan
+    with pytest.raises(WireFormatError):
+        decode_features(encode_rows(bad))
+    bad = rows.copy()
+    bad[0, FEATURE_COLUMNS.index('gluc')] = 1.5
+    with pytest.raises(WireFormatError):
+        decode_features(encode_rows(bad))
+    with pytest.raises(WireFormatError):
+        decode_features(b'')
+
+
+def test_scores_carry_models_used_and_tier():
+    result = {
+        'base_predictions': {'model1': 0.1, 'model2': None, 'model3': 0.3, 'model4': 0.4, 'model5': 0.5},
+        'stacked': {'probability': 0.25, 'label': 'Low'},
+        # model2 ran but failed: JSON and compact both report 4 models used
+        'models_run': ['model1', 'model2', 'model3', 'model4', 'model5', 'stacking'],
+        'models_used': 4,
+        'tier': 'cascade'
+    }
+    values = struct.unpack(f'<{len(SCORE_LAYOUT)}d', encode_scores([result]))
+    decoded = dict(zip(SCORE_LAYOUT, values))
+    assert math.isnan(decoded['model2']) and decoded['model1'] == 0.1
+    assert decoded['stacked_probability'] == 0.25
+    assert decoded['models_used'] == 4
+    assert decoded['tier'] == 3
+
+
+def test_validation_errors_match_the_json_route():
+    client = TestClient(app.app)
+    record = {'age_years': 'old'}
+    json_errors = client.post('/predict', json=record).json()['detail']
+    compact_errors = client.post('/predict', json=record, headers={'Accept': SCORES_MEDIA_TYPE}).json()['detail']
+    assert [error['loc'] for error in compact_errors] == [error['loc'] for error in json_errors]
+    assert all(error['loc'][0] == 'body' for error in compact_errors)
+
+
+def test_wrong_row_count_is_rejected():
+    client = TestClient(app.app)
+    body = b'\0' * (2 * ROW_BYTES)
+    response = client.post('/predict', content=body, headers={'Content-Type': FEATURES_MEDIA_TYPE})
+    assert response.status_code == 422
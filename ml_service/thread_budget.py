@@ -0,0 +1,160 @@
+"""
+Per-model CPU thread budgets.
+CatBoost, LightGBM, XGBoost and RandomForest size their prediction thread
+pools to every core by default. With several requests (and workers) scoring
+at once that oversubscribes the CPU, so each loaded model is limited to a
+share of the CPU budget: cores / (server workers x concurrent model calls).
+"""
+
+import os
+from logs import get_logger
+
+# Threads per model predict call: auto (the per-call share of CPU_BUDGET),
+# a number (capped at that share), or off (leave the libraries' defaults)
+MODEL_THREADS = os.getenv('MODEL_THREADS', 'auto').lower()
+# Per-model settings overriding MODEL_THREADS, e.g. "model4=2,model1=off"
+MODEL_THREAD_OVERRIDES = dict(
+    item.strip().lower().split('=', 1)
+    for item in os.getenv('MODEL_THREAD_OVERRIDES', '').split(',') if '=' in item
+)
+# Cores the whole service may use (default: CPUs available to this process)
+CPU_BUDGET = int(os.getenv('CPU_BUDGET', 0))
+# Processes sharing CPU_BUDGET (serve.py sets this to its worker count)
+SERVER_WORKERS = int(os.getenv('ML_WORKERS', os.getenv('WEB_CONCURRENCY', 1)))
+
+log = get_logger('thread_budget')
+
+
+def available_cpus():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def concurrent_model_calls():
+    """Model predict calls one process can run at once (inference workers x fan-out)"""
+    # Imported here: executor imports model_loader, which imports this module
+    from executor import INFERENCE_WORKERS
+    from ensemble import BASE_MODELS, MODEL_FANOUT, FANOUT_WORKERS
+    workers = max(1, INFERENCE_WORKERS)
+    if MODEL_FANOUT:
+        return max(1, min(workers * len(BASE_MODELS), FANOUT_WORKERS))
+    return workers
+
+
+def thread_cap():
+    """Threads one model call may use without oversubscribing the CPU budget"""
+    cpus = CPU_BUDGET or available_cpus()
+    return max(1, cpus // (max(1, SERVER_WORKERS) * concurrent_model_calls()))
+
+
+def model_threads(model_name):
+    """Thread budget for one model, or None to leave it unchanged"""
+    setting = MODEL_THREAD_OVERRIDES.get(model_name, MODEL_THREADS)
+    if setting == 'off':
+        return None
+    if setting == 'auto':
+        return thread_cap()
+    return max(1, min(int(setting), thread_cap()))
+
+
+class ThreadCountPredictor:
+    """
+    CatBoost ignores its thread_count parameter when predicting and uses
+    every core unless predict_proba gets a thread_count argument; this
+    wrapper passes one and delegates everything else to the estimator
+    """
+
+    def __init__(self, estimator, thread_count):
+        self.wrapped_estimator = estimator
+        self.thread_count = thread_count
+
+    def predict_proba(self, X, **params):
+        params.setdefault('thread_count', self.thread_count)
+        return self.wrapped_estimator.predict_proba(X, **params)
+
+    def predict(self, X, **params):
+        params.setdefault('thread_count', self.thread_count)
+        return self.wrapped_estimator.predict(X, **params)
+
+    def __sklearn_is_fitted__(self):
+        # Pipeline checks its final step is fitted before predicting
+        return self.wrapped_estimator.is_fitted()
+
+    def __getattr__(self, name):
+        # Unpickling looks up attributes before wrapped_estimator is restored
+        try:
+            wrapped = self.__dict__['wrapped_estimator']
+        except KeyError:
+            raise AttributeError(name) from None
+        return getattr(wrapped, name)
+
+
+def limit_threads(estimator, threads):
+    """
+    Apply the thread budget to an estimator and everything nested in it
+    (pipeline steps, stacker base and meta models). Returns the estimator
+    to use in its place, which differs only for wrapped CatBoost models.
+    """
+    if isinstance(estimator, ThreadCountPredictor):
+        estimator.thread_count = threads
+        return estimator
+
+    if hasattr(estimator, 'steps'):
+        estimator.steps = [(name, limit_threads(step, threads)) for name, step in estimator.steps]
+        return estimator
+    # sklearn StackingClassifier
+    if hasattr(estimator, 'estimators_') and hasattr(estimator, 'final_estimator_'):
+        estimator.estimators_ = [limit_threads(est, threads) for est in estimator.estimators_]
+        estimator.final_estimator_ = limit_threads(estimator.final_estimator_, threads)
+        return estimator
+    # Custom StackingModel class defined in app.py
+    if hasattr(estimator, 'base_models') and hasattr(estimator, 'meta_model'):
+        if isinstance(estimator.base_models, dict):
+            estimator.base_models = {k: limit_threads(m, threads) for k, m in estimator.base_models.items()}
+        else:
+            estimator.base_models = [limit_threads(m, threads) for m in estimator.base_models]
+        estimator.meta_model = limit_threads(estimator.meta_model, threads)
+        return estimator
+
+    name = type(estimator).__name__
+    if name == 'CatBoostClassifier':
+        return ThreadCountPredictor(estimator, threads)
+    if name in ('XGBClassifier', 'LGBMClassifier'):
+        # None or negative means every core; the budget only ever lowers a positive count.
+        # XGBoost also updates the fitted booster's nthread
+        current = estimator.get_params().get('n_jobs')
+        if current is not None and current > 0:
+            threads = min(current, threads)
+        estimator.set_params(n_jobs=threads)
+    elif hasattr(estimator, 'n_jobs') and hasattr(estimator, 'estimators_'):
+        # RandomForest / ExtraTrees predict through joblib with n_jobs workers;
+        # None means one, and the budget only ever lowers a positive count
+        if estimator.n_jobs is None or estimator.n_jobs > 0:
+            threads = min(estimator.n_jobs or 1, threads)
+        estimator.n_jobs = threads
+    return estimator
+
+
+def apply_thread_budget(model, model_name):
+    """Budgeted version of a freshly loaded model (the same object unless wrapped)"""
+    threads = model_threads(model_name)
+    if threads is None:
+        return model
+    try:
+        return limit_threads(model, threads)
+    except Exception as e:
+        log.warning("Could not apply thread budget to %s: %s", model_name, e)
+        return model
+
+
+def limit_native_threads():
+    """Cap BLAS pools (NumPy, the compiled fast path) at the per-call share too"""
+    if MODEL_THREADS == 'off':
+        return
+    try:
+        from threadpoolctl import threadpool_limits
+    except ImportError:
+        return
+    threadpool_limits(limits=thread_cap(), user_api='blas')
@@ -0,0 +1,123 @@
+"""
+Compact binary wire format for /predict and /predict/batch.
+
+Request (Content-Type: application/x-heartwise-features): N rows of 17
+little-endian float64 values in FEATURE_COLUMNS order, no header.
+Response (Accept: application/x-heartwise-scores): N rows of 8 little-endian
+float64 values - model1..model5, stacked probability, models_used, tier - in
+request order. Base scores are NaN for models a cascade exit skipped;
+models_used is 0 for rows answered by the rule-based fallback; tier is the
+index of the tier (0 full, 1 subset, 2 fallback, 3 cascade early exit).
+
+Either side can be used on its own: JSON in with binary out, or binary in
+with JSON out. Requests with neither header take the normal JSON path.
+"""
+
+import math
+import struct
+import numpy as np
+from fastapi.routing import APIRoute
+from ensemble import BASE_MODELS
+from features import FEATURE_COLUMNS
+from degradation import tier_code
+
+FEATURES_MEDIA_TYPE = 'application/x-heartwise-features'
+SCORES_MEDIA_TYPE = 'application/x-heartwise-scores'
+
+WIRE_DTYPE = np.dtype('<f8')
+SCORE_LAYOUT = BASE_MODELS + ['stacked_probability', 'models_used', 'tier']
+# Columns HealthFeatures declares as int; they must hold whole numbers
+INT_COLUMNS = [
+    FEATURE_COLUMNS.index(column)
+    for column in ('gender', 'cholesterol', 'gluc', 'smoke', 'alco', 'active', 'age_group', 'bmi_group')
+]
+ROW_STRUCT = struct.Struct(f'<{len(FEATURE_COLUMNS)}d')
+ROW_BYTES = ROW_STRUCT.size
+
+
+class WireFormatError(ValueError):
+    """Raised for a compact body that is not a valid feature matrix"""
+
+
+def accepts(header, media_type):
+    """True if a Content-Type or Accept header value names media_type"""
+    if not header:
+        return False
+    return any(part.split(';', 1)[0].strip().lower() == media_type for part in header.split(','))
+
+
+def _invalid_ints():
+    return WireFormatError(
+        "Integer features must hold whole numbers: "
+        + ', '.join(FEATURE_COLUMNS[col] for col in INT_COLUMNS)
+    )
+
+
+def decode_features(body):
+    """
+    Rows of 17 feature values from a compact request body, with Python ints
+    for the integer features and floats for the rest
+    """
+    if not body or len(body) % ROW_BYTES:
+        raise WireFormatError(
+            f"Body must be a non-empty multiple of {ROW_BYTES} bytes "
+            f"({len(FEATURE_COLUMNS)} float64 values per row), got {len(body)}"
+        )
+    if len(body) == ROW_BYTES:
+        # Single /predict row: plain struct unpacking beats NumPy's per-call overhead
+        row = list(ROW_STRUCT.unpack(body))
+        if not all(map(math.isfinite, row)):
+            raise WireFormatError("Feature values must be finite numbers")
+        for col in INT_COLUMNS:
+            if not row[col].is_integer():
+                raise _invalid_ints()
+            row[col] = int(row[col])
+        return [row]
+
+    rows = np.frombuffer(body, dtype=WIRE_DTYPE).reshape(-1, len(FEATURE_COLUMNS))
+    if not np.isfinite(rows).all():
+        raise WireFormatError("Feature values must be finite numbers")
+    ints = rows[:, INT_COLUMNS]
+    if not (ints == np.round(ints)).all():
+        raise _invalid_ints()
+    columns = [
+        rows[:, col].astype(np.int64).tolist() if col in INT_COLUMNS else rows[:, col].tolist()
+        for col in range(rows.shape[1])
+    ]
+    return list(zip(*columns))
+
+
+def encode_scores(results):
+    """Compact response body for PredictionResponse dicts"""
+    nan = float('nan')
+    values = []
+    for result in results:
+        base = result['base_predictions']
+        values.extend(nan if base[name] is None else base[name] for name in BASE_MODELS)
+        values.append(result['stacked']['probability'])
+        values.append(result['models_used'])
+        values.append(tier_code(result.get('tier', 'full')))
+    return struct.pack(f'<{len(values)}d', *values)
+
+
+class CompactRoute(APIRoute):
+    """
+    APIRoute that hands requests using the compact format to
+    `compact_endpoint(request)` and everything else to the normal JSON endpoint
+    """
+
+    compact_endpoints = {}
+
+    def get_route_handler(self):
+        json_handler = super().get_route_handler()
+
+        async def route_handler(request):
+            compact_endpoint = self.compact_endpoints.get(self.path)
+            if compact_endpoint is not None and (
+                accepts(request.headers.get('content-type'), FEATURES_MEDIA_TYPE)
+                or accepts(request.headers.get('accept'), SCORES_MEDIA_TYPE)
+            ):
+                return await compact_endpoint(request)
+            return await json_handler(request)
+
+        return route_handler